@@ -1,9 +1,10 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from .trabajos import encolar, reintentar_trabajo
 from .models import (
     WhiteList, Rol, ComplejoHabitacional, UnidadHabitacional, 
-    Usuario, Pago, PagoDetalle, ConfiguracionMulta, GastoComun,
-    EspacioComun, Reserva, ReservaDetalle, Notificacion
+    Usuario, Pago, PagoDetalle, ConfiguracionMulta, GastoComun, ResumenGastoComun,
+    EspacioComun, Reserva, ReservaDetalle, Notificacion, Trabajo
 )
 
 class WhiteListAdmin(admin.ModelAdmin):
@@ -76,6 +77,16 @@ admin.site.register(Pago, PagoAdmin)
 class ConfiguracionMultaAdmin(admin.ModelAdmin):
     list_display = ('complejo', 'dias_tolerancia', 'porcentaje_multa_diaria', 'monto_minimo_multa', 'monto_maximo_multa', 'activo')
     list_filter = ('complejo', 'activo')
+    actions = ['recalcular_multas_complejos']
+
+    @admin.action(description='Recalcular multas de los complejos seleccionados')
+    def recalcular_multas_complejos(self, request, queryset):
+        complejos = ComplejoHabitacional.objects.filter(configuraciones_multas__in=queryset).distinct()
+        encolados = [
+            encolar('recalcular_multas', {'complejo': complejo.id}, usuario=request.user)
+            for complejo in complejos
+        ]
+        self.message_user(request, f'{len(encolados)} recálculos de multas encolados')
 
 admin.site.register(ConfiguracionMulta, ConfiguracionMultaAdmin)
 
@@ -86,6 +97,18 @@ class GastoComunAdmin(admin.ModelAdmin):
 
 admin.site.register(GastoComun, GastoComunAdmin)
 
+class ResumenGastoComunAdmin(admin.ModelAdmin):
+    list_display = ('complejo', 'anio', 'mes', 'tipo', 'estado', 'total', 'cantidad', 'fecha_actualizacion')
+    list_filter = ('complejo', 'anio', 'tipo', 'estado')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+admin.site.register(ResumenGastoComun, ResumenGastoComunAdmin)
+
 class EspacioComunAdmin(admin.ModelAdmin):
     list_display = ('nombre', 'complejo', 'capacidad', 'activo')
     list_filter = ('complejo', 'activo')
@@ -106,9 +129,26 @@ class ReservaAdmin(admin.ModelAdmin):
 admin.site.register(Reserva, ReservaAdmin)
 
 class NotificacionAdmin(admin.ModelAdmin):
-    list_display = ('titulo', 'tipo', 'complejo', 'creador', 'fecha_publicacion')
-    list_filter = ('tipo', 'complejo')
+    list_display = ('titulo', 'tipo', 'audiencia', 'complejo', 'creador', 'fecha_publicacion')
+    list_filter = ('tipo', 'audiencia', 'complejo')
     search_fields = ('titulo', 'mensaje', 'complejo__nombre')
     filter_horizontal = ('destinatarios',)
 
-admin.site.register(Notificacion, NotificacionAdmin)
\ No newline at end of file
+admin.site.register(Notificacion, NotificacionAdmin)
+
+class TrabajoAdmin(admin.ModelAdmin):
+    list_display = ('id', 'tipo', 'estado', 'intentos', 'max_intentos', 'creado_por', 'fecha_creacion', 'duracion_segundos')
+    list_filter = ('estado', 'tipo')
+    search_fields = ('tipo', 'creado_por__email', 'error')
+    readonly_fields = [campo.name for campo in Trabajo._meta.fields]
+    actions = ['reintentar_trabajos']
+
+    @admin.action(description='Reintentar los trabajos muertos seleccionados')
+    def reintentar_trabajos(self, request, queryset):
+        reintentados = sum(reintentar_trabajo(trabajo) for trabajo in queryset.filter(estado='MUERTO'))
+        self.message_user(request, f'{reintentados} trabajos devueltos a la cola')
+
+    def has_add_permission(self, request):
+        return False
+
+admin.site.register(Trabajo, TrabajoAdmin)
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class AdministracionConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'administracion'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .instrumentacion import instrumentar_serializadores
+        instrumentar_serializadores()
@@ -0,0 +1,126 @@
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+_principales = {}
+_lock = threading.Lock()
+
+
+def _ttl():
+    return getattr(settings, 'PRINCIPAL_CACHE_TTL', 30)
+
+
+# Relaciones que se resuelven junto con el usuario, cada una después de la que la contiene
+RELACIONES = ('rol', 'unidad_habitacional', 'unidad_habitacional__complejo', 'complejo_administrado')
+
+
+def _plan():
+    """
+    (ruta, modelo, columnas) del usuario y de cada relación, en el orden de RELACIONES.
+    """
+    modelo = get_user_model()
+    plan = [('', modelo)]
+    for ruta in RELACIONES:
+        actual = modelo
+        for nombre in ruta.split('__'):
+            actual = actual._meta.get_field(nombre).related_model
+        plan.append((ruta, actual))
+    return [
+        (ruta, modelo, [campo.attname for campo in modelo._meta.concrete_fields]) for ruta, modelo in plan
+    ]
+
+
+def cargar_principal(user_id):
+    """
+    Valores de las columnas del usuario, su rol, su unidad (y su complejo) y su complejo administrado,
+    leídos en una sola consulta. Son valores simples que se pueden compartir entre peticiones e hilos.
+    """
+    columnas = [f'{ruta}__{columna}' if ruta else columna for ruta, _, nombres in _plan() for columna in nombres]
+    return get_user_model().objects.values_list(*columnas).get(pk=user_id)
+
+
+def construir_principal(fila):
+    """
+    Arma un usuario nuevo, con sus relaciones ya asignadas, a partir de los valores de cargar_principal.
+    """
+    instancias = {}
+    posicion = 0
+    for ruta, modelo, nombres in _plan():
+        valores = fila[posicion:posicion + len(nombres)]
+        posicion += len(nombres)
+        instancia = modelo.from_db(DEFAULT_DB_ALIAS, nombres, valores) if valores[0] is not None else None
+        instancias[ruta] = instancia
+        if ruta:
+            padre, _, nombre = ruta.rpartition('__')
+            if instancias[padre] is not None:
+                # Asignar la relación (aunque sea None) evita que se consulte al acceder a ella
+                setattr(instancias[padre], nombre, instancia)
+    return instancias['']
+
+
+def obtener_principal(user_id):
+    """
+    Devuelve el principal armado desde la caché del proceso, cargándolo si no está o si expiró.
+    La caché guarda solo valores: cada llamada recibe instancias nuevas, así que una petición no ve
+    ni modifica los objetos de otra.
+
+    Las señales invalidan la caché solo en el proceso que guardó el cambio y no ven los queryset.update();
+    con varios procesos, cada uno puede usar un principal desactualizado hasta PRINCIPAL_CACHE_TTL segundos,
+    por lo que ese valor debe mantenerse corto.
+    """
+    ahora = time.monotonic()
+    with _lock:
+        entrada = _principales.get(user_id)
+    if entrada is None or entrada[0] <= ahora:
+        fila = cargar_principal(user_id)
+        with _lock:
+            _principales[user_id] = (ahora + _ttl(), fila)
+    else:
+        fila = entrada[1]
+    return construir_principal(fila)
+
+
+def invalidar_principal(user_id=None):
+    """
+    Elimina un principal de la caché, o todos si no se indica el usuario.
+    """
+    with _lock:
+        if user_id is None:
+            _principales.clear()
+        else:
+            _principales.pop(user_id, None)
+
+
+class JWTAuthenticationCacheada(JWTAuthentication):
+    """
+    JWTAuthentication que obtiene el usuario desde la caché de principales en lugar de consultar
+    la base de datos en cada petición.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        try:
+            user = obtener_principal(user_id)
+        except self.user_model.DoesNotExist as e:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found") from e
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        return user
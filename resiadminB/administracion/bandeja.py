@@ -0,0 +1,122 @@
+import asyncio
+import threading
+from collections import defaultdict
+
+from .models import Notificacion
+from .routers import PRIMARIO
+
+CAMPOS_BANDEJA = ('id', 'titulo', 'mensaje', 'tipo', 'fecha_publicacion', 'complejo', 'audiencia')
+LIMITE_POR_ENVIO = 100
+
+
+def complejos_de(usuario):
+    """
+    Complejos cuyas difusiones recibe el usuario: el de su unidad y el que administra.
+    """
+    complejos = {usuario.complejo_administrado_id}
+    if usuario.unidad_habitacional is not None:
+        complejos.add(usuario.unidad_habitacional.complejo_id)
+    return sorted(complejos - {None})
+
+
+class Suscripcion:
+    """
+    Conexión de la bandeja esperando notificaciones. Vive en el event loop que la creó.
+    """
+
+    def __init__(self, claves):
+        self.claves = claves
+        self.loop = asyncio.get_running_loop()
+        self.evento = asyncio.Event()
+
+    def despertar(self):
+        try:
+            self.loop.call_soon_threadsafe(self.evento.set)
+        except RuntimeError:
+            # El loop ya se cerró; la suscripción se cancela al terminar la respuesta
+            pass
+
+    async def esperar(self, segundos):
+        """
+        True si llegó una publicación antes de `segundos`. Varias publicaciones seguidas cuentan como una,
+        porque la conexión vuelve a consultar todo lo nuevo desde su último id.
+        """
+        try:
+            await asyncio.wait_for(self.evento.wait(), segundos)
+        except asyncio.TimeoutError:
+            return False
+        self.evento.clear()
+        return True
+
+
+class Difusor:
+    """
+    Pub/sub dentro del proceso. Las suscripciones se indexan por complejo y por usuario para que publicar
+    solo despierte a las conexiones interesadas. Publicar es seguro desde cualquier hilo.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._suscripciones = defaultdict(set)
+
+    def suscribir(self, complejos, usuario_id):
+        suscripcion = Suscripcion([('complejo', c) for c in complejos] + [('usuario', usuario_id)])
+        with self._lock:
+            for clave in suscripcion.claves:
+                self._suscripciones[clave].add(suscripcion)
+        return suscripcion
+
+    def cancelar(self, suscripcion):
+        with self._lock:
+            for clave in suscripcion.claves:
+                suscritas = self._suscripciones.get(clave)
+                if suscritas is not None:
+                    suscritas.discard(suscripcion)
+                    if not suscritas:
+                        del self._suscripciones[clave]
+
+    def hay_suscripciones(self):
+        return bool(self._suscripciones)
+
+    def publicar(self, complejo_id=None, usuario_ids=()):
+        claves = [('usuario', usuario_id) for usuario_id in usuario_ids]
+        if complejo_id is not None:
+            claves.append(('complejo', complejo_id))
+        with self._lock:
+            destinos = set()
+            for clave in claves:
+                destinos.update(self._suscripciones.get(clave, ()))
+        for suscripcion in destinos:
+            suscripcion.despertar()
+        return len(destinos)
+
+
+difusor = Difusor()
+
+
+def publicar_notificacion(notificacion_id, complejo_id):
+    """
+    Avisa a las conexiones del complejo y a los destinatarios explícitos. Se llama al confirmar la transacción,
+    cuando los destinatarios ya están guardados.
+    """
+    if not difusor.hay_suscripciones():
+        return
+    usuarios = Notificacion.destinatarios.through.objects.filter(
+        notificacion_id=notificacion_id
+    ).values_list('usuario_id', flat=True)
+    difusor.publicar(complejo_id, list(usuarios))
+
+
+async def ultimo_id_notificacion():
+    return await Notificacion.objects.using(PRIMARIO).order_by('-id').values_list('id', flat=True).afirst() or 0
+
+
+async def notificaciones_nuevas(usuario, desde):
+    """
+    Notificaciones visibles para el usuario con id mayor a `desde`. Lee del primario: la réplica puede
+    no tener todavía la fila que originó la publicación.
+    """
+    queryset = Notificacion.objects.using(PRIMARIO).para_usuario(usuario).filter(
+        id__gt=desde
+    ).order_by('id').values(*CAMPOS_BANDEJA)[:LIMITE_POR_ENVIO]
+    return [fila async for fila in queryset]
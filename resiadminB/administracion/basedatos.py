@@ -0,0 +1,117 @@
+import os
+import random
+import sqlite3
+import time
+from functools import wraps
+
+import django
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+
+# Pragmas del perfil de producción, aplicados a cada conexión nueva
+PRAGMAS_PRODUCCION = {
+    # Los lectores no bloquean al escritor ni el escritor a los lectores
+    'journal_mode': 'WAL',
+    # Con WAL, NORMAL solo sincroniza en los checkpoints y sigue siendo consistente ante caídas
+    'synchronous': 'NORMAL',
+    # Negativo = KiB: 64 MiB de caché de páginas por conexión
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+    # Milisegundos que una conexión espera un lock antes de fallar con "database is locked"
+    'busy_timeout': 5000,
+}
+
+INTENTOS = 5
+ESPERA_INICIAL = 0.05
+ESPERA_MAXIMA = 1.0
+
+
+def inicializar_proceso():
+    """
+    Inicializador de los pools de procesos: con el método "spawn" el proceso hijo parte sin Django configurado.
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'resiadminB.settings')
+    django.setup()
+
+
+def aplicar_pragmas(cursor, pragmas=PRAGMAS_PRODUCCION):
+    for pragma, valor in pragmas.items():
+        cursor.execute(f'PRAGMA {pragma} = {valor}')
+
+
+def configurar_conexion(sender, connection, **kwargs):
+    """
+    Receptor de connection_created: aplica el perfil de producción a las conexiones SQLite.
+    """
+    if connection.vendor != 'sqlite' or getattr(settings, 'SQLITE_PERFIL', None) != 'produccion':
+        return
+    with connection.cursor() as cursor:
+        aplicar_pragmas(cursor)
+
+
+# Códigos de SQLite de un lock: SQLITE_BUSY (otra conexión escribe) y SQLITE_LOCKED (misma conexión o
+# caché compartida), con sus variantes extendidas (SQLITE_BUSY_SNAPSHOT, SQLITE_LOCKED_SHAREDCACHE, ...)
+CODIGOS_BLOQUEO = ('SQLITE_BUSY', 'SQLITE_LOCKED')
+# Mensajes de esos códigos, para los errores que no traen el código (los de versiones anteriores de Python)
+MENSAJES_BLOQUEO = ('database is locked', 'database table is locked')
+
+
+def es_bloqueo(error):
+    """
+    True si el error es un SQLITE_BUSY o SQLITE_LOCKED, los únicos que tiene sentido reintentar.
+    """
+    # Django envuelve el error del driver y lo deja como causa
+    original = error.__cause__ if isinstance(error.__cause__, sqlite3.Error) else error
+    codigo = getattr(original, 'sqlite_errorname', None)
+    if codigo is not None:
+        return codigo.startswith(CODIGOS_BLOQUEO)
+    return str(error).lower().startswith(MENSAJES_BLOQUEO)
+
+
+def espera_reintento(intento, espera=ESPERA_INICIAL):
+    """
+    Backoff exponencial con jitter, para que los escritores que chocaron no vuelvan a chocar al mismo tiempo.
+    """
+    return min(ESPERA_MAXIMA, espera * 2 ** intento) * random.uniform(0.5, 1.0)
+
+
+def reintentar(funcion, intentos=INTENTOS, espera=ESPERA_INICIAL, al_reintentar=None):
+    """
+    Ejecuta `funcion` y la repite con backoff mientras falle por un lock de la base de datos.
+    """
+    for intento in range(intentos):
+        try:
+            return funcion()
+        except (OperationalError, sqlite3.OperationalError) as error:
+            if not es_bloqueo(error) or intento == intentos - 1:
+                raise
+            if al_reintentar is not None:
+                al_reintentar(error)
+            time.sleep(espera_reintento(intento, espera))
+
+
+def ejecutar_con_reintentos(funcion, *args, using=DEFAULT_DB_ALIAS, intentos=INTENTOS, **kwargs):
+    """
+    Ejecuta `funcion` en su propia transacción (BEGIN IMMEDIATE en el perfil de producción)
+    y la reintenta completa si la base de datos está bloqueada.
+    Dentro de una transacción externa no se puede reintentar solo una parte, así que se ejecuta una vez.
+    """
+    if connections[using].in_atomic_block:
+        return funcion(*args, **kwargs)
+
+    def en_transaccion():
+        with transaction.atomic(using=using):
+            return funcion(*args, **kwargs)
+
+    return reintentar(en_transaccion, intentos=intentos)
+
+
+def con_reintentos(funcion):
+    """
+    Decorador de ejecutar_con_reintentos.
+    """
+    @wraps(funcion)
+    def envoltura(*args, **kwargs):
+        return ejecutar_con_reintentos(funcion, *args, **kwargs)
+    return envoltura
@@ -0,0 +1,141 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+
+def arbol_de_campos(texto):
+    """
+    Convierte 'id,usuario.email,usuario.rol' en {'id': {}, 'usuario': {'email': {}, 'rol': {}}}.
+    Devuelve None si no se indicó nada.
+    """
+    if not texto:
+        return None
+    arbol = {}
+    for ruta in texto.split(','):
+        nodo = arbol
+        for parte in ruta.strip().split('.'):
+            if parte:
+                nodo = nodo.setdefault(parte, {})
+    return arbol or None
+
+
+def congelar(arbol):
+    if arbol is None:
+        return None
+    return tuple(sorted((nombre, congelar(hijos)) for nombre, hijos in arbol.items()))
+
+
+class CamposDinamicosMixin:
+    """
+    Serializador cuyos campos de salida y relaciones anidadas se eligen al instanciarlo.
+    `campos` es un árbol de nombres (None = todos) y `expandir` el de las relaciones que se anidan completas;
+    las demás relaciones anidadas salen como claves primarias. Con `expandir=None` se anida todo, como el
+    serializador declarado: así lo usan las respuestas armadas fuera de los viewsets (login, registro).
+    Los nombres desconocidos se ignoran. Solo se recorta la salida: la validación y el guardado siguen usando
+    todos los campos, para que `?fields=` en una escritura no descarte los datos enviados.
+    """
+
+    def __init__(self, *args, campos=None, expandir=None, **kwargs):
+        self.campos = campos
+        self.expandir = expandir
+        super().__init__(*args, **kwargs)
+
+    @property
+    def firma(self):
+        return type(self), congelar(self.campos), congelar(self.expandir)
+
+    @property
+    def _readable_fields(self):
+        # to_representation, plan_de_consulta y LecturaRapida recorren los campos legibles
+        for campo in super()._readable_fields:
+            if self.campos is None or campo.field_name in self.campos:
+                yield campo
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if self.expandir is None:
+            return fields
+        for nombre, campo in fields.items():
+            if isinstance(campo, serializers.BaseSerializer) and campo.read_only:
+                fields[nombre] = self._relacion(nombre, campo)
+        return fields
+
+    def _relacion(self, nombre, campo):
+        many = isinstance(campo, serializers.ListSerializer)
+        hijo = campo.child if many else campo
+        origen = {'source': campo.source} if campo.source else {}
+        subcampos = (self.campos or {}).get(nombre) or None
+        # Pedir campos de una relación (usuario.email) implica expandirla
+        if nombre not in self.expandir and subcampos is None:
+            return serializers.PrimaryKeyRelatedField(many=many, read_only=True, **origen)
+        kwargs = {clave: valor for clave, valor in hijo._kwargs.items() if clave not in ('campos', 'expandir')}
+        kwargs.update(origen)
+        if isinstance(hijo, CamposDinamicosMixin):
+            kwargs.update(campos=subcampos, expandir=self.expandir.get(nombre, {}))
+        return type(hijo)(many=many, **kwargs)
+
+
+def plan_de_consulta(serializer):
+    """
+    Joins (select_related), prefetch y columnas que necesita `serializer` para representar sus instancias.
+    Las columnas son None si algún campo no es una columna del modelo (propiedades, métodos): en ese caso
+    se necesita la fila completa.
+    """
+    relacionados, prefetch, columnas = [], [], []
+    completo = _planificar(serializer, serializer.Meta.model, '', relacionados, prefetch, columnas)
+    return relacionados, prefetch, list(dict.fromkeys(columnas)) if completo else None
+
+
+def _planificar(serializer, modelo, prefijo, relacionados, prefetch, columnas):
+    columnas.append(prefijo + modelo._meta.pk.name)
+    completo = True
+    for campo in serializer._readable_fields:
+        try:
+            campo_modelo = modelo._meta.get_field(campo.source)
+        except FieldDoesNotExist:
+            completo = False
+            continue
+        ruta = prefijo + campo.source
+        if isinstance(campo, serializers.ListSerializer):
+            prefetch.append(Prefetch(ruta, queryset=_queryset_relacionado(campo.child, campo_modelo)))
+        elif isinstance(campo, serializers.ManyRelatedField):
+            prefetch.append(Prefetch(ruta, queryset=campo_modelo.related_model._default_manager.only('pk')))
+        elif isinstance(campo, serializers.BaseSerializer):
+            relacionados.append(ruta)
+            columnas.append(ruta)
+            completo &= _planificar(
+                campo, campo_modelo.related_model, f'{ruta}__', relacionados, prefetch, columnas
+            )
+        elif campo_modelo.concrete:
+            columnas.append(ruta)
+        else:
+            completo = False
+    return completo
+
+
+def _queryset_relacionado(serializer, relacion):
+    queryset = relacion.related_model._default_manager.all()
+    relacionados, prefetch, columnas = plan_de_consulta(serializer)
+    if columnas is not None and relacion.one_to_many:
+        # El prefetch asigna cada fila a su padre por la clave foránea
+        columnas.append(relacion.field.name)
+    return _aplicar(queryset, relacionados, prefetch, columnas)
+
+
+def _aplicar(queryset, relacionados, prefetch, columnas):
+    queryset = queryset.select_related(None)
+    if relacionados:
+        queryset = queryset.select_related(*relacionados)
+    queryset = queryset.prefetch_related(None).prefetch_related(*prefetch)
+    return queryset if columnas is None else queryset.only(*columnas)
+
+
+def proyectar(queryset, serializer, columnas_extra=()):
+    """
+    Reemplaza el select_related y prefetch_related de `queryset` por los que usa `serializer`
+    y limita las columnas a las que representa (más `columnas_extra`, por ejemplo las del orden).
+    """
+    relacionados, prefetch, columnas = plan_de_consulta(serializer)
+    if columnas is not None:
+        columnas += [columna for columna in columnas_extra if columna not in columnas]
+    return _aplicar(queryset, relacionados, prefetch, columnas)
@@ -0,0 +1,104 @@
+from bisect import bisect_left
+from collections import defaultdict
+
+from .models import ReservaDetalle
+
+
+def reservas_activas():
+    """
+    Detalles de reserva que ocupan el espacio (las reservas CANCELADA no bloquean horarios).
+    """
+    return ReservaDetalle.objects.exclude(reserva__estado='CANCELADA')
+
+
+def reservas_en_conflicto(espacio, fecha_inicio, fecha_fin, excluir_reserva=None):
+    """
+    Detalles que se traslapan con [fecha_inicio, fecha_fin) en el espacio.
+    Usa el índice (espacio, fecha_inicio, fecha_fin).
+    """
+    queryset = reservas_activas().filter(
+        espacio=espacio, fecha_inicio__lt=fecha_fin, fecha_fin__gt=fecha_inicio
+    )
+    if excluir_reserva is not None:
+        queryset = queryset.exclude(reserva=excluir_reserva)
+    return queryset
+
+
+def _fusionar(intervalos):
+    """
+    Une intervalos ordenados por inicio que se traslapan o se tocan.
+    """
+    fusionados = []
+    for inicio, fin in intervalos:
+        if fusionados and inicio <= fusionados[-1][1]:
+            if fin > fusionados[-1][1]:
+                fusionados[-1][1] = fin
+        else:
+            fusionados.append([inicio, fin])
+    return fusionados
+
+
+def consulta_ocupados(espacio, desde, hasta):
+    """
+    Inicio y fin de las reservas del espacio que se traslapan con [desde, hasta), ordenadas por inicio.
+    """
+    return reservas_en_conflicto(espacio, desde, hasta).order_by('fecha_inicio').values_list(
+        'fecha_inicio', 'fecha_fin'
+    )
+
+
+def consulta_ocupados_espacios(espacio_ids, desde, hasta):
+    """
+    Lo mismo que consulta_ocupados para varios espacios a la vez, ordenado por espacio e inicio.
+    """
+    return reservas_activas().filter(
+        espacio_id__in=espacio_ids, fecha_inicio__lt=hasta, fecha_fin__gt=desde
+    ).order_by('espacio_id', 'fecha_inicio').values_list('espacio_id', 'fecha_inicio', 'fecha_fin')
+
+
+def intervalos_ocupados(espacio, desde, hasta):
+    ocupados = consulta_ocupados(espacio, desde, hasta)
+    return [(max(inicio, desde), min(fin, hasta)) for inicio, fin in _fusionar(ocupados)]
+
+
+def intervalos_libres(espacio, desde, hasta):
+    """
+    Intervalos libres del espacio entre `desde` y `hasta`, en una sola consulta.
+    """
+    libres = []
+    cursor = desde
+    for inicio, fin in intervalos_ocupados(espacio, desde, hasta):
+        if inicio > cursor:
+            libres.append((cursor, inicio))
+        cursor = max(cursor, fin)
+    if cursor < hasta:
+        libres.append((cursor, hasta))
+    return libres
+
+
+def verificar_candidatos(candidatos):
+    """
+    Revisa muchos horarios candidatos en un solo viaje a la base de datos.
+    `candidatos` es una lista de (espacio_id, fecha_inicio, fecha_fin); devuelve una lista de booleanos
+    en el mismo orden, True si el horario está disponible.
+    """
+    if not candidatos:
+        return []
+
+    desde = min(inicio for _, inicio, _ in candidatos)
+    hasta = max(fin for _, _, fin in candidatos)
+    filas = consulta_ocupados_espacios({espacio_id for espacio_id, _, _ in candidatos}, desde, hasta)
+
+    por_espacio = defaultdict(list)
+    for espacio_id, inicio, fin in filas:
+        por_espacio[espacio_id].append((inicio, fin))
+    ocupados = {espacio_id: _fusionar(intervalos) for espacio_id, intervalos in por_espacio.items()}
+    inicios = {espacio_id: [inicio for inicio, _ in intervalos] for espacio_id, intervalos in ocupados.items()}
+
+    disponibles = []
+    for espacio_id, inicio, fin in candidatos:
+        intervalos = ocupados.get(espacio_id, [])
+        # Último intervalo ocupado que comienza antes del fin del candidato
+        posicion = bisect_left(inicios.get(espacio_id, []), fin) - 1
+        disponibles.append(posicion < 0 or intervalos[posicion][1] <= inicio)
+    return disponibles
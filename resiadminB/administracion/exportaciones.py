@@ -0,0 +1,196 @@
+import csv
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from .models import GastoComun, PagoDetalle
+
+TAMANO_LOTE = 2000
+
+COLUMNAS_PAGOS = (
+    ('pago', 'pago_id'),
+    ('estado_pago', 'pago__estado'),
+    ('vencimiento_pago', 'pago__fecha_vencimiento'),
+    ('email', 'pago__usuario__email'),
+    ('rut', 'pago__usuario__rut'),
+    ('unidad', 'pago__usuario__unidad_habitacional__numero'),
+    ('detalle', 'id'),
+    ('concepto', 'concepto'),
+    ('monto', 'monto'),
+    ('multa', 'multa'),
+    ('dias_atraso', 'dias_atraso'),
+    ('vencimiento_detalle', 'fecha_vencimiento'),
+    ('fecha_pago', 'fecha_pago'),
+)
+
+COLUMNAS_GASTOS = (
+    ('id', 'id'),
+    ('fecha', 'fecha'),
+    ('mes', 'mes'),
+    ('anio', 'anio'),
+    ('tipo', 'tipo'),
+    ('descripcion', 'descripcion'),
+    ('monto', 'monto'),
+    ('estado', 'estado'),
+    ('creado_por', 'creado_por__email'),
+)
+
+
+def filas_pagos(complejo=None, desde=None, hasta=None, estado=None):
+    """
+    Detalles de pago como tuplas (values_list), filtrados por complejo, vencimiento del pago y estado.
+    """
+    queryset = PagoDetalle.objects.all()
+    if complejo is not None:
+        queryset = queryset.filter(pago__usuario__unidad_habitacional__complejo=complejo)
+    if desde is not None:
+        queryset = queryset.filter(pago__fecha_vencimiento__gte=desde)
+    if hasta is not None:
+        queryset = queryset.filter(pago__fecha_vencimiento__lte=hasta)
+    if estado:
+        queryset = queryset.filter(pago__estado=estado)
+    return queryset.order_by('pago_id', 'id').values_list(*(campo for _, campo in COLUMNAS_PAGOS))
+
+
+def filas_gastos(complejo=None, desde=None, hasta=None, estado=None):
+    queryset = GastoComun.objects.all()
+    if complejo is not None:
+        queryset = queryset.filter(complejo=complejo)
+    if desde is not None:
+        queryset = queryset.filter(fecha__gte=desde)
+    if hasta is not None:
+        queryset = queryset.filter(fecha__lte=hasta)
+    if estado:
+        queryset = queryset.filter(estado=estado)
+    return queryset.order_by('fecha', 'id').values_list(*(campo for _, campo in COLUMNAS_GASTOS))
+
+
+def _texto(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    return str(valor)
+
+
+class _Eco:
+    """
+    Pseudo archivo que devuelve lo escrito en lugar de guardarlo, para que csv.writer produzca texto por fila.
+    """
+    def write(self, valor):
+        return valor
+
+
+def generar_csv(encabezados, filas):
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow(encabezados)
+    for fila in filas.iterator(chunk_size=TAMANO_LOTE):
+        yield escritor.writerow([_texto(valor) for valor in fila])
+
+
+class _BufferDrenable:
+    """
+    Destino no posicionable para zipfile: acumula bytes hasta que el generador los entrega.
+    """
+    def __init__(self):
+        self.partes = []
+
+    def write(self, datos):
+        self.partes.append(bytes(datos))
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def drenar(self):
+        datos = b''.join(self.partes)
+        self.partes = []
+        return datos
+
+
+XLSX_ESTATICOS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Datos" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _celda_xlsx(valor):
+    if isinstance(valor, bool) or valor is None:
+        valor = _texto(valor)
+    if isinstance(valor, (int, Decimal)):
+        return f'<c t="n"><v>{valor}</v></c>'
+    return f'<c t="inlineStr"><is><t>{escape(_texto(valor))}</t></is></c>'
+
+
+def _fila_xlsx(valores):
+    return '<row>' + ''.join(_celda_xlsx(valor) for valor in valores) + '</row>'
+
+
+def generar_xlsx(encabezados, filas):
+    """
+    Escribe un XLSX de una hoja directamente sobre el stream de respuesta. La hoja se comprime a medida
+    que se generan las filas, así que la memoria no depende del número de filas.
+    """
+    buffer = _BufferDrenable()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archivo:
+        for nombre, contenido in XLSX_ESTATICOS.items():
+            archivo.writestr(nombre, contenido)
+        yield buffer.drenar()
+
+        with archivo.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as hoja:
+            hoja.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            hoja.write(_fila_xlsx(encabezados).encode('utf-8'))
+            for numero, fila in enumerate(filas.iterator(chunk_size=TAMANO_LOTE), start=1):
+                hoja.write(_fila_xlsx(fila).encode('utf-8'))
+                if numero % TAMANO_LOTE == 0:
+                    yield buffer.drenar()
+            hoja.write(b'</sheetData></worksheet>')
+    yield buffer.drenar()
+
+
+FORMATOS = {
+    'csv': (generar_csv, 'text/csv; charset=utf-8', 'csv'),
+    'xlsx': (generar_xlsx, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+}
+
+# Recursos exportables: columnas y función que entrega las filas
+EXPORTACIONES = {
+    'pagos': (COLUMNAS_PAGOS, filas_pagos),
+    'gastos_comunes': (COLUMNAS_GASTOS, filas_gastos),
+}
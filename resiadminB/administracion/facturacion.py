@@ -0,0 +1,240 @@
+import time
+from calendar import monthrange
+from datetime import date
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import transaction
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import GastoComun, Pago, PagoDetalle, UnidadHabitacional, Usuario
+from .morosidad import invalidar_morosidad
+from .respuestas import invalidar_respuestas
+
+TAMANO_LOTE = 1000
+CENTAVOS = Decimal('0.01')
+
+
+def fecha_vencimiento_por_defecto(mes, anio, dia=10):
+    """
+    Día `dia` del mes siguiente al periodo facturado.
+    """
+    if mes == 12:
+        mes, anio = 1, anio + 1
+    else:
+        mes += 1
+    return date(anio, mes, min(dia, monthrange(anio, mes)[1]))
+
+
+def prorratear(monto, metros_por_unidad):
+    """
+    Reparte `monto` entre las unidades según sus metros cuadrados.
+    El redondeo se ajusta en la última unidad para que la suma sea exacta.
+    """
+    total_metros = sum(metros_por_unidad.values())
+    if not total_metros:
+        return {}
+    cuotas = {}
+    asignado = Decimal('0.00')
+    unidades = list(metros_por_unidad.items())
+    for unidad_id, metros in unidades[:-1]:
+        cuota = (monto * metros / total_metros).quantize(CENTAVOS, rounding=ROUND_HALF_UP)
+        cuotas[unidad_id] = cuota
+        asignado += cuota
+    cuotas[unidades[-1][0]] = monto - asignado
+    return cuotas
+
+
+def _titulares_por_unidad(unidad_ids):
+    """
+    Usuario activo más antiguo de cada unidad, que es a quien se le emite el cobro.
+    """
+    titulares = {}
+    filas = Usuario.objects.filter(
+        unidad_habitacional_id__in=unidad_ids, is_active=True
+    ).order_by('unidad_habitacional_id', 'id').values_list('unidad_habitacional_id', 'id')
+    for unidad_id, usuario_id in filas:
+        titulares.setdefault(unidad_id, usuario_id)
+    return titulares
+
+
+def actualizar_totales(pago_ids):
+    """
+    Recalcula en la base el monto_total (cargos más multas) de los pagos indicados.
+    """
+    total_detalles = PagoDetalle.objects.filter(pago=OuterRef('pk')).values('pago').annotate(
+        total=Sum(F('monto') + F('multa'))
+    ).values('total')
+    Pago.objects.filter(id__in=pago_ids).update(
+        monto_total=Coalesce(
+            Subquery(total_detalles),
+            Value(Decimal('0.00')),
+            output_field=DecimalField(max_digits=10, decimal_places=2)
+        )
+    )
+
+
+def _reprorratear(mes, anio, cuotas_por_gasto, unidades):
+    """
+    Ajusta los detalles ya emitidos del periodo al prorrateo actual: si cambiaron las unidades activas
+    del complejo, cambia el monto de los cobros pendientes y elimina los de unidades que ya no se facturan.
+    Si algún cobro afectado ya está pagado no se modifica nada y se lanza ValueError.
+    Devuelve (detalles actualizados, detalles eliminados, ids de los pagos afectados).
+    """
+    existentes = PagoDetalle.objects.filter(
+        gasto_comun_id__in=cuotas_por_gasto, pago__periodo_mes=mes, pago__periodo_anio=anio
+    ).values_list('id', 'gasto_comun_id', 'pago_id', 'pago__usuario__unidad_habitacional_id', 'monto', 'fecha_pago')
+    actualizados, eliminados, pagados, pagos = [], [], [], set()
+    for detalle_id, gasto_id, pago_id, unidad_id, monto, fecha_pago in existentes:
+        cuota = cuotas_por_gasto[gasto_id].get(unidad_id) if unidad_id in unidades else None
+        if cuota == monto:
+            continue
+        if fecha_pago is not None:
+            pagados.append(detalle_id)
+        elif cuota is None:
+            eliminados.append(detalle_id)
+        else:
+            actualizados.append(PagoDetalle(id=detalle_id, monto=cuota))
+        pagos.add(pago_id)
+    if pagados:
+        raise ValueError(
+            f'El periodo {mes:02d}/{anio} tiene cobros pagados que cambiarían con el prorrateo actual '
+            f'(detalles {sorted(pagados)}); no se puede volver a facturar'
+        )
+    PagoDetalle.objects.bulk_update(actualizados, ['monto'], batch_size=TAMANO_LOTE)
+    PagoDetalle.objects.filter(id__in=eliminados).delete()
+    return len(actualizados), len(eliminados), pagos
+
+
+def generar_cobros_mensuales(complejo, mes, anio, fecha_vencimiento=None, tamano_lote=TAMANO_LOTE, al_avanzar=None):
+    """
+    Genera los Pago y PagoDetalle del periodo `mes`/`anio` para todas las unidades activas de `complejo`,
+    prorrateando los gastos comunes aprobados según metros cuadrados.
+    `al_avanzar(unidades procesadas, total)` se llama después de cada lote.
+
+    Es idempotente: los pagos se identifican por (usuario, periodo) y los detalles por (pago, gasto_comun),
+    por lo que volver a ejecutarla solo agrega los cobros de gastos aprobados después. Si cambiaron las
+    unidades del complejo, los cobros ya emitidos se vuelven a prorratear para que cada gasto siga sumando
+    su monto; si eso afecta cobros ya pagados, lanza ValueError sin modificar nada.
+    """
+    inicio = time.perf_counter()
+    fecha_vencimiento = fecha_vencimiento or fecha_vencimiento_por_defecto(mes, anio)
+
+    gastos = list(
+        GastoComun.objects.filter(complejo=complejo, mes=mes, anio=anio, estado='APROBADO')
+        .order_by('id').values_list('id', 'tipo', 'monto')
+    )
+    metros_por_unidad = dict(
+        UnidadHabitacional.objects.filter(complejo=complejo, activo=True)
+        .order_by('id').values_list('id', 'metros_cuadrados')
+    )
+    if gastos and metros_por_unidad and not sum(metros_por_unidad.values()):
+        raise ValueError(
+            f'Las unidades activas del complejo {complejo.id} no tienen metros cuadrados; '
+            'no se pueden prorratear los gastos comunes'
+        )
+    titulares = _titulares_por_unidad(list(metros_por_unidad))
+    unidades_sin_titular = [unidad_id for unidad_id in metros_por_unidad if unidad_id not in titulares]
+
+    cuotas_por_gasto = {
+        gasto_id: prorratear(monto, metros_por_unidad) for gasto_id, _, monto in gastos
+    }
+    if not cuotas_por_gasto:
+        # Sin gastos aprobados no hay nada que cobrar: no se crean pagos vacíos
+        return _resultado(complejo, mes, anio, inicio, gastos_aprobados=0, unidades_sin_titular=unidades_sin_titular)
+    conceptos = {
+        gasto_id: f"{dict(GastoComun.TIPOS)[tipo]} {mes:02d}/{anio}" for gasto_id, tipo, _ in gastos
+    }
+
+    pagos_creados = 0
+    detalles_creados = 0
+    unidades = [unidad_id for unidad_id in metros_por_unidad if unidad_id in titulares]
+
+    with transaction.atomic():
+        detalles_reprorrateados, detalles_eliminados, pagos_afectados = _reprorratear(
+            mes, anio, cuotas_por_gasto, set(unidades)
+        )
+        actualizar_totales(pagos_afectados)
+
+    for desde in range(0, len(unidades), tamano_lote):
+        lote = unidades[desde:desde + tamano_lote]
+        usuarios_lote = {titulares[unidad_id]: unidad_id for unidad_id in lote}
+
+        with transaction.atomic():
+            existentes = set(
+                Pago.objects.filter(
+                    usuario_id__in=usuarios_lote, periodo_mes=mes, periodo_anio=anio
+                ).values_list('usuario_id', flat=True)
+            )
+            nuevos = [
+                Pago(
+                    usuario_id=usuario_id, fecha_vencimiento=fecha_vencimiento,
+                    periodo_mes=mes, periodo_anio=anio
+                )
+                for usuario_id in usuarios_lote if usuario_id not in existentes
+            ]
+            Pago.objects.bulk_create(nuevos, ignore_conflicts=True)
+            pagos_creados += len(nuevos)
+
+            pagos = dict(
+                Pago.objects.filter(
+                    usuario_id__in=usuarios_lote, periodo_mes=mes, periodo_anio=anio
+                ).values_list('usuario_id', 'id')
+            )
+            facturados = set(
+                PagoDetalle.objects.filter(
+                    pago_id__in=pagos.values(), gasto_comun__isnull=False
+                ).values_list('pago_id', 'gasto_comun_id')
+            )
+
+            detalles = []
+            for usuario_id, pago_id in pagos.items():
+                unidad_id = usuarios_lote[usuario_id]
+                for gasto_id, cuotas in cuotas_por_gasto.items():
+                    if (pago_id, gasto_id) in facturados:
+                        continue
+                    detalles.append(PagoDetalle(
+                        pago_id=pago_id, gasto_comun_id=gasto_id, concepto=conceptos[gasto_id],
+                        monto=cuotas[unidad_id], fecha_vencimiento=fecha_vencimiento
+                    ))
+            PagoDetalle.objects.bulk_create(detalles, ignore_conflicts=True)
+            detalles_creados += len(detalles)
+
+            if detalles:
+                actualizar_totales(pagos.values())
+
+        if al_avanzar is not None:
+            al_avanzar(desde + len(lote), len(unidades))
+
+    # bulk_create no dispara señales
+    invalidar_morosidad(complejo.id)
+    usuarios = {titulares[unidad_id] for unidad_id in unidades}
+    if pagos_afectados:
+        usuarios.update(Pago.objects.filter(id__in=pagos_afectados).values_list('usuario_id', flat=True))
+    invalidar_respuestas('pagos', [f'usuario:{usuario_id}' for usuario_id in sorted(usuarios)])
+
+    return _resultado(
+        complejo, mes, anio, inicio, gastos_aprobados=len(gastos), unidades_facturadas=len(unidades),
+        unidades_sin_titular=unidades_sin_titular, pagos_creados=pagos_creados, detalles_creados=detalles_creados,
+        detalles_reprorrateados=detalles_reprorrateados, detalles_eliminados=detalles_eliminados
+    )
+
+
+def _resultado(complejo, mes, anio, inicio, gastos_aprobados, unidades_sin_titular, unidades_facturadas=0,
+               pagos_creados=0, detalles_creados=0, detalles_reprorrateados=0, detalles_eliminados=0):
+    segundos = time.perf_counter() - inicio
+    filas = pagos_creados + detalles_creados
+    return {
+        'complejo': complejo.id,
+        'mes': mes,
+        'anio': anio,
+        'gastos_aprobados': gastos_aprobados,
+        'unidades_facturadas': unidades_facturadas,
+        'unidades_sin_titular': unidades_sin_titular,
+        'pagos_creados': pagos_creados,
+        'detalles_creados': detalles_creados,
+        'detalles_reprorrateados': detalles_reprorrateados,
+        'detalles_eliminados': detalles_eliminados,
+        'segundos': round(segundos, 3),
+        'filas_por_segundo': round(filas / segundos, 1) if segundos else 0.0,
+    }
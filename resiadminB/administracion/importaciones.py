@@ -0,0 +1,257 @@
+import csv
+import io
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth.base_user import BaseUserManager
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+
+from .basedatos import inicializar_proceso
+from .models import WhiteList, Rol, UnidadHabitacional, Usuario
+from .validators import validar_ruts
+
+TAMANO_LOTE = 1000
+MAX_ERRORES_REPORTADOS = 100
+
+
+def leer_emails_csv(lineas):
+    """
+    Recorre un CSV fila a fila. Usa la columna `email` si hay encabezado; si no, la primera columna.
+    Entrega pares (número de línea, valor).
+    """
+    lector = csv.reader(lineas)
+    columna = 0
+    for numero, fila in enumerate(lector, start=1):
+        if not fila:
+            continue
+        if numero == 1 and '@' not in ''.join(fila):
+            encabezados = [celda.strip().lower() for celda in fila]
+            if 'email' in encabezados:
+                columna = encabezados.index('email')
+            continue
+        yield numero, fila[columna] if columna < len(fila) else ''
+
+
+def leer_emails_jsonl(lineas):
+    """
+    Recorre un archivo JSON lines donde cada línea es un objeto con la clave `email` o un string.
+    """
+    for numero, linea in enumerate(lineas, start=1):
+        linea = linea.strip()
+        if not linea:
+            continue
+        try:
+            dato = json.loads(linea)
+        except ValueError:
+            yield numero, None
+            continue
+        yield numero, dato.get('email') if isinstance(dato, dict) else dato
+
+
+LECTORES = {
+    'csv': leer_emails_csv,
+    'jsonl': leer_emails_jsonl,
+}
+
+
+def abrir_texto(archivo):
+    """
+    Envuelve un archivo subido para leerlo como texto línea a línea, sin cargarlo completo en memoria.
+    """
+    return io.TextIOWrapper(archivo, encoding='utf-8-sig', newline='')
+
+
+def normalizar_email(valor):
+    if not isinstance(valor, str):
+        return None
+    email = BaseUserManager.normalize_email(valor.strip())
+    try:
+        validate_email(email)
+    except ValidationError:
+        return None
+    return email
+
+
+def _insertar_lote(lote, complejo, resultado):
+    # Deduplica dentro del lote y contra el índice único de email
+    unicos = {}
+    for numero, email in lote:
+        if email in unicos:
+            resultado['duplicados'] += 1
+        else:
+            unicos[email] = numero
+    existentes = set(WhiteList.objects.filter(email__in=unicos).values_list('email', flat=True))
+    nuevos = [WhiteList(email=email, complejo=complejo) for email in unicos if email not in existentes]
+    with transaction.atomic():
+        WhiteList.objects.bulk_create(nuevos, ignore_conflicts=True)
+    resultado['aceptados'] += len(nuevos)
+    resultado['duplicados'] += len(existentes)
+
+
+def importar_whitelist(filas, complejo=None, tamano_lote=TAMANO_LOTE, al_avanzar=None):
+    """
+    Importa emails a la WhiteList desde un iterable de (número de línea, valor), en lotes.
+    Solo mantiene en memoria un lote a la vez. `al_avanzar(filas procesadas)` se llama después de cada lote.
+    """
+    resultado = {'procesados': 0, 'aceptados': 0, 'duplicados': 0, 'invalidos': 0, 'errores': []}
+    lote = []
+    for numero, valor in filas:
+        resultado['procesados'] += 1
+        email = normalizar_email(valor)
+        if email is None:
+            resultado['invalidos'] += 1
+            if len(resultado['errores']) < MAX_ERRORES_REPORTADOS:
+                resultado['errores'].append({'linea': numero, 'valor': valor})
+            continue
+        lote.append((numero, email))
+        if len(lote) >= tamano_lote:
+            _insertar_lote(lote, complejo, resultado)
+            lote = []
+            if al_avanzar is not None:
+                al_avanzar(resultado['procesados'])
+    if lote:
+        _insertar_lote(lote, complejo, resultado)
+    return resultado
+
+
+CAMPOS_RESIDENTE = ('email', 'first_name', 'last_name', 'rut', 'telefono', 'unidad', 'password')
+
+
+def leer_residentes_csv(lineas):
+    """
+    Recorre un CSV con encabezado y entrega (número de línea, diccionario con CAMPOS_RESIDENTE).
+    """
+    for numero, fila in enumerate(csv.DictReader(lineas), start=2):
+        yield numero, {campo: (fila.get(campo) or '').strip() for campo in CAMPOS_RESIDENTE}
+
+
+def leer_residentes_jsonl(lineas):
+    for numero, linea in enumerate(lineas, start=1):
+        linea = linea.strip()
+        if not linea:
+            continue
+        try:
+            dato = json.loads(linea)
+        except ValueError:
+            dato = None
+        if not isinstance(dato, dict):
+            yield numero, None
+            continue
+        yield numero, {campo: str(dato.get(campo) or '').strip() for campo in CAMPOS_RESIDENTE}
+
+
+LECTORES_RESIDENTES = {
+    'csv': leer_residentes_csv,
+    'jsonl': leer_residentes_jsonl,
+}
+
+
+def _hashear(password):
+    return make_password(password or None)
+
+
+def hashear_passwords(passwords, procesos=None):
+    """
+    Calcula los hashes en un pool de procesos; PBKDF2 es CPU intensivo y no se beneficia de hilos.
+    """
+    if procesos == 1 or len(passwords) < 2:
+        return [_hashear(password) for password in passwords]
+    procesos = procesos or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=procesos, initializer=inicializar_proceso) as pool:
+        return list(pool.map(_hashear, passwords, chunksize=max(1, len(passwords) // (procesos * 4))))
+
+
+def validar_residentes(filas, complejo):
+    """
+    Valida todas las filas antes de escribir: formato de email y RUT, unidad del complejo
+    y unicidad de email y RUT (en el archivo y en la base de datos).
+    Devuelve (filas válidas, errores).
+    """
+    unidades = dict(
+        UnidadHabitacional.objects.filter(complejo=complejo, activo=True).values_list('numero', 'id')
+    )
+    validas, errores = [], []
+    emails, ruts = set(), set()
+
+    filas = list(filas)
+    ruts_canonicos = validar_ruts([fila['rut'] if fila else None for _, fila in filas])
+    for (numero, fila), rut in zip(filas, ruts_canonicos):
+        if fila is None:
+            errores.append({'linea': numero, 'error': 'Fila con formato inválido'})
+            continue
+        problemas = []
+        email = normalizar_email(fila['email'])
+        if email is None:
+            problemas.append('Email inválido')
+        elif email in emails:
+            problemas.append('Email repetido en el archivo')
+        if rut is None:
+            problemas.append('RUT inválido')
+        elif rut in ruts:
+            problemas.append('RUT repetido en el archivo')
+        if fila['unidad'] not in unidades:
+            problemas.append(f"La unidad {fila['unidad']!r} no existe en el complejo")
+        if not fila['first_name'] or not fila['last_name']:
+            problemas.append('Nombre y apellido son obligatorios')
+        if problemas:
+            errores.append({'linea': numero, 'error': '; '.join(problemas)})
+            continue
+        emails.add(email)
+        ruts.add(rut)
+        validas.append(dict(fila, email=email, rut_normalizado=rut, unidad_id=unidades[fila['unidad']], linea=numero))
+
+    # Un par de consultas para todo el archivo en vez de una por fila
+    comprobaciones = (
+        ('email', emails, 'El email ya está registrado'),
+        ('rut_normalizado', ruts, 'El RUT ya está registrado'),
+    )
+    for campo, valores, mensaje in comprobaciones:
+        existentes = set(Usuario.objects.filter(**{f'{campo}__in': valores}).values_list(campo, flat=True))
+        for fila in validas:
+            if fila[campo] in existentes:
+                errores.append({'linea': fila['linea'], 'error': mensaje})
+    lineas_con_error = {error['linea'] for error in errores}
+    validas = [fila for fila in validas if fila['linea'] not in lineas_con_error]
+    return validas, sorted(errores, key=lambda error: error['linea'])
+
+
+def importar_residentes(filas, complejo, procesos=None, tamano_lote=TAMANO_LOTE):
+    """
+    Crea residentes en bloque. Si alguna fila es inválida no se crea ninguno y se devuelven los errores.
+    Los hashes son los mismos que produce set_password, por lo que el login con check_password funciona igual.
+    """
+    inicio = time.perf_counter()
+    validas, errores = validar_residentes(filas, complejo)
+    if errores:
+        return {'creados': 0, 'errores': errores}
+
+    rol_residente = Rol.objects.get(nombre='RESIDENTE')
+    hashes = hashear_passwords([fila['password'] for fila in validas], procesos=procesos)
+    usuarios = [
+        Usuario(
+            email=fila['email'], first_name=fila['first_name'], last_name=fila['last_name'],
+            rut=fila['rut'], rut_normalizado=fila['rut_normalizado'], telefono=fila['telefono'],
+            password=password_hash,
+            rol=rol_residente, unidad_habitacional_id=fila['unidad_id']
+        )
+        for fila, password_hash in zip(validas, hashes)
+    ]
+    with transaction.atomic():
+        Usuario.objects.bulk_create(usuarios, batch_size=tamano_lote)
+        registrados = WhiteList.objects.filter(
+            email__in=[usuario.email for usuario in usuarios]
+        ).update(estado='REGISTRADO')
+
+    segundos = time.perf_counter() - inicio
+    return {
+        'creados': len(usuarios),
+        'whitelist_registrados': registrados,
+        'errores': [],
+        'segundos': round(segundos, 3),
+        'usuarios_por_segundo': round(len(usuarios) / segundos, 1) if segundos else 0.0,
+    }
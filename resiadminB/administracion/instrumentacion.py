@@ -0,0 +1,230 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+# Límites superiores de cada bucket (Prometheus agrega +Inf)
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_CONSULTAS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+BUCKETS_BYTES = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+PREFIJO = 'resiadmin'
+
+# Medición de la petición en curso; el serializador suma aquí el tiempo de `.data`
+_medicion = ContextVar('medicion_peticion', default=None)
+
+
+class Histograma:
+    """
+    Histograma acumulativo al estilo Prometheus. Observar es una búsqueda binaria y tres sumas bajo un lock.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.conteos = [0] * (len(buckets) + 1)
+        self.suma = 0.0
+        self.total = 0
+        self._lock = threading.Lock()
+
+    def observar(self, valor):
+        posicion = bisect_left(self.buckets, valor)
+        with self._lock:
+            self.conteos[posicion] += 1
+            self.suma += valor
+            self.total += 1
+
+    def instantanea(self):
+        with self._lock:
+            return list(self.conteos), self.suma, self.total
+
+
+class Registro:
+    """
+    Histogramas y contadores en memoria del proceso, indexados por nombre y etiquetas.
+    Con varios procesos (workers de gunicorn/uvicorn) cada uno expone los suyos; Prometheus los agrega.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histogramas = {}
+        self._contadores = {}
+        self._ayudas = {}
+
+    def histograma(self, nombre, buckets, ayuda, **etiquetas):
+        clave = (nombre, tuple(sorted(etiquetas.items())))
+        histograma = self._histogramas.get(clave)
+        if histograma is None:
+            with self._lock:
+                histograma = self._histogramas.setdefault(clave, Histograma(buckets))
+                self._ayudas.setdefault(nombre, ('histogram', ayuda))
+        return histograma
+
+    def incrementar(self, nombre, ayuda, **etiquetas):
+        clave = (nombre, tuple(sorted(etiquetas.items())))
+        with self._lock:
+            self._contadores[clave] = self._contadores.get(clave, 0) + 1
+            self._ayudas.setdefault(nombre, ('counter', ayuda))
+
+    def limpiar(self):
+        with self._lock:
+            self._histogramas.clear()
+            self._contadores.clear()
+            self._ayudas.clear()
+
+    def exportar(self):
+        """
+        Formato de texto de Prometheus (versión 0.0.4).
+        """
+        with self._lock:
+            histogramas = sorted(self._histogramas.items())
+            contadores = sorted(self._contadores.items())
+            ayudas = dict(self._ayudas)
+        lineas = []
+        anterior = None
+        for (nombre, etiquetas), histograma in histogramas:
+            if nombre != anterior:
+                lineas += _encabezado(nombre, ayudas[nombre])
+                anterior = nombre
+            conteos, suma, total = histograma.instantanea()
+            acumulado = 0
+            for limite, conteo in zip((*histograma.buckets, '+Inf'), conteos):
+                acumulado += conteo
+                lineas.append(f'{nombre}_bucket{_etiquetas(etiquetas, le=limite)} {acumulado}')
+            lineas.append(f'{nombre}_sum{_etiquetas(etiquetas)} {suma}')
+            lineas.append(f'{nombre}_count{_etiquetas(etiquetas)} {total}')
+        for (nombre, etiquetas), valor in contadores:
+            if nombre != anterior:
+                lineas += _encabezado(nombre, ayudas[nombre])
+                anterior = nombre
+            lineas.append(f'{nombre}{_etiquetas(etiquetas)} {valor}')
+        return '\n'.join(lineas) + '\n'
+
+
+def _encabezado(nombre, tipo_y_ayuda):
+    tipo, ayuda = tipo_y_ayuda
+    return [f'# HELP {nombre} {ayuda}', f'# TYPE {nombre} {tipo}']
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _etiquetas(etiquetas, **extra):
+    pares = [*etiquetas, *extra.items()]
+    if not pares:
+        return ''
+    return '{' + ','.join(f'{clave}="{_escapar(valor)}"' for clave, valor in pares) + '}'
+
+
+registro = Registro()
+
+
+def iniciar_medicion():
+    medicion = {'sql_consultas': 0, 'sql_segundos': 0.0, 'serializacion_segundos': 0.0, 'serializando': False}
+    return medicion, _medicion.set(medicion)
+
+
+def terminar_medicion(token):
+    _medicion.reset(token)
+
+
+def medir_sql(execute, sql, params, many, context):
+    """
+    execute_wrapper que suma las consultas y su duración a la petición en curso sin activar el cursor de
+    depuración. Lee la medición del ContextVar, que sync_to_async copia al hilo donde corren las vistas
+    sync bajo ASGI y las consultas de las vistas async.
+    """
+    medicion = _medicion.get()
+    if medicion is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        medicion['sql_segundos'] += time.perf_counter() - inicio
+        medicion['sql_consultas'] += 1
+
+
+def instrumentar_conexion(sender, connection, **kwargs):
+    """
+    Receptor de connection_created: instala medir_sql una vez en cada conexión, sea cual sea el hilo
+    que la abre.
+    """
+    if medir_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.append(medir_sql)
+
+
+@contextmanager
+def medir_serializacion():
+    """
+    Suma el tiempo del bloque a la serialización de la petición en curso.
+    Un bloque dentro de otro (serializadores anidados o listas) se cuenta una sola vez.
+    """
+    medicion = _medicion.get()
+    if medicion is None or medicion['serializando']:
+        yield
+        return
+    medicion['serializando'] = True
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        medicion['serializacion_segundos'] += time.perf_counter() - inicio
+        medicion['serializando'] = False
+
+
+def medir_data(propiedad):
+    """
+    Envuelve la propiedad `data` de un serializador para sumar su tiempo a la medición de la petición.
+    """
+    original = propiedad.fget
+
+    @wraps(original)
+    def data(self):
+        with medir_serializacion():
+            return original(self)
+
+    return property(data)
+
+
+def instrumentar_serializadores():
+    from rest_framework import serializers
+
+    for clase in (serializers.Serializer, serializers.ListSerializer):
+        if not getattr(clase.data.fget, 'instrumentado', False):
+            clase.data = medir_data(clase.data)
+            clase.data.fget.instrumentado = True
+
+
+def registrar_peticion(vista, metodo, estado, duracion, medicion, tamano):
+    registro.incrementar(
+        f'{PREFIJO}_peticiones_total', 'Peticiones atendidas', vista=vista, metodo=metodo, estado=estado
+    )
+    registro.histograma(
+        f'{PREFIJO}_peticion_segundos', BUCKETS_SEGUNDOS, 'Duración total de la petición', vista=vista
+    ).observar(duracion)
+    registro.histograma(
+        f'{PREFIJO}_sql_consultas', BUCKETS_CONSULTAS, 'Consultas SQL por petición', vista=vista
+    ).observar(medicion['sql_consultas'])
+    registro.histograma(
+        f'{PREFIJO}_sql_segundos', BUCKETS_SEGUNDOS, 'Tiempo en SQL por petición', vista=vista
+    ).observar(medicion['sql_segundos'])
+    registro.histograma(
+        f'{PREFIJO}_serializacion_segundos', BUCKETS_SEGUNDOS, 'Tiempo en serializer.data por petición', vista=vista
+    ).observar(medicion['serializacion_segundos'])
+    if tamano is not None:
+        registro.histograma(
+            f'{PREFIJO}_respuesta_bytes', BUCKETS_BYTES, 'Tamaño del cuerpo de la respuesta', vista=vista
+        ).observar(tamano)
+
+
+def nombre_vista(view_func, metodo):
+    """
+    Etiqueta de la vista: `PagoViewSet.list` para viewsets y el nombre de la función para las demás.
+    """
+    acciones = getattr(view_func, 'actions', None)
+    if acciones:
+        return f'{view_func.cls.__name__}.{acciones.get(metodo.lower(), metodo.lower())}'
+    return getattr(view_func, '__name__', 'desconocida')
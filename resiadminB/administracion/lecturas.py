@@ -0,0 +1,198 @@
+import decimal
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import F
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.settings import ISO_8601, api_settings
+
+from .instrumentacion import medir_serializacion
+
+# Campos cuyo to_representation devuelve tal cual lo que entrega values() (str, int o bool ya convertidos)
+CAMPOS_DIRECTOS = (
+    serializers.CharField, serializers.IntegerField, serializers.BooleanField, serializers.ChoiceField,
+    serializers.PrimaryKeyRelatedField,
+)
+
+
+def _sin_nulos(convertir):
+    # Serializer.to_representation deja en None los atributos nulos sin llamar al campo
+    def convertidor(valor):
+        return None if valor is None else convertir(valor)
+    return convertidor
+
+
+def _mapeador_decimal(campo):
+    if (not getattr(campo, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+            or campo.localize or campo.normalize_output):
+        return campo.to_representation
+    # Mismo redondeo que DecimalField.quantize, con el contexto armado una sola vez
+    contexto = decimal.getcontext().copy()
+    if campo.max_digits is not None:
+        contexto.prec = campo.max_digits
+    if campo.rounding is not None:
+        contexto.rounding = campo.rounding
+    exponente = decimal.Decimal('.1') ** campo.decimal_places if campo.decimal_places is not None else None
+
+    def convertir(valor):
+        if not isinstance(valor, decimal.Decimal):
+            valor = decimal.Decimal(str(valor).strip())
+        if exponente is not None:
+            valor = valor.quantize(exponente, context=contexto)
+        return f'{valor:f}'
+    return convertir
+
+
+def _mapeador_fecha_hora(campo):
+    formato = getattr(campo, 'format', api_settings.DATETIME_FORMAT)
+    if formato is None or formato.lower() != ISO_8601 or hasattr(campo, 'timezone'):
+        return campo.to_representation
+
+    def convertir(valor):
+        if timezone.is_naive(valor):
+            return campo.to_representation(valor)
+        # La zona activa puede cambiar por petición: se consulta en cada valor, como enforce_timezone
+        texto = valor.astimezone(timezone.get_current_timezone()).isoformat()
+        return texto[:-6] + 'Z' if texto.endswith('+00:00') else texto
+    return convertir
+
+
+def _mapeador_fecha(campo):
+    formato = getattr(campo, 'format', api_settings.DATE_FORMAT)
+    if formato is None or formato.lower() != ISO_8601:
+        return campo.to_representation
+    return lambda valor: valor.isoformat()
+
+
+def _mapeador(campo):
+    """
+    Función que convierte el valor de la columna en lo que devolvería `campo.to_representation`,
+    o None si el valor se copia tal cual.
+    """
+    if isinstance(campo, serializers.DecimalField):
+        return _sin_nulos(_mapeador_decimal(campo))
+    if isinstance(campo, serializers.DateTimeField):
+        return _sin_nulos(_mapeador_fecha_hora(campo))
+    if isinstance(campo, serializers.DateField):
+        return _sin_nulos(_mapeador_fecha(campo))
+    if isinstance(campo, CAMPOS_DIRECTOS):
+        return None
+    return _sin_nulos(campo.to_representation)
+
+
+class LecturaRapida:
+    """
+    Representación de solo lectura de un ModelSerializer armada desde filas de values(), sin instanciar
+    modelos ni recorrer los campos del serializador por cada fila.
+    Los campos del serializador (ya configurado con sus campos y expansiones) se compilan una sola vez en una
+    lista de (clave, columna, conversión); los serializadores anidados se aplanan en columnas con join y las
+    relaciones many=True de primer nivel, anidadas o como lista de IDs, se cargan con una consulta por página.
+    El JSON resultante es idéntico al del serializador.
+    """
+
+    def __init__(self, serializer):
+        self.modelo = serializer.Meta.model
+        columnas = []
+        self.pasos = self._compilar(serializer, self.modelo, '', columnas)
+        self.relaciones = [
+            self._compilar_relacion(self.modelo, campo) for campo in serializer._readable_fields
+            if isinstance(campo, (serializers.ListSerializer, serializers.ManyRelatedField))
+        ]
+        if self.relaciones:
+            # Las filas hijas se asignan a su padre por clave primaria
+            columnas.append(self.modelo._meta.pk.name)
+        self.columnas = list(dict.fromkeys(columnas))
+
+    def _compilar(self, serializer, modelo, prefijo, columnas):
+        pasos = []
+        for campo in serializer._readable_fields:
+            if isinstance(campo, (serializers.ListSerializer, serializers.ManyRelatedField)):
+                if prefijo:
+                    raise ImproperlyConfigured(
+                        f'{type(serializer).__name__}.{campo.field_name}: solo se admiten relaciones many=True de primer nivel'
+                    )
+                # Se completa después con su propia consulta
+                pasos.append((campo.field_name, None, None, None))
+                continue
+            if '.' in campo.source or campo.source == '*':
+                raise ImproperlyConfigured(
+                    f'{type(serializer).__name__}.{campo.field_name}: source {campo.source!r} no es una columna'
+                )
+            if isinstance(campo, serializers.BaseSerializer):
+                relacionado = modelo._meta.get_field(campo.source).related_model
+                anidado_prefijo = f'{prefijo}{campo.source}__'
+                clave_nula = f'{anidado_prefijo}{relacionado._meta.pk.name}'
+                columnas.append(clave_nula)
+                anidados = self._compilar(campo, relacionado, anidado_prefijo, columnas)
+                pasos.append((campo.field_name, clave_nula, None, anidados))
+                continue
+            columna = f'{prefijo}{campo.source}'
+            columnas.append(columna)
+            pasos.append((campo.field_name, columna, _mapeador(campo), None))
+        return pasos
+
+    def _compilar_relacion(self, modelo, campo):
+        relacion = modelo._meta.get_field(campo.source)
+        # Nombre con el que el modelo relacionado filtra por este (reserva, notificaciones_recibidas, ...)
+        if relacion.auto_created:
+            consulta = relacion.field.name
+        else:
+            consulta = relacion.related_query_name()
+        relacionado = relacion.related_model
+        pk = relacionado._meta.pk.name
+        orden = relacionado._meta.ordering or [pk]
+        if isinstance(campo, serializers.ManyRelatedField):
+            # Lista de IDs: basta la clave primaria de cada fila relacionada
+            return campo.field_name, relacionado, consulta, [pk], None, orden
+        columnas = []
+        pasos = self._compilar(campo.child, relacionado, '', columnas)
+        return campo.field_name, relacionado, consulta, columnas, pasos, orden
+
+    def _convertir(self, fila, pasos):
+        resultado = {}
+        for clave, columna, convertir, anidados in pasos:
+            if anidados is not None:
+                resultado[clave] = None if fila[columna] is None else self._convertir(fila, anidados)
+            elif columna is None:
+                resultado[clave] = []
+            elif convertir is None:
+                resultado[clave] = fila[columna]
+            else:
+                resultado[clave] = convertir(fila[columna])
+        return resultado
+
+    def representar(self, filas):
+        """
+        Lista de diccionarios con la forma de `serializer.data` (many=True) para filas de
+        `queryset.values(*self.columnas)`.
+        """
+        with medir_serializacion():
+            datos = [self._convertir(fila, self.pasos) for fila in filas]
+            if self.relaciones and datos:
+                pk = self.modelo._meta.pk.name
+                por_pk = {fila[pk]: dato for fila, dato in zip(filas, datos)}
+                for clave, modelo, consulta, columnas, pasos, orden in self.relaciones:
+                    hijas = modelo._default_manager.filter(**{f'{consulta}__in': list(por_pk)}).order_by(*orden)
+                    for hija in hijas.values(*columnas, padre_lectura=F(consulta)):
+                        valor = hija[columnas[0]] if pasos is None else self._convertir(hija, pasos)
+                        por_pk[hija['padre_lectura']][clave].append(valor)
+        return datos
+
+
+# Lecturas compiladas por clase de serializador y combinación de campos pedida
+_compiladas = {}
+MAXIMO_COMPILADAS = 256
+
+
+def lectura_para(serializer):
+    """
+    LecturaRapida de `serializer`, compilada una vez por combinación de ?fields= y ?expand=.
+    """
+    firma = getattr(serializer, 'firma', type(serializer))
+    lectura = _compiladas.get(firma)
+    if lectura is None:
+        if len(_compiladas) >= MAXIMO_COMPILADAS:
+            # Combinaciones arbitrarias de parámetros no deben hacer crecer la memoria sin límite
+            _compiladas.clear()
+        lectura = _compiladas[firma] = LecturaRapida(serializer)
+    return lectura
@@ -0,0 +1,228 @@
+import csv
+import json
+from datetime import date
+from decimal import Decimal
+
+from django.db.models import Case, DecimalField, Exists, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .basedatos import ejecutar_con_reintentos
+from .models import Pago, PagoDetalle
+from .morosidad import invalidar_morosidad
+from .multas import CENTAVOS, TAMANO_LOTE, calcular_multa_detalle, configuraciones_activas
+from .respuestas import invalidar_respuestas
+
+# Resultado de cada ítem de una liquidación
+LIQUIDADO = 'LIQUIDADO'
+YA_PAGADO = 'YA_PAGADO'
+PAGO_CANCELADO = 'PAGO_CANCELADO'
+NO_ENCONTRADO = 'NO_ENCONTRADO'
+NO_AUTORIZADO = 'NO_AUTORIZADO'
+DUPLICADO = 'DUPLICADO'
+INVALIDO = 'INVALIDO'
+
+
+def _celda(fila, columna):
+    return fila[columna].strip() if columna is not None and columna < len(fila) else None
+
+
+def leer_conciliacion_csv(lineas):
+    """
+    CSV de conciliación bancaria con las columnas `id` (o `detalle`) y `fecha_pago` (opcional).
+    Sin encabezado se toman en ese orden. Entrega tuplas (número de línea, id, fecha de pago).
+    """
+    lector = csv.reader(lineas)
+    columna_id, columna_fecha = 0, 1
+    for numero, fila in enumerate(lector, start=1):
+        if not fila:
+            continue
+        if numero == 1 and not fila[0].strip().isdigit():
+            encabezados = [celda.strip().lower() for celda in fila]
+            columna_id = next((encabezados.index(nombre) for nombre in ('id', 'detalle') if nombre in encabezados), 0)
+            columna_fecha = encabezados.index('fecha_pago') if 'fecha_pago' in encabezados else None
+            continue
+        yield numero, _celda(fila, columna_id), _celda(fila, columna_fecha)
+
+
+def leer_conciliacion_jsonl(lineas):
+    """
+    JSON lines donde cada línea es un objeto con `id` y `fecha_pago` (opcional) o solo el id.
+    """
+    for numero, linea in enumerate(lineas, start=1):
+        linea = linea.strip()
+        if not linea:
+            continue
+        try:
+            dato = json.loads(linea)
+        except ValueError:
+            yield numero, None, None
+            continue
+        yield (numero, *_id_y_fecha(dato))
+
+
+LECTORES_CONCILIACION = {
+    'csv': leer_conciliacion_csv,
+    'jsonl': leer_conciliacion_jsonl,
+}
+
+
+def _id_y_fecha(dato):
+    if isinstance(dato, dict):
+        return dato.get('id'), dato.get('fecha_pago')
+    return dato, None
+
+
+def items_de_lista(detalles):
+    """
+    Ítems de una lista de ids u objetos {id, fecha_pago}; la "línea" es la posición en la lista.
+    """
+    for posicion, dato in enumerate(detalles, start=1):
+        yield (posicion, *_id_y_fecha(dato))
+
+
+def _interpretar(valor_id, valor_fecha, fecha_por_defecto, hoy):
+    """
+    Devuelve (id, fecha de pago) o lanza ValueError con el motivo.
+    """
+    try:
+        if isinstance(valor_id, bool) or not isinstance(valor_id, (int, str)):
+            raise ValueError
+        detalle_id = int(valor_id)
+        if detalle_id <= 0:
+            raise ValueError
+    except ValueError:
+        raise ValueError('id inválido') from None
+    if valor_fecha in (None, ''):
+        fecha_pago = fecha_por_defecto
+    elif isinstance(valor_fecha, str):
+        try:
+            fecha_pago = date.fromisoformat(valor_fecha)
+        except ValueError:
+            raise ValueError('fecha_pago debe tener el formato AAAA-MM-DD') from None
+    else:
+        raise ValueError('fecha_pago debe tener el formato AAAA-MM-DD')
+    if fecha_pago > hoy:
+        raise ValueError('fecha_pago no puede ser futura')
+    return detalle_id, fecha_pago
+
+
+def _lotes(valores, tamano):
+    valores = list(valores)
+    for desde in range(0, len(valores), tamano):
+        yield valores[desde:desde + tamano]
+
+
+def _aplicar(solicitados, complejos, tamano_lote):
+    """
+    Marca como pagados los detalles pendientes de `solicitados` ({id: fecha de pago}), calcula sus multas y
+    recalcula estado y monto_total de sus pagos. Se ejecuta completa dentro de una transacción.
+    """
+    configuraciones = configuraciones_activas()
+    resultados = {}
+    cambios = []
+    pagos = set()
+    afectados = {'usuarios': set(), 'complejos': set()}
+
+    for lote in _lotes(solicitados, tamano_lote):
+        filas = PagoDetalle.objects.filter(id__in=lote).values_list(
+            'id', 'pago_id', 'monto', 'fecha_vencimiento', 'fecha_pago', 'dias_atraso', 'pago__estado',
+            'pago__usuario_id', 'pago__usuario__unidad_habitacional__complejo_id'
+        )
+        for detalle_id, pago_id, monto, vencimiento, pagado_el, dias, estado, usuario_id, complejo_id in filas:
+            if complejos is not None and complejo_id not in complejos:
+                resultados[detalle_id] = {'resultado': NO_AUTORIZADO}
+                continue
+            if pagado_el is not None:
+                resultados[detalle_id] = {'resultado': YA_PAGADO, 'fecha_pago': pagado_el.isoformat(), 'pago': pago_id}
+                continue
+            if estado == 'CANCELADO':
+                # Un pago cancelado ya no se cobra: sus detalles no se liquidan
+                resultados[detalle_id] = {'resultado': PAGO_CANCELADO, 'pago': pago_id}
+                continue
+            fecha_pago = solicitados[detalle_id]
+            multa, nuevos_dias = calcular_multa_detalle(monto, vencimiento, fecha_pago, configuraciones.get(complejo_id))
+            multa = multa.quantize(CENTAVOS)
+            if nuevos_dias is None:
+                nuevos_dias = dias
+            cambios.append(PagoDetalle(id=detalle_id, fecha_pago=fecha_pago, multa=multa, dias_atraso=nuevos_dias))
+            resultados[detalle_id] = {
+                'resultado': LIQUIDADO, 'fecha_pago': fecha_pago.isoformat(), 'multa': f'{multa:f}',
+                'dias_atraso': nuevos_dias, 'pago': pago_id,
+            }
+            pagos.add(pago_id)
+            afectados['usuarios'].add(usuario_id)
+            afectados['complejos'].add(complejo_id)
+
+    PagoDetalle.objects.bulk_update(cambios, ['fecha_pago', 'multa', 'dias_atraso'], batch_size=tamano_lote)
+
+    # Estado y total de cada pago calculados en la base a partir de todos sus detalles
+    detalles = PagoDetalle.objects.filter(pago=OuterRef('pk'))
+    total = detalles.values('pago').annotate(total=Sum(F('monto') + F('multa'))).values('total')
+    estados = {}
+    for lote in _lotes(pagos, tamano_lote):
+        Pago.objects.filter(id__in=lote).update(
+            monto_total=Coalesce(
+                Subquery(total), Value(Decimal('0.00')), output_field=DecimalField(max_digits=10, decimal_places=2)
+            ),
+            estado=Case(
+                When(estado='CANCELADO', then=F('estado')),
+                When(Exists(detalles.filter(fecha_pago__isnull=True)), then=Value('PENDIENTE')),
+                default=Value('PAGADO'),
+            ),
+        )
+        estados.update(Pago.objects.filter(id__in=lote).values_list('id', 'estado'))
+    for resultado in resultados.values():
+        if resultado['resultado'] == LIQUIDADO:
+            resultado['estado_pago'] = estados[resultado['pago']]
+    return resultados, afectados, len(pagos)
+
+
+def liquidar_detalles(items, fecha_pago=None, complejos=None, tamano_lote=TAMANO_LOTE):
+    """
+    Registra el pago de muchos PagoDetalle en una sola transacción.
+    `items` son tuplas (línea, id, fecha de pago); la fecha puede faltar y entonces se usa `fecha_pago`
+    (hoy por defecto). `complejos` limita los detalles a esos complejos (None = todos).
+    Los detalles ya pagados no se modifican, así que volver a subir el mismo archivo no cambia nada; tampoco
+    los de pagos CANCELADO.
+    Lee `items` completo antes de escribir: un error al leerlos (p. ej. UnicodeDecodeError) no deja cambios.
+    Devuelve los totales y el resultado de cada ítem en el orden recibido.
+    """
+    hoy = timezone.localdate()
+    fecha_por_defecto = fecha_pago or hoy
+    items_resultado = []
+    solicitados = {}
+    for linea, valor_id, valor_fecha in items:
+        try:
+            detalle_id, fecha = _interpretar(valor_id, valor_fecha, fecha_por_defecto, hoy)
+        except ValueError as error:
+            items_resultado.append({'linea': linea, 'id': valor_id, 'resultado': INVALIDO, 'error': str(error)})
+            continue
+        if detalle_id in solicitados:
+            items_resultado.append({'linea': linea, 'id': detalle_id, 'resultado': DUPLICADO})
+            continue
+        solicitados[detalle_id] = fecha
+        items_resultado.append({'linea': linea, 'id': detalle_id})
+
+    resultados, afectados, pagos_actualizados = ejecutar_con_reintentos(_aplicar, solicitados, complejos, tamano_lote)
+
+    # update y bulk_update no disparan las señales que invalidan las cachés
+    for complejo_id in afectados['complejos']:
+        invalidar_morosidad(complejo_id)
+    if afectados['usuarios']:
+        invalidar_respuestas('pagos', [f'usuario:{usuario_id}' for usuario_id in afectados['usuarios']])
+
+    totales = {
+        resultado: 0
+        for resultado in (LIQUIDADO, YA_PAGADO, PAGO_CANCELADO, NO_ENCONTRADO, NO_AUTORIZADO, DUPLICADO, INVALIDO)
+    }
+    for item in items_resultado:
+        if 'resultado' not in item:
+            item.update(resultados.get(item['id'], {'resultado': NO_ENCONTRADO}))
+        totales[item['resultado']] += 1
+    return {
+        'procesados': len(items_resultado),
+        'totales': totales,
+        'pagos_actualizados': pagos_actualizados,
+        'detalles': items_resultado,
+    }
@@ -0,0 +1,261 @@
+import json
+import statistics
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from administracion.models import Rol, Usuario
+from administracion.lecturas import LecturaRapida
+from administracion.poblado import armar_configuracion, crear_roles, poblar_complejos, rut
+from administracion.views import NotificacionViewSet, PagoViewSet, ReservaViewSet
+
+CLAVE = 'benchmark-api'
+DOMINIO = 'benchmark.test'
+RUT_INICIAL = 50000000
+# Métricas comparadas entre corridas; las de latencia con tolerancia relativa, las consultas sin tolerancia
+METRICAS_LATENCIA = ('p50_ms', 'p95_ms', 'p99_ms')
+# Listados con lectura rápida cuyo costo por fila se compara con el del serializador (--serializacion)
+LISTADOS_RAPIDOS = (('pagos', PagoViewSet), ('reservas', ReservaViewSet), ('notificaciones', NotificacionViewSet))
+
+
+class Rollback(Exception):
+    pass
+
+
+def _percentil(valores, percentil):
+    if len(valores) == 1:
+        return valores[0]
+    return statistics.quantiles(valores, n=100, method='inclusive')[percentil - 1]
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide latencia (p50/p95/p99), consultas por petición, memoria máxima y tamaño de respuesta de los '
+        'endpoints principales con datos sintéticos a varias escalas, y guarda el resultado en JSON. '
+        'Con --comparar informa las regresiones respecto de una corrida anterior. '
+        'Corre sobre una base de pruebas desechable (como manage.py test) salvo con --base-actual; '
+        'en ambos casos los datos se crean dentro de una transacción que se revierte al terminar cada escala.'
+    )
+
+    # (nombre, método, ruta, usuario que hace la petición). Los residentes ven solo lo suyo;
+    # el administrador ve todas las filas, que es lo que crece con la escala.
+    ENDPOINTS = (
+        ('pagos', 'get', '/api/pagos/', 'residente'),
+        ('pagos_todos', 'get', '/api/pagos/', 'administrador'),
+        ('reservas', 'get', '/api/reservas/', 'residente'),
+        ('reservas_todas', 'get', '/api/reservas/', 'administrador'),
+        ('notificaciones', 'get', '/api/notificaciones/', 'residente'),
+        ('notificaciones_todas', 'get', '/api/notificaciones/', 'administrador'),
+        ('gastos_comunes', 'get', '/api/gastos-comunes/?complejo={complejo}', 'residente'),
+        ('login', 'post', '/api/usuarios/login/', None),
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--escalas', type=int, nargs='+', default=[10, 100, 1000], help='Unidades por complejo en cada escala'
+        )
+        parser.add_argument('--complejos', type=int, default=3)
+        parser.add_argument('--repeticiones', type=int, default=30)
+        parser.add_argument('--endpoints', nargs='+', choices=[nombre for nombre, *_ in self.ENDPOINTS])
+        parser.add_argument('--salida', default='benchmark_api.json', help='Archivo JSON con los resultados')
+        parser.add_argument('--comparar', help='JSON de una corrida anterior contra el que buscar regresiones')
+        parser.add_argument(
+            '--umbral', type=float, default=0.25,
+            help='Aumento relativo de latencia que cuenta como regresión (0.25 = 25%%)'
+        )
+        parser.add_argument(
+            '--base-actual', action='store_true', help='Medir sobre la base configurada en vez de una de pruebas'
+        )
+        parser.add_argument(
+            '--serializacion', action='store_true',
+            help='Medir además el costo por fila de los listados con serializador y con lectura rápida'
+        )
+
+    def handle(self, *args, **options):
+        endpoints = [e for e in self.ENDPOINTS if not options['endpoints'] or e[0] in options['endpoints']]
+        # Un solo hash para todos los usuarios: calcularlo por usuario dominaría el tiempo de poblado
+        self.password = make_password(CLAVE)
+        if not options['base_actual']:
+            nombre_original = connection.settings_dict['NAME']
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            resultados = {}
+            serializacion = {}
+            for escala in options['escalas']:
+                self.stdout.write(f'Escala {escala} unidades por complejo')
+                try:
+                    with transaction.atomic():
+                        muestra = self._poblar(escala, options['complejos'])
+                        resultados[str(escala)] = self._medir_escala(muestra, endpoints, options['repeticiones'])
+                        if options['serializacion']:
+                            serializacion[str(escala)] = self._medir_serializacion(options['repeticiones'])
+                        raise Rollback
+                except Rollback:
+                    pass
+        finally:
+            if not options['base_actual']:
+                connection.creation.destroy_test_db(nombre_original, verbosity=0)
+
+        informe = {
+            'fecha': timezone.now().isoformat(),
+            'base_de_datos': connection.vendor,
+            'complejos': options['complejos'],
+            'repeticiones': options['repeticiones'],
+            'resultados': resultados,
+        }
+        if options['serializacion']:
+            informe['serializacion'] = serializacion
+        with open(options['salida'], 'w', encoding='utf-8') as archivo:
+            json.dump(informe, archivo, indent=2)
+        self.stdout.write(f"Resultados guardados en {options['salida']}")
+
+        if options['comparar']:
+            with open(options['comparar'], encoding='utf-8') as archivo:
+                anterior = json.load(archivo)
+            regresiones = self._comparar(anterior['resultados'], resultados, options['umbral'])
+            if regresiones:
+                raise CommandError(f'{regresiones} regresiones respecto de {options["comparar"]}')
+            self.stdout.write(self.style.SUCCESS('Sin regresiones'))
+
+    def _poblar(self, escala, cantidad_complejos):
+        # Los mismos complejos que genera seed_scale, con `escala` unidades cada uno y su propio dominio y RUT
+        # para no chocar con datos generados antes en la base actual
+        configuracion = armar_configuracion(
+            complejos=cantidad_complejos, unidades=escala, meses=12, reservas=3, notificaciones=escala,
+            destinatarios=10, semilla=escala, password=self.password, dominio=DOMINIO, rut_inicial=RUT_INICIAL
+        )
+        crear_roles()
+        poblar_complejos(list(range(cantidad_complejos)), configuracion)
+        # Las vistas de pagos, reservas y notificaciones muestran todas las filas a SUPERADMIN
+        rol_administrador, _ = Rol.objects.get_or_create(nombre='SUPERADMIN')
+        administrador = Usuario.objects.create(
+            email=f'administrador@{DOMINIO}', rut=rut(RUT_INICIAL - 1), password=self.password,
+            rol=rol_administrador, is_superuser=True
+        )
+
+        residentes = Usuario.objects.filter(email__endswith=f'@{DOMINIO}', unidad_habitacional__isnull=False)
+        residente = residentes.select_related('unidad_habitacional').order_by('id')[residentes.count() // 2]
+        return {
+            'residente': residente,
+            'administrador': administrador,
+            'complejo': residente.unidad_habitacional.complejo_id,
+        }
+
+    def _medir_escala(self, muestra, endpoints, repeticiones):
+        resultados = {}
+        for nombre, metodo, ruta, usuario in endpoints:
+            cliente = APIClient()
+            datos = None
+            if usuario is None:
+                datos = {'email': muestra['residente'].email, 'password': CLAVE}
+            else:
+                cliente.force_authenticate(user=muestra[usuario])
+            ruta = ruta.format(complejo=muestra['complejo'])
+            # El cliente de pruebas usa el host 'testserver', como en manage.py test
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                resultados[nombre] = self._medir(cliente, metodo, ruta, datos, repeticiones)
+            resultado = resultados[nombre]
+            self.stdout.write(
+                f"  {nombre}: p50 {resultado['p50_ms']:.1f} ms, p95 {resultado['p95_ms']:.1f} ms, "
+                f"p99 {resultado['p99_ms']:.1f} ms, {resultado['consultas']} consultas, "
+                f"{resultado['memoria_pico_kb']:.0f} KB, {resultado['bytes']} bytes"
+            )
+        return resultados
+
+    def _medir(self, cliente, metodo, ruta, datos, repeticiones):
+        def pedir():
+            # Sin caché de respuestas: se mide el trabajo completo de la vista
+            cache.clear()
+            return getattr(cliente, metodo)(ruta, datos, format='json')
+
+        response = pedir()
+        if response.status_code >= 400:
+            raise CommandError(f'{metodo.upper()} {ruta} respondió {response.status_code}')
+
+        # Con DEBUG el registro de consultas tiene un máximo; vaciarlo para que el poblado no lo deje lleno
+        reset_queries()
+        with CaptureQueriesContext(connection) as contexto:
+            pedir()
+        consultas = len(contexto)
+        tracemalloc.start()
+        pedir()
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        tiempos = []
+        for _ in range(repeticiones):
+            cache.clear()
+            inicio = time.perf_counter()
+            getattr(cliente, metodo)(ruta, datos, format='json')
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        return {
+            'p50_ms': _percentil(tiempos, 50),
+            'p95_ms': _percentil(tiempos, 95),
+            'p99_ms': _percentil(tiempos, 99),
+            'consultas': consultas,
+            'memoria_pico_kb': pico / 1024,
+            'bytes': len(response.content),
+        }
+
+    def _medir_serializacion(self, repeticiones, filas=1000):
+        """
+        Microsegundos por fila de leer y representar `filas` filas de cada listado: instancias con el plan de
+        eager loading y serializador, contra filas de values() con la lectura rápida.
+        """
+        resultados = {}
+        for nombre, vista in LISTADOS_RAPIDOS:
+            queryset = vista.queryset.order_by(*vista.orden_paginacion)
+            # Con todas las relaciones anidadas, el caso más caro de ambos caminos
+            lectura = LecturaRapida(vista.serializer_class())
+            cantidad = len(queryset[:filas].values_list('pk'))
+            if not cantidad:
+                continue
+
+            def con_serializador():
+                return vista.serializer_class(list(queryset[:filas]), many=True).data
+
+            def con_lectura_rapida():
+                return lectura.representar(list(queryset.prefetch_related(None)[:filas].values(*lectura.columnas)))
+
+            medicion = {'filas': cantidad}
+            for clave, funcion in (('serializador', con_serializador), ('lectura_rapida', con_lectura_rapida)):
+                tiempos = []
+                for _ in range(repeticiones):
+                    inicio = time.perf_counter()
+                    funcion()
+                    tiempos.append(time.perf_counter() - inicio)
+                medicion[f'{clave}_us_por_fila'] = statistics.median(tiempos) / cantidad * 1e6
+            medicion['aceleracion'] = medicion['serializador_us_por_fila'] / medicion['lectura_rapida_us_por_fila']
+            resultados[nombre] = medicion
+            self.stdout.write(
+                f"  {nombre} ({cantidad} filas): serializador {medicion['serializador_us_por_fila']:.1f} us/fila, "
+                f"lectura rápida {medicion['lectura_rapida_us_por_fila']:.1f} us/fila "
+                f"({medicion['aceleracion']:.1f}x)"
+            )
+        return resultados
+
+    def _comparar(self, anteriores, actuales, umbral):
+        regresiones = 0
+        for escala, endpoints in actuales.items():
+            for nombre, actual in endpoints.items():
+                anterior = anteriores.get(escala, {}).get(nombre)
+                if anterior is None:
+                    continue
+                motivos = [
+                    f"{metrica} {anterior[metrica]:.1f} -> {actual[metrica]:.1f} ms"
+                    for metrica in METRICAS_LATENCIA if actual[metrica] > anterior[metrica] * (1 + umbral)
+                ]
+                if actual['consultas'] > anterior['consultas']:
+                    motivos.append(f"consultas {anterior['consultas']} -> {actual['consultas']}")
+                if motivos:
+                    regresiones += 1
+                    self.stdout.write(self.style.ERROR(f"Regresión en {nombre} (escala {escala}): {', '.join(motivos)}"))
+        return regresiones
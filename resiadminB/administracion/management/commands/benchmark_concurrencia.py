@@ -0,0 +1,154 @@
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from administracion.basedatos import PRAGMAS_PRODUCCION, aplicar_pragmas, es_bloqueo, reintentar
+
+# Perfil por defecto de Django: journal en modo DELETE, BEGIN diferido y sin reintentos
+PERFILES = {
+    'defecto': {'pragmas': {}, 'begin': 'BEGIN', 'reintentos': False},
+    'produccion': {'pragmas': PRAGMAS_PRODUCCION, 'begin': 'BEGIN IMMEDIATE', 'reintentos': True},
+}
+
+
+def _percentil(valores, percentil):
+    if not valores:
+        return 0.0
+    if len(valores) == 1:
+        return valores[0]
+    return statistics.quantiles(valores, n=100)[percentil - 1]
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide lectores y escritores concurrentes sobre un archivo SQLite temporal con el perfil por defecto '
+        'y con el perfil de producción (WAL, pragmas, BEGIN IMMEDIATE y reintentos)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lectores', type=int, default=8)
+        parser.add_argument('--escritores', type=int, default=4)
+        parser.add_argument('--segundos', type=float, default=5.0)
+        parser.add_argument('--filas', type=int, default=20000)
+        parser.add_argument('--timeout', type=float, default=5.0, help='Timeout de conexión en segundos')
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directorio:
+            for nombre, perfil in PERFILES.items():
+                ruta = Path(directorio) / f'{nombre}.sqlite3'
+                self._preparar(ruta, perfil, options['filas'])
+                resultado = self._ejecutar(ruta, perfil, options)
+                self._reportar(nombre, resultado, options['segundos'])
+
+    def _conectar(self, ruta, perfil, timeout):
+        conexion = sqlite3.connect(ruta, timeout=timeout, isolation_level=None, check_same_thread=False)
+        aplicar_pragmas(conexion.cursor(), perfil['pragmas'])
+        return conexion
+
+    def _preparar(self, ruta, perfil, filas):
+        conexion = self._conectar(ruta, perfil, 5)
+        conexion.executescript(
+            'CREATE TABLE pago (id INTEGER PRIMARY KEY, usuario_id INTEGER, estado TEXT, monto REAL);'
+            'CREATE TABLE pago_detalle (id INTEGER PRIMARY KEY, pago_id INTEGER, monto REAL);'
+            'CREATE INDEX pago_usuario ON pago (usuario_id);'
+        )
+        rng = random.Random(0)
+        conexion.execute('BEGIN')
+        conexion.executemany(
+            'INSERT INTO pago (usuario_id, estado, monto) VALUES (?, ?, ?)',
+            ((i % 1000, rng.choice(('PENDIENTE', 'PAGADO')), 1000.0) for i in range(filas))
+        )
+        conexion.execute('COMMIT')
+        conexion.close()
+
+    def _ejecutar(self, ruta, perfil, options):
+        resultado = {
+            'lecturas': [], 'escrituras': [], 'errores_lectura': 0, 'errores_escritura': 0, 'reintentos': 0,
+        }
+        candado = threading.Lock()
+        fin = time.perf_counter() + options['segundos']
+        filas = options['filas']
+
+        def contar_reintento(error):
+            with candado:
+                resultado['reintentos'] += 1
+
+        def lector(semilla):
+            rng = random.Random(semilla)
+            conexion = self._conectar(ruta, perfil, options['timeout'])
+            while time.perf_counter() < fin:
+                inicio = time.perf_counter()
+                try:
+                    conexion.execute(
+                        'SELECT estado, COUNT(*), SUM(monto) FROM pago WHERE usuario_id < ? GROUP BY estado',
+                        (rng.randint(100, 1000),)
+                    ).fetchall()
+                except sqlite3.OperationalError as error:
+                    if not es_bloqueo(error):
+                        raise
+                    with candado:
+                        resultado['errores_lectura'] += 1
+                    continue
+                with candado:
+                    resultado['lecturas'].append(time.perf_counter() - inicio)
+            conexion.close()
+
+        def escribir(conexion, pago_id):
+            # Lee y luego escribe, como la actualización de un pago: con BEGIN diferido el lock de lectura
+            # debe promoverse a escritura, y si otro escritor ya lo tiene SQLite falla sin esperar
+            try:
+                conexion.execute(perfil['begin'])
+                conexion.execute('SELECT monto FROM pago WHERE id = ?', (pago_id,)).fetchone()
+                conexion.execute("UPDATE pago SET estado = 'PAGADO', monto = monto + 1 WHERE id = ?", (pago_id,))
+                conexion.execute('INSERT INTO pago_detalle (pago_id, monto) VALUES (?, 1)', (pago_id,))
+                conexion.execute('COMMIT')
+            except sqlite3.OperationalError:
+                if conexion.in_transaction:
+                    conexion.execute('ROLLBACK')
+                raise
+
+        def escritor(semilla):
+            rng = random.Random(semilla)
+            conexion = self._conectar(ruta, perfil, options['timeout'])
+            while time.perf_counter() < fin:
+                pago_id = rng.randint(1, filas)
+                inicio = time.perf_counter()
+                try:
+                    if perfil['reintentos']:
+                        reintentar(lambda: escribir(conexion, pago_id), al_reintentar=contar_reintento)
+                    else:
+                        escribir(conexion, pago_id)
+                except sqlite3.OperationalError as error:
+                    if not es_bloqueo(error):
+                        raise
+                    with candado:
+                        resultado['errores_escritura'] += 1
+                    continue
+                with candado:
+                    resultado['escrituras'].append(time.perf_counter() - inicio)
+            conexion.close()
+
+        hilos = [threading.Thread(target=lector, args=(i,)) for i in range(options['lectores'])]
+        hilos += [threading.Thread(target=escritor, args=(1000 + i,)) for i in range(options['escritores'])]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        return resultado
+
+    def _reportar(self, nombre, resultado, segundos):
+        lecturas, escrituras = resultado['lecturas'], resultado['escrituras']
+        errores = resultado['errores_lectura'] + resultado['errores_escritura']
+        estilo = self.style.WARNING if errores else self.style.SUCCESS
+        self.stdout.write(estilo(
+            f"{nombre}: {len(lecturas) / segundos:.0f} lecturas/s (p95 {_percentil(lecturas, 95) * 1000:.1f} ms), "
+            f"{len(escrituras) / segundos:.0f} escrituras/s (p95 {_percentil(escrituras, 95) * 1000:.1f} ms), "
+            f"{resultado['errores_lectura']} lecturas y {resultado['errores_escritura']} escrituras fallidas "
+            f"por bloqueo, {resultado['reintentos']} reintentos"
+        ))
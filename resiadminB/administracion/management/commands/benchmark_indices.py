@@ -0,0 +1,177 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+from rest_framework.request import Request
+
+from administracion.disponibilidad import consulta_ocupados, consulta_ocupados_espacios
+from administracion.models import (
+    ComplejoHabitacional, EspacioComun, GastoComun, Pago, ReservaDetalle, Rol, Usuario
+)
+from administracion.morosidad import consulta_morosidad
+from administracion.poblado import armar_configuracion, crear_roles, poblar_complejos, rut
+from administracion.views import GastoComunViewSet, PagoViewSet
+
+DOMINIO = 'indices.test'
+RUT_INICIAL = 40000000
+
+
+class Rollback(Exception):
+    pass
+
+
+def consulta_de_listado(clase, usuario, **parametros):
+    """
+    La consulta de la primera página que ejecuta el list del viewset `clase` para `usuario` con esos
+    parámetros: su get_queryset, filtros y proyección, y el orden y límite de la paginación por cursor.
+    """
+    request = Request(RequestFactory().get('/', parametros))
+    request.user = usuario
+    vista = clase(request=request, action='list', args=(), kwargs={}, format_kwarg=None)
+    if hasattr(vista, 'consulta_listado'):
+        queryset, _ = vista.consulta_listado()
+    else:
+        queryset = vista.filter_queryset(vista.get_queryset())
+    paginador = vista.paginator
+    return queryset.order_by(*paginador.get_ordering(request, queryset, vista))[:paginador.get_page_size(request) + 1]
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara el plan y el tiempo de las consultas que ejecutan los listados y la disponibilidad de espacios '
+        'con y sin sus índices compuestos. Los datos de prueba se crean dentro de una transacción que se '
+        'revierte al terminar.'
+    )
+
+    # (modelo, nombre del índice) que se quitan para la medición "sin índice"
+    INDICES = (
+        (Pago, 'pago_usuario_creacion_idx'),
+        (Pago, 'pago_usuario_estado_venc_idx'),
+        (GastoComun, 'gasto_complejo_periodo_idx'),
+        (GastoComun, 'gasto_periodo_idx'),
+        (ReservaDetalle, 'reserva_espacio_intervalo_idx'),
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--complejos', type=int, default=20)
+        parser.add_argument('--unidades', type=int, default=100, help='Unidades con un residente por complejo')
+        parser.add_argument('--meses', type=int, default=24, help='Periodos de cobros y gastos comunes')
+        parser.add_argument('--notificaciones', type=int, default=500, help='Notificaciones por complejo')
+        parser.add_argument('--reservas', type=int, default=15, help='Reservas promedio por residente')
+        parser.add_argument('--repeticiones', type=int, default=50)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                muestra = self._poblar(options)
+                consultas = self._consultas(muestra)
+                sin_indices = self._medir(consultas, options['repeticiones'], quitar=True)
+                con_indices = self._medir(consultas, options['repeticiones'], quitar=False)
+                self._reportar(consultas, sin_indices, con_indices)
+                raise Rollback
+        except Rollback:
+            pass
+        # Un índice que su consulta no usa solo agrega costo a las escrituras
+        sin_uso = sorted({indice for nombre, (indice, _) in consultas.items() if not con_indices[nombre]['usa_indice']})
+        if sin_uso:
+            raise CommandError(f"Índices que sus consultas no usan: {', '.join(sin_uso)}")
+
+    def _poblar(self, options):
+        # Los mismos complejos que genera seed_scale, con su propio dominio y RUT para no chocar con datos
+        # generados antes en la base actual
+        configuracion = armar_configuracion(
+            complejos=options['complejos'], unidades=options['unidades'], meses=options['meses'],
+            reservas=options['reservas'], notificaciones=options['notificaciones'], destinatarios=10,
+            dominio=DOMINIO, rut_inicial=RUT_INICIAL
+        )
+        crear_roles()
+        poblar_complejos(list(range(options['complejos'])), configuracion)
+        # Las vistas muestran todas las filas a SUPERADMIN, el caso de los listados sin complejo
+        administrador = Usuario.objects.create(
+            email=f'administrador@{DOMINIO}', first_name='Bench', last_name='Admin', password='!',
+            rut=rut(RUT_INICIAL - 1), rol=Rol.objects.get_or_create(nombre='SUPERADMIN')[0]
+        )
+
+        complejo = ComplejoHabitacional.objects.get(email=f"complejo{options['complejos'] // 2}@{DOMINIO}")
+        residentes = Usuario.objects.filter(unidad_habitacional__complejo=complejo).order_by('id')
+        espacios = list(EspacioComun.objects.filter(complejo=complejo).order_by('id'))
+        # Una semana desde la mitad del periodo con reservas del primer espacio
+        inicios = ReservaDetalle.objects.filter(espacio=espacios[0]).order_by('fecha_inicio')
+        desde = inicios.values_list('fecha_inicio', flat=True)[inicios.count() // 2]
+        return {
+            'residente': residentes[residentes.count() // 2], 'administrador': administrador, 'complejo': complejo,
+            'espacios': espacios, 'desde': desde, 'hasta': desde + timedelta(days=7),
+            'hoy': configuracion['referencia'],
+        }
+
+    def _consultas(self, muestra):
+        hoy = muestra['hoy']
+        periodo = {'mes': hoy.month, 'anio': hoy.year}
+        espacios = muestra['espacios']
+        return {
+            'pagos de un residente (GET /api/pagos/)': (
+                'pago_usuario_creacion_idx',
+                consulta_de_listado(PagoViewSet, muestra['residente'])
+            ),
+            'morosidad de un complejo (GET /api/pagos/morosidad/)': (
+                'pago_usuario_estado_venc_idx',
+                consulta_morosidad(muestra['complejo'], hoy)
+            ),
+            'gastos por complejo y periodo (GET /api/gastos-comunes/?complejo=&mes=&anio=)': (
+                'gasto_complejo_periodo_idx',
+                consulta_de_listado(
+                    GastoComunViewSet, muestra['administrador'], complejo=muestra['complejo'].id, **periodo
+                )
+            ),
+            'gastos por periodo (GET /api/gastos-comunes/?mes=&anio=)': (
+                'gasto_periodo_idx',
+                consulta_de_listado(GastoComunViewSet, muestra['administrador'], **periodo)
+            ),
+            'disponibilidad de un espacio (GET /api/espacios-comunes/<id>/disponibilidad/)': (
+                'reserva_espacio_intervalo_idx',
+                consulta_ocupados(espacios[0], muestra['desde'], muestra['hasta'])
+            ),
+            'verificación de candidatos (POST /api/espacios-comunes/verificar-disponibilidad/)': (
+                'reserva_espacio_intervalo_idx',
+                consulta_ocupados_espacios([espacio.id for espacio in espacios], muestra['desde'], muestra['hasta'])
+            ),
+        }
+
+    def _alternar_indices(self, quitar):
+        editor = connection.schema_editor()
+        with connection.cursor() as cursor:
+            for modelo, nombre in self.INDICES:
+                if quitar:
+                    cursor.execute(f'DROP INDEX {connection.ops.quote_name(nombre)}')
+                else:
+                    indice = next(i for i in modelo._meta.indexes if i.name == nombre)
+                    cursor.execute(str(indice.create_sql(modelo, editor)))
+
+    def _medir(self, consultas, repeticiones, quitar):
+        self._alternar_indices(quitar)
+        resultados = {}
+        for nombre, (indice, queryset) in consultas.items():
+            plan = queryset.explain()
+            inicio = time.perf_counter()
+            for _ in range(repeticiones):
+                # Un queryset nuevo en cada repetición para no leer la caché de resultados
+                list(queryset.all())
+            milisegundos = (time.perf_counter() - inicio) * 1000 / repeticiones
+            resultados[nombre] = {'plan': plan, 'ms': milisegundos, 'usa_indice': indice in plan}
+        return resultados
+
+    def _reportar(self, consultas, sin_indices, con_indices):
+        for nombre, (indice, _) in consultas.items():
+            antes, despues = sin_indices[nombre], con_indices[nombre]
+            factor = antes['ms'] / despues['ms'] if despues['ms'] else 0
+            estilo = self.style.SUCCESS if despues['usa_indice'] else self.style.WARNING
+            self.stdout.write(estilo(
+                f"{nombre}: {antes['ms']:.2f} ms -> {despues['ms']:.2f} ms (x{factor:.1f}), "
+                f"usa {indice}: {'sí' if despues['usa_indice'] else 'no'}"
+            ))
+            for titulo, medicion in (('sin índice', antes), ('con índice', despues)):
+                self.stdout.write(f'  {titulo}:')
+                for linea in medicion['plan'].splitlines():
+                    self.stdout.write(f'    {linea}')
@@ -0,0 +1,46 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from administracion.facturacion import generar_cobros_mensuales, TAMANO_LOTE
+from administracion.models import ComplejoHabitacional
+
+class Command(BaseCommand):
+    help = 'Genera los cobros mensuales de gastos comunes para un complejo habitacional'
+
+    def add_arguments(self, parser):
+        parser.add_argument('complejo_id', type=int)
+        parser.add_argument('--mes', type=int, required=True)
+        parser.add_argument('--anio', type=int, required=True)
+        parser.add_argument('--vencimiento', type=date.fromisoformat, help='Fecha de vencimiento (AAAA-MM-DD)')
+        parser.add_argument('--tamano-lote', type=int, default=TAMANO_LOTE)
+
+    def handle(self, *args, **options):
+        if not 1 <= options['mes'] <= 12:
+            raise CommandError('El mes debe estar entre 1 y 12')
+        try:
+            complejo = ComplejoHabitacional.objects.get(pk=options['complejo_id'])
+        except ComplejoHabitacional.DoesNotExist:
+            raise CommandError(f"Complejo {options['complejo_id']} no encontrado")
+
+        try:
+            resultado = generar_cobros_mensuales(
+                complejo, options['mes'], options['anio'],
+                fecha_vencimiento=options['vencimiento'],
+                tamano_lote=options['tamano_lote']
+            )
+        except ValueError as error:
+            raise CommandError(str(error))
+        self.stdout.write(self.style.SUCCESS(
+            f"{complejo.nombre} {resultado['mes']:02d}/{resultado['anio']}: "
+            f"{resultado['pagos_creados']} pagos y {resultado['detalles_creados']} detalles creados "
+            f"en {resultado['segundos']}s ({resultado['filas_por_segundo']} filas/s)"
+        ))
+        if resultado['detalles_reprorrateados'] or resultado['detalles_eliminados']:
+            self.stdout.write(self.style.WARNING(
+                f"Cobros ya emitidos prorrateados de nuevo: {resultado['detalles_reprorrateados']} actualizados "
+                f"y {resultado['detalles_eliminados']} eliminados"
+            ))
+        if resultado['unidades_sin_titular']:
+            self.stdout.write(self.style.WARNING(
+                f"{len(resultado['unidades_sin_titular'])} unidades sin residente activo no fueron facturadas"
+            ))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from administracion.importaciones import LECTORES_RESIDENTES, importar_residentes
+from administracion.models import ComplejoHabitacional
+
+class Command(BaseCommand):
+    help = 'Importa residentes desde un CSV o JSON lines, calculando los hashes de contraseña en paralelo'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo')
+        parser.add_argument('--complejo', type=int, required=True)
+        parser.add_argument('--formato', choices=sorted(LECTORES_RESIDENTES))
+        parser.add_argument('--procesos', type=int, help='Procesos para calcular hashes (por defecto, uno por CPU)')
+
+    def handle(self, *args, **options):
+        try:
+            complejo = ComplejoHabitacional.objects.get(pk=options['complejo'])
+        except ComplejoHabitacional.DoesNotExist:
+            raise CommandError(f"Complejo {options['complejo']} no encontrado")
+
+        formato = options['formato'] or ('jsonl' if options['archivo'].endswith(('.jsonl', '.ndjson')) else 'csv')
+        with open(options['archivo'], encoding='utf-8-sig', newline='') as archivo:
+            resultado = importar_residentes(
+                LECTORES_RESIDENTES[formato](archivo), complejo, procesos=options['procesos']
+            )
+
+        if resultado['errores']:
+            for error in resultado['errores']:
+                self.stderr.write(f"Línea {error['linea']}: {error['error']}")
+            raise CommandError(f"{len(resultado['errores'])} filas con errores, no se importó ningún residente")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['creados']} residentes creados en {resultado['segundos']}s "
+            f"({resultado['usuarios_por_segundo']} usuarios/s), "
+            f"{resultado['whitelist_registrados']} emails marcados como registrados"
+        ))
@@ -0,0 +1,94 @@
+import signal
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from administracion.trabajos import TAREAS, ejecutar, nombre_trabajador, reclamar, recuperar_vencidos
+
+# Cada cuántos segundos se devuelven a la cola los trabajos de trabajadores que murieron
+INTERVALO_RECUPERACION = 60
+
+
+class Command(BaseCommand):
+    help = 'Procesa la cola de trabajos en segundo plano (cobros, multas, importaciones y exportaciones)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrencia', type=int, default=1, help='Trabajos ejecutados en paralelo')
+        parser.add_argument('--intervalo', type=float, default=1.0, help='Segundos entre consultas con la cola vacía')
+        parser.add_argument('--una-vez', action='store_true', help='Terminar al vaciar la cola')
+        parser.add_argument('--tipos', nargs='+', choices=sorted(TAREAS), help='Procesar solo estos tipos')
+
+    def handle(self, *args, **options):
+        self.detener = False
+        anteriores = {senal: signal.signal(senal, self._detener) for senal in (signal.SIGTERM, signal.SIGINT)}
+        self.trabajador = nombre_trabajador()
+        self.ejecutados = 0
+        concurrencia = max(options['concurrencia'], 1)
+        self.stdout.write(f'Trabajador {self.trabajador} con concurrencia {concurrencia}')
+
+        try:
+            if concurrencia == 1:
+                self._procesar_en_linea(options)
+            else:
+                self._procesar_en_hilos(concurrencia, options)
+        finally:
+            for senal, manejador in anteriores.items():
+                signal.signal(senal, manejador)
+        self.stdout.write(self.style.SUCCESS(f'{self.ejecutados} trabajos ejecutados'))
+
+    def _detener(self, signum, frame):
+        # Se termina el trabajo en curso y no se reclaman más
+        self.detener = True
+
+    def _recuperar(self):
+        ahora = time.monotonic()
+        if ahora - getattr(self, '_ultima_recuperacion', float('-inf')) >= INTERVALO_RECUPERACION:
+            self._ultima_recuperacion = ahora
+            recuperados = recuperar_vencidos()
+            if recuperados:
+                self.stdout.write(f'{recuperados} trabajos vencidos recuperados')
+
+    def _procesar_en_linea(self, options):
+        while not self.detener:
+            self._recuperar()
+            trabajo = reclamar(self.trabajador, options['tipos'])
+            if trabajo is None:
+                if options['una_vez']:
+                    break
+                time.sleep(options['intervalo'])
+                continue
+            self._ejecutar(trabajo)
+
+    def _procesar_en_hilos(self, concurrencia, options):
+        en_curso = set()
+        with ThreadPoolExecutor(max_workers=concurrencia, thread_name_prefix='trabajo') as ejecutor:
+            while not self.detener:
+                self._recuperar()
+                while len(en_curso) < concurrencia and not self.detener:
+                    trabajo = reclamar(self.trabajador, options['tipos'])
+                    if trabajo is None:
+                        break
+                    en_curso.add(ejecutor.submit(self._ejecutar_en_hilo, trabajo))
+                if not en_curso:
+                    if options['una_vez']:
+                        break
+                    time.sleep(options['intervalo'])
+                    continue
+                _, en_curso = wait(en_curso, timeout=options['intervalo'], return_when=FIRST_COMPLETED)
+            wait(en_curso)
+
+    def _ejecutar_en_hilo(self, trabajo):
+        try:
+            self._ejecutar(trabajo)
+        finally:
+            # Cada hilo abre su propia conexión; cerrarla para no acumular conexiones ociosas
+            connection.close()
+
+    def _ejecutar(self, trabajo):
+        inicio = time.perf_counter()
+        exito = ejecutar(trabajo)
+        self.ejecutados += 1
+        estado = 'completado' if exito else 'falló'
+        self.stdout.write(f'{trabajo.tipo} #{trabajo.id} {estado} en {time.perf_counter() - inicio:.2f}s (intento {trabajo.intentos})')
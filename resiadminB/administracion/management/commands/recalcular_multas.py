@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from administracion.models import ComplejoHabitacional
+from administracion.multas import recalcular_multas, TAMANO_LOTE
+
+class Command(BaseCommand):
+    help = 'Recalcula las multas de los detalles de pago según la configuración activa de cada complejo'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--complejo', type=int, help='ID del complejo (por defecto todos)')
+        parser.add_argument('--tamano-lote', type=int, default=TAMANO_LOTE)
+
+    def handle(self, *args, **options):
+        complejo = None
+        if options['complejo']:
+            try:
+                complejo = ComplejoHabitacional.objects.get(pk=options['complejo'])
+            except ComplejoHabitacional.DoesNotExist:
+                raise CommandError(f"Complejo {options['complejo']} no encontrado")
+
+        inicio = time.perf_counter()
+        resultado = recalcular_multas(complejo=complejo, tamano_lote=options['tamano_lote'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['revisados']} detalles revisados, {resultado['actualizados']} actualizados "
+            f"en {time.perf_counter() - inicio:.2f}s"
+        ))
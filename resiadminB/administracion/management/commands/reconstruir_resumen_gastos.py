@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+from administracion.models import ComplejoHabitacional
+from administracion.resumenes import reconstruir_resumenes
+
+class Command(BaseCommand):
+    help = 'Reconstruye el resumen mensual de gastos comunes desde la tabla de gastos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--complejo', type=int, help='ID del complejo (por defecto todos)')
+
+    def handle(self, *args, **options):
+        complejo = None
+        if options['complejo']:
+            try:
+                complejo = ComplejoHabitacional.objects.get(pk=options['complejo'])
+            except ComplejoHabitacional.DoesNotExist:
+                raise CommandError(f"Complejo {options['complejo']} no encontrado")
+
+        filas = reconstruir_resumenes(complejo)
+        self.stdout.write(self.style.SUCCESS(f'Resumen reconstruido: {filas} filas'))
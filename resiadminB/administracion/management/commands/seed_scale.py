@@ -0,0 +1,118 @@
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from administracion.basedatos import inicializar_proceso
+from administracion.models import Usuario
+from administracion.poblado import (
+    DOMINIO, PRESETS, RUT_INICIAL, RUT_MAXIMO, armar_configuracion, crear_roles, estimar_filas, poblar_complejos,
+    poblar_en_proceso
+)
+from administracion.respuestas import invalidar_respuestas
+from administracion.resumenes import reconstruir_resumenes
+
+AJUSTABLES = ('complejos', 'unidades', 'meses', 'reservas', 'notificaciones', 'destinatarios')
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera datos sintéticos a escala de producción (complejos, unidades, residentes, pagos, reservas y '
+        'notificaciones) con bulk_create por lotes. El resultado depende solo de la semilla. '
+        'Con --procesos > 1 conviene RESIADMIN_DB_PERFIL=produccion para que SQLite use WAL.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--preset', choices=sorted(PRESETS), default='pequeno')
+        for campo in AJUSTABLES:
+            parser.add_argument(f'--{campo}', type=int, help=f'Reemplaza el valor de {campo} del preset')
+        parser.add_argument('--semilla', type=int, default=0)
+        parser.add_argument('--procesos', type=int, default=1, help='Procesos que generan e insertan en paralelo')
+        parser.add_argument('--lote', type=int, default=5000, help='Filas por INSERT y aproximadas por transacción')
+        parser.add_argument('--password', default='residente123', help='Contraseña de todos los usuarios generados')
+        parser.add_argument('--rut-inicial', type=int, default=RUT_INICIAL)
+        parser.add_argument(
+            '--referencia', type=date.fromisoformat,
+            help='Fecha del último periodo de cobro (AAAA-MM-DD, por defecto hoy)'
+        )
+
+    def handle(self, *args, **options):
+        configuracion = armar_configuracion(**PRESETS[options['preset']])
+        for campo in AJUSTABLES:
+            if options[campo] is not None:
+                configuracion[campo] = options[campo]
+        total_usuarios = configuracion['complejos'] * (configuracion['unidades'] + 1)
+        if options['rut_inicial'] < 1000000 or options['rut_inicial'] + total_usuarios > RUT_MAXIMO:
+            raise CommandError('Los RUT generados quedarían fuera del rango de 7 u 8 dígitos')
+        if Usuario.objects.filter(email__endswith=f'@{DOMINIO}').exists():
+            raise CommandError(f'La base ya tiene datos generados (usuarios @{DOMINIO}); usa una base vacía')
+
+        configuracion.update(
+            semilla=options['semilla'],
+            lote=options['lote'],
+            rut_inicial=options['rut_inicial'],
+            referencia=options['referencia'] or timezone.localdate(),
+            # Un solo hash para todos: hashear cada contraseña tomaría horas a esta escala
+            password=make_password(options['password']),
+        )
+        crear_roles()
+
+        estimado = estimar_filas(configuracion)
+        self.stdout.write('Filas estimadas: ' + ', '.join(f'{tabla} {filas:,}' for tabla, filas in estimado.items()))
+
+        inicio = time.perf_counter()
+        indices = list(range(configuracion['complejos']))
+        if options['procesos'] > 1:
+            contadores = self._poblar_en_paralelo(indices, configuracion, options['procesos'])
+        else:
+            contadores = self._poblar(indices, configuracion)
+
+        # bulk_create no dispara las señales que mantienen el resumen de gastos ni invalidan las respuestas
+        reconstruir_resumenes()
+        for recurso in ('pagos', 'reservas', 'notificaciones'):
+            invalidar_respuestas(recurso)
+
+        segundos = time.perf_counter() - inicio
+        total = sum(contadores.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'{total:,} filas en {segundos:.1f}s ({total / segundos:,.0f} filas/s): '
+            + ', '.join(f'{tabla} {filas:,}' for tabla, filas in contadores.items())
+        ))
+
+    def _avance(self, hechos, total, inicio):
+        self.stdout.write(f'  {hechos}/{total} complejos ({time.perf_counter() - inicio:.1f}s)')
+
+    def _sumar(self, contadores, parciales):
+        for clave, valor in parciales.items():
+            contadores[clave] = contadores.get(clave, 0) + valor
+
+    def _partes(self, indices, cantidad):
+        tamano = max(1, len(indices) // cantidad)
+        return [indices[desde:desde + tamano] for desde in range(0, len(indices), tamano)]
+
+    def _poblar(self, indices, configuracion):
+        contadores, hechos, inicio = {}, 0, time.perf_counter()
+        for parte in self._partes(indices, 20):
+            self._sumar(contadores, poblar_complejos(parte, configuracion))
+            hechos += len(parte)
+            self._avance(hechos, len(indices), inicio)
+        return contadores
+
+    def _poblar_en_paralelo(self, indices, configuracion, procesos):
+        # Los procesos hijos no deben heredar la conexión abierta del padre
+        connections.close_all()
+        contadores, hechos, inicio = {}, 0, time.perf_counter()
+        with ProcessPoolExecutor(max_workers=procesos, initializer=inicializar_proceso) as pool:
+            futuros = {
+                pool.submit(poblar_en_proceso, parte, configuracion): len(parte)
+                for parte in self._partes(indices, procesos * 8)
+            }
+            for futuro in as_completed(futuros):
+                self._sumar(contadores, futuro.result())
+                hechos += futuros[futuro]
+                self._avance(hechos, len(indices), inicio)
+        return contadores
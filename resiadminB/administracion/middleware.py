@@ -0,0 +1,102 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .instrumentacion import iniciar_medicion, nombre_vista, registrar_peticion, terminar_medicion
+from .routers import PRIMARIO, REPLICA, lecturas_en
+
+METODOS_SEGUROS = ('GET', 'HEAD', 'OPTIONS')
+COOKIE_PRIMARIO = 'leer_primario'
+
+
+class LecturaReplicaMiddleware:
+    """
+    Decide por petición a qué base van las lecturas. Las peticiones de solo lectura usan la réplica;
+    las que escriben, y las de un cliente que escribió hace menos de REPLICA_RETRASO_MAXIMO segundos,
+    leen del primario para ver sus propios cambios.
+    Soporta vistas async para no ocupar un hilo por conexión bajo ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self._acall(request)
+        with lecturas_en(self._destino(request)) as estado:
+            response = self.get_response(request)
+        return self._marcar(request, response, estado)
+
+    async def _acall(self, request):
+        with lecturas_en(self._destino(request)) as estado:
+            response = await self.get_response(request)
+        return self._marcar(request, response, estado)
+
+    def _destino(self, request):
+        primario = request.method not in METODOS_SEGUROS or COOKIE_PRIMARIO in request.COOKIES
+        return PRIMARIO if primario else REPLICA
+
+    def _marcar(self, request, response, estado):
+        if request.method not in METODOS_SEGUROS or estado['escritura']:
+            response.set_cookie(
+                COOKIE_PRIMARIO, '1', max_age=settings.REPLICA_RETRASO_MAXIMO, httponly=True, samesite='Lax'
+            )
+        return response
+
+
+class MetricasMiddleware:
+    """
+    Mide cada petición: consultas y tiempo SQL, tiempo en serializer.data, duración total y tamaño de la
+    respuesta, etiquetados por vista (`PagoViewSet.list`). Lo informa en la cabecera Server-Timing y lo
+    acumula en los histogramas que expone /metrics.
+    Las consultas se cuentan con el execute_wrapper que instrumentar_conexion deja en cada conexión, sin el
+    cursor de depuración, para poder dejarlo activo también bajo ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self._acall(request)
+        medicion, token = iniciar_medicion()
+        inicio = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            terminar_medicion(token)
+        return self._registrar(request, response, medicion, time.perf_counter() - inicio)
+
+    async def _acall(self, request):
+        medicion, token = iniciar_medicion()
+        inicio = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            terminar_medicion(token)
+        return self._registrar(request, response, medicion, time.perf_counter() - inicio)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.vista_metricas = nombre_vista(view_func, request.method)
+
+    def _registrar(self, request, response, medicion, duracion):
+        tamano = None if response.streaming else len(response.content)
+        registrar_peticion(
+            getattr(request, 'vista_metricas', 'desconocida'), request.method, response.status_code,
+            duracion, medicion, tamano
+        )
+        response['Server-Timing'] = (
+            f'sql;dur={medicion["sql_segundos"] * 1000:.2f};desc="{medicion["sql_consultas"]} consultas", '
+            f'serializacion;dur={medicion["serializacion_segundos"] * 1000:.2f}, '
+            f'total;dur={duracion * 1000:.2f}'
+        )
+        return response
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administracion', '0002_usuario_complejo_administrado_gastocomun'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pago',
+            name='periodo_anio',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='pago',
+            name='periodo_mes',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='pagodetalle',
+            name='gasto_comun',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='cobros', to='administracion.gastocomun'),
+        ),
+        migrations.AddConstraint(
+            model_name='pago',
+            constraint=models.UniqueConstraint(fields=('usuario', 'periodo_anio', 'periodo_mes'), name='pago_unico_por_periodo'),
+        ),
+        migrations.AddConstraint(
+            model_name='pagodetalle',
+            constraint=models.UniqueConstraint(fields=('pago', 'gasto_comun'), name='detalle_unico_por_gasto'),
+        ),
+    ]
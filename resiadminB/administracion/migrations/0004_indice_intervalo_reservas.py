@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administracion', '0003_facturacion_mensual'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reservadetalle',
+            index=models.Index(fields=['espacio', 'fecha_inicio', 'fecha_fin'], name='reserva_espacio_intervalo_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administracion', '0004_indice_intervalo_reservas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificacion',
+            name='audiencia',
+            field=models.CharField(choices=[('USUARIOS', 'Usuarios seleccionados'), ('COMPLEJO', 'Todo el complejo'), ('ROL', 'Un rol dentro del complejo')], default='USUARIOS', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='notificacion',
+            name='rol_destino',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='notificaciones', to='administracion.rol'),
+        ),
+        migrations.AlterField(
+            model_name='notificacion',
+            name='destinatarios',
+            field=models.ManyToManyField(blank=True, related_name='notificaciones_recibidas', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administracion', '0005_audiencia_notificaciones'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notificacion',
+            index=models.Index(fields=['fecha_publicacion', 'id'], name='notificacion_publicacion_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pago',
+            index=models.Index(fields=['fecha_creacion', 'id'], name='pago_creacion_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pago',
+            index=models.Index(fields=['usuario', 'fecha_creacion', 'id'], name='pago_usuario_creacion_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['fecha_creacion', 'id'], name='reserva_creacion_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['usuario', 'fecha_creacion', 'id'], name='reserva_usuario_creacion_idx'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:24
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def reconstruir_resumenes(apps, schema_editor):
+    # Los gastos existentes solo entran al resumen al guardarse: se agregan una vez al crear la tabla
+    GastoComun = apps.get_model('administracion', 'GastoComun')
+    ResumenGastoComun = apps.get_model('administracion', 'ResumenGastoComun')
+    filas = GastoComun.objects.order_by().values('complejo_id', 'anio', 'mes', 'tipo', 'estado').annotate(
+        total=Sum('monto'), cantidad=Count('id')
+    )
+    ResumenGastoComun.objects.bulk_create(
+        [ResumenGastoComun(**fila) for fila in filas.iterator()], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administracion', '0006_indices_paginacion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenGastoComun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('anio', models.IntegerField()),
+                ('mes', models.IntegerField()),
+                ('tipo', models.CharField(choices=[('MANTENIMIENTO', 'Mantenimiento'), ('LIMPIEZA', 'Limpieza'), ('SEGURIDAD', 'Seguridad'), ('ADMINISTRACION', 'Administración'), ('OTROS', 'Otros')], max_length=20)),
+                ('estado', models.CharField(max_length=20)),
+                ('total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('cantidad', models.IntegerField(default=0)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+                ('complejo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_gastos', to='administracion.complejohabitacional')),
+            ],
+            options={
+                'verbose_name': 'Resumen de Gasto Común',
+                'verbose_name_plural': 'Resúmenes de Gastos Comunes',
+                'ordering': ['anio', 'mes', 'tipo', 'estado'],
+                'constraints': [models.UniqueConstraint(fields=('complejo', 'anio', 'mes', 'tipo', 'estado'), name='resumen_gasto_unico')],
+            },
+        ),
+        migrations.RunPython(reconstruir_resumenes, migrations.RunPython.noop),
+    ]
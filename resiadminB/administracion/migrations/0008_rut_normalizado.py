@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:27
+
+import re
+
+from django.db import migrations, models
+
+# Copia de administracion.validators.normalizar_rut al momento de esta migración: las migraciones
+# no deben depender del código actual de la aplicación, que puede cambiar después.
+RUT_PATRON = re.compile(r'^(\d{1,3}(?:\.\d{3})+|\d+)-([0-9K])$')
+
+
+def normalizar_rut(value):
+    if not isinstance(value, str):
+        return None
+    coincidencia = RUT_PATRON.match(value.strip().upper().replace(' ', ''))
+    if not coincidencia:
+        return None
+    return f"{coincidencia.group(1).replace('.', '').lstrip('0') or '0'}-{coincidencia.group(2)}"
+
+
+def poblar_rut_normalizado(apps, schema_editor):
+    Usuario = apps.get_model('administracion', 'Usuario')
+    vistos = {}
+    cambios = []
+    omitidos = []
+    for usuario in Usuario.objects.only('id', 'rut').order_by('id').iterator(chunk_size=1000):
+        canonico = normalizar_rut(usuario.rut)
+        if canonico is None:
+            continue
+        # Si dos usuarios tienen el mismo RUT en distinto formato, solo el más antiguo recibe la clave
+        if canonico in vistos:
+            omitidos.append((usuario.id, usuario.rut, vistos[canonico]))
+            continue
+        vistos[canonico] = usuario.id
+        usuario.rut_normalizado = canonico
+        cambios.append(usuario)
+    Usuario.objects.bulk_update(cambios, ['rut_normalizado'], batch_size=1000)
+    if omitidos:
+        # Quedan sin rut_normalizado hasta que se resuelva el duplicado
+        print(f'\n  {len(omitidos)} usuarios con RUT duplicado quedaron sin rut_normalizado:')
+        for usuario_id, rut, original_id in omitidos:
+            print(f'    usuario {usuario_id} (RUT {rut}) duplica al usuario {original_id}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administracion', '0007_resumen_gastos_comunes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usuario',
+            name='rut_normalizado',
+            field=models.CharField(blank=True, editable=False, max_length=12, null=True, unique=True),
+        ),
+        migrations.RunPython(poblar_rut_normalizado, migrations.RunPython.noop),
+    ]
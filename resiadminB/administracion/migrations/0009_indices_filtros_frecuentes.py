@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administracion', '0008_rut_normalizado'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='gastocomun',
+            index=models.Index(fields=['complejo', 'anio', 'mes', 'fecha', 'id'], name='gasto_complejo_periodo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gastocomun',
+            index=models.Index(fields=['anio', 'mes', 'fecha', 'id'], name='gasto_periodo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pago',
+            index=models.Index(fields=['usuario', 'estado', 'fecha_vencimiento'], name='pago_usuario_estado_venc_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:43
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administracion', '0009_indices_filtros_frecuentes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Trabajo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(max_length=50)),
+                ('parametros', models.JSONField(blank=True, default=dict)),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('EN_CURSO', 'En curso'), ('COMPLETADO', 'Completado'), ('MUERTO', 'Muerto')], default='PENDIENTE', max_length=20)),
+                ('intentos', models.IntegerField(default=0)),
+                ('max_intentos', models.IntegerField(default=3)),
+                ('progreso_actual', models.IntegerField(default=0)),
+                ('progreso_total', models.IntegerField(blank=True, null=True)),
+                ('resultado', models.JSONField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+                ('trabajador', models.CharField(blank=True, max_length=100)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('disponible_desde', models.DateTimeField(default=django.utils.timezone.now)),
+                ('fecha_inicio', models.DateTimeField(blank=True, null=True)),
+                ('fecha_fin', models.DateTimeField(blank=True, null=True)),
+                ('espera_segundos', models.FloatField(blank=True, null=True)),
+                ('duracion_segundos', models.FloatField(blank=True, null=True)),
+                ('creado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='trabajos', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Trabajo',
+                'verbose_name_plural': 'Trabajos',
+                'indexes': [models.Index(fields=['estado', 'disponible_desde', 'id'], name='trabajo_cola_idx'), models.Index(fields=['creado_por', 'fecha_creacion'], name='trabajo_usuario_idx')],
+            },
+        ),
+    ]
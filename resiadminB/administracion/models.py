@@ -1,8 +1,9 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from decimal import Decimal
 from datetime import datetime, timedelta
-from .validators import validar_rut
+from .validators import validar_rut, normalizar_rut
 from django.core.exceptions import ValidationError
 
 # Create your models here.
@@ -113,6 +114,8 @@ class Usuario(AbstractUser):
         validators=[validar_rut],
         help_text="Formato: 12.345.678-9 o 12.345.678-K"
     )
+    # Clave canónica (sin puntos ni ceros a la izquierda) para búsquedas exactas por índice
+    rut_normalizado = models.CharField(max_length=12, unique=True, null=True, blank=True, editable=False)
     telefono = models.CharField(max_length=15, blank=True)
     rol = models.ForeignKey(Rol, on_delete=models.PROTECT, related_name='usuarios', null=True)
     unidad_habitacional = models.ForeignKey('UnidadHabitacional', on_delete=models.SET_NULL, null=True, blank=True, related_name='residentes')
@@ -141,6 +144,10 @@ class Usuario(AbstractUser):
     def save(self, *args, **kwargs):
         # Si el usuario es administrador y se asigna un complejo, actualizar también la relación inversa
         is_new = self.pk is None
+        self.rut_normalizado = normalizar_rut(self.rut)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'rut' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'rut_normalizado'}
         super().save(*args, **kwargs)
         
         if self.rol and self.rol.nombre == 'ADMIN' and self.complejo_administrado:
@@ -171,6 +178,9 @@ class Pago(models.Model):
     fecha_vencimiento = models.DateField()
     estado = models.CharField(max_length=20, choices=ESTADOS, default='PENDIENTE')
     monto_total = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
+    # Periodo de cobro, solo para pagos generados por la facturación mensual
+    periodo_mes = models.IntegerField(null=True, blank=True)
+    periodo_anio = models.IntegerField(null=True, blank=True)
 
     def __str__(self):
         return f"Pago {self.id} - {self.usuario.email}"
@@ -178,6 +188,19 @@ class Pago(models.Model):
     class Meta:
         verbose_name = "Pago"
         verbose_name_plural = "Pagos"
+        indexes = [
+            # Orden de la paginación por cursor, global y por usuario
+            models.Index(fields=['fecha_creacion', 'id'], name='pago_creacion_idx'),
+            models.Index(fields=['usuario', 'fecha_creacion', 'id'], name='pago_usuario_creacion_idx'),
+            # Pagos de un usuario por estado, ordenados por vencimiento
+            models.Index(fields=['usuario', 'estado', 'fecha_vencimiento'], name='pago_usuario_estado_venc_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['usuario', 'periodo_anio', 'periodo_mes'],
+                name='pago_unico_por_periodo'
+            ),
+        ]
 
 class ConfiguracionMulta(models.Model):
     complejo = models.ForeignKey(ComplejoHabitacional, on_delete=models.CASCADE, related_name='configuraciones_multas')
@@ -202,6 +225,7 @@ class PagoDetalle(models.Model):
     multa = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
     dias_atraso = models.IntegerField(default=0)
     fecha_pago = models.DateField(null=True, blank=True)
+    gasto_comun = models.ForeignKey('GastoComun', on_delete=models.SET_NULL, null=True, blank=True, related_name='cobros')
 
     def calcular_multa(self):
         if not self.fecha_pago:
@@ -243,6 +267,9 @@ class PagoDetalle(models.Model):
     class Meta:
         verbose_name = "Detalle de Pago"
         verbose_name_plural = "Detalles de Pago"
+        constraints = [
+            models.UniqueConstraint(fields=['pago', 'gasto_comun'], name='detalle_unico_por_gasto'),
+        ]
 
 class GastoComun(models.Model):
     TIPOS = (
@@ -271,6 +298,39 @@ class GastoComun(models.Model):
         verbose_name = "Gasto Común"
         verbose_name_plural = "Gastos Comunes"
         ordering = ['-fecha', '-fecha_creacion']
+        indexes = [
+            # Filtro por periodo (con o sin complejo) que además entrega el orden del listado paginado (-fecha, -id)
+            models.Index(fields=['complejo', 'anio', 'mes', 'fecha', 'id'], name='gasto_complejo_periodo_idx'),
+            models.Index(fields=['anio', 'mes', 'fecha', 'id'], name='gasto_periodo_idx'),
+        ]
+
+class ResumenGastoComun(models.Model):
+    """
+    Totales de GastoComun por complejo, periodo, tipo y estado. Se mantiene desde las señales de GastoComun
+    y se puede reconstruir con el comando reconstruir_resumen_gastos.
+    """
+    complejo = models.ForeignKey(ComplejoHabitacional, on_delete=models.CASCADE, related_name='resumenes_gastos')
+    anio = models.IntegerField()
+    mes = models.IntegerField()
+    tipo = models.CharField(max_length=20, choices=GastoComun.TIPOS)
+    estado = models.CharField(max_length=20)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    cantidad = models.IntegerField(default=0)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.complejo_id} - {self.mes}/{self.anio} - {self.tipo} - {self.estado}: {self.total}"
+
+    class Meta:
+        verbose_name = "Resumen de Gasto Común"
+        verbose_name_plural = "Resúmenes de Gastos Comunes"
+        ordering = ['anio', 'mes', 'tipo', 'estado']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['complejo', 'anio', 'mes', 'tipo', 'estado'],
+                name='resumen_gasto_unico'
+            ),
+        ]
 
 class EspacioComun(models.Model):
     nombre = models.CharField(max_length=100)
@@ -304,6 +364,10 @@ class Reserva(models.Model):
     class Meta:
         verbose_name = "Reserva"
         verbose_name_plural = "Reservas"
+        indexes = [
+            models.Index(fields=['fecha_creacion', 'id'], name='reserva_creacion_idx'),
+            models.Index(fields=['usuario', 'fecha_creacion', 'id'], name='reserva_usuario_creacion_idx'),
+        ]
 
 class ReservaDetalle(models.Model):
     reserva = models.ForeignKey(Reserva, on_delete=models.CASCADE, related_name='detalles')
@@ -318,6 +382,25 @@ class ReservaDetalle(models.Model):
     class Meta:
         verbose_name = "Detalle de Reserva"
         verbose_name_plural = "Detalles de Reserva"
+        indexes = [
+            models.Index(fields=['espacio', 'fecha_inicio', 'fecha_fin'], name='reserva_espacio_intervalo_idx'),
+        ]
+
+class NotificacionQuerySet(models.QuerySet):
+    def para_usuario(self, usuario):
+        """
+        Notificaciones visibles para el usuario: difusiones a su complejo, difusiones a su rol
+        dentro de su complejo y las que lo incluyen como destinatario explícito.
+        """
+        complejos = ComplejoHabitacional.objects.filter(
+            models.Q(unidades__residentes=usuario) | models.Q(administradores=usuario)
+        ).values('id')
+        explicitas = Notificacion.destinatarios.through.objects.filter(usuario=usuario).values('notificacion_id')
+        return self.filter(
+            models.Q(audiencia='COMPLEJO', complejo__in=complejos)
+            | models.Q(audiencia='ROL', complejo__in=complejos, rol_destino_id=usuario.rol_id)
+            | models.Q(audiencia='USUARIOS', id__in=explicitas)
+        )
 
 class Notificacion(models.Model):
     TIPOS = (
@@ -325,6 +408,11 @@ class Notificacion(models.Model):
         ('ALERTA', 'Alerta'),
         ('URGENTE', 'Urgente'),
     )
+    AUDIENCIAS = (
+        ('USUARIOS', 'Usuarios seleccionados'),
+        ('COMPLEJO', 'Todo el complejo'),
+        ('ROL', 'Un rol dentro del complejo'),
+    )
     
     titulo = models.CharField(max_length=200)
     mensaje = models.TextField()
@@ -332,8 +420,13 @@ class Notificacion(models.Model):
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     fecha_publicacion = models.DateTimeField()
     creador = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='notificaciones_creadas')
-    destinatarios = models.ManyToManyField(Usuario, related_name='notificaciones_recibidas')
+    destinatarios = models.ManyToManyField(Usuario, related_name='notificaciones_recibidas', blank=True)
     complejo = models.ForeignKey(ComplejoHabitacional, on_delete=models.CASCADE, related_name='notificaciones')
+    # Las difusiones a COMPLEJO o ROL se resuelven al leer, sin filas en destinatarios
+    audiencia = models.CharField(max_length=20, choices=AUDIENCIAS, default='USUARIOS')
+    rol_destino = models.ForeignKey(Rol, on_delete=models.PROTECT, null=True, blank=True, related_name='notificaciones')
+
+    objects = NotificacionQuerySet.as_manager()
 
     def __str__(self):
         return f"{self.titulo} - {self.complejo.nombre}"
@@ -341,4 +434,51 @@ class Notificacion(models.Model):
     class Meta:
         verbose_name = "Notificación"
         verbose_name_plural = "Notificaciones"
-        ordering = ['-fecha_publicacion']
\ No newline at end of file
+        ordering = ['-fecha_publicacion']
+        indexes = [
+            models.Index(fields=['fecha_publicacion', 'id'], name='notificacion_publicacion_idx'),
+        ]
+
+class Trabajo(models.Model):
+    """
+    Operación pesada encolada para ejecutarse fuera de la petición con `manage.py procesar_trabajos`.
+    """
+    ESTADOS = (
+        ('PENDIENTE', 'Pendiente'),
+        ('EN_CURSO', 'En curso'),
+        ('COMPLETADO', 'Completado'),
+        # Agotó sus reintentos: queda para revisión y solo vuelve a la cola si se reintenta manualmente
+        ('MUERTO', 'Muerto'),
+    )
+
+    tipo = models.CharField(max_length=50)
+    parametros = models.JSONField(default=dict, blank=True)
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='PENDIENTE')
+    creado_por = models.ForeignKey(Usuario, on_delete=models.SET_NULL, null=True, blank=True, related_name='trabajos')
+    intentos = models.IntegerField(default=0)
+    max_intentos = models.IntegerField(default=3)
+    progreso_actual = models.IntegerField(default=0)
+    progreso_total = models.IntegerField(null=True, blank=True)
+    resultado = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    trabajador = models.CharField(max_length=100, blank=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    # Momento desde el que se puede reclamar: la creación o el fin del backoff de un reintento
+    disponible_desde = models.DateTimeField(default=timezone.now)
+    fecha_inicio = models.DateTimeField(null=True, blank=True)
+    fecha_fin = models.DateTimeField(null=True, blank=True)
+    # Métricas del último intento
+    espera_segundos = models.FloatField(null=True, blank=True)
+    duracion_segundos = models.FloatField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.tipo} #{self.id} ({self.get_estado_display()})"
+
+    class Meta:
+        verbose_name = "Trabajo"
+        verbose_name_plural = "Trabajos"
+        indexes = [
+            # Cola: pendientes disponibles en orden de llegada
+            models.Index(fields=['estado', 'disponible_desde', 'id'], name='trabajo_cola_idx'),
+            models.Index(fields=['creado_por', 'fecha_creacion'], name='trabajo_usuario_idx'),
+        ]
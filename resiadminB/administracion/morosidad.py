@@ -0,0 +1,137 @@
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Case, DecimalField, F, Min, Q, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import PagoDetalle
+
+CACHE_TIMEOUT = 600
+
+# Tramos de antigüedad en días de atraso: (nombre, mínimo, máximo o None)
+TRAMOS = (
+    ('0-30', 0, 30),
+    ('31-60', 31, 60),
+    ('61-90', 61, 90),
+    ('90+', 91, None),
+)
+
+CERO = Decimal('0.00')
+
+
+# Versión que comparten todos los complejos, para invalidarlos juntos
+GLOBAL = '*'
+
+
+def _clave_version(alcance):
+    return f'morosidad:version:{alcance}'
+
+
+def _versiones(complejo_id):
+    """
+    Versión vigente (timestamp de la última invalidación) del complejo y la global, creándolas si no existen.
+    """
+    claves = [_clave_version(complejo_id), _clave_version(GLOBAL)]
+    vigentes = cache.get_many(claves)
+    for clave in claves:
+        if clave not in vigentes:
+            cache.add(clave, time.time(), None)
+            vigentes[clave] = cache.get(clave)
+    return tuple(vigentes[clave] for clave in claves)
+
+
+def invalidar_morosidad(complejo_id=None):
+    """
+    Descarta los reportes cacheados de un complejo, o de todos si no se indica.
+    Cambia la versión del alcance: los reportes anteriores quedan sin uso y expiran solos.
+    """
+    cache.set(_clave_version(GLOBAL if complejo_id is None else complejo_id), time.time(), None)
+
+
+def _suma(expresion, condicion=None):
+    campo = DecimalField(max_digits=14, decimal_places=2)
+    if condicion is not None:
+        expresion = Case(When(condicion, then=expresion), default=Value(CERO), output_field=campo)
+    return Coalesce(Sum(expresion, output_field=campo), Value(CERO), output_field=campo)
+
+
+def consulta_morosidad(complejo, fecha_corte):
+    """
+    Consulta agregada con la deuda vencida e impaga de cada unidad del complejo y sus tramos de antigüedad.
+    """
+    deuda = F('monto') + F('multa')
+    tramos = {}
+    for nombre, minimo, maximo in TRAMOS:
+        condicion = Q(fecha_vencimiento__lte=fecha_corte - timedelta(days=max(minimo, 1)))
+        if maximo is not None:
+            condicion &= Q(fecha_vencimiento__gte=fecha_corte - timedelta(days=maximo))
+        tramos[f'tramo_{nombre}'] = _suma(deuda, condicion)
+
+    return PagoDetalle.objects.filter(
+        pago__usuario__unidad_habitacional__complejo=complejo,
+        pago__estado='PENDIENTE',
+        fecha_pago__isnull=True,
+        fecha_vencimiento__lt=fecha_corte,
+    ).values(
+        unidad=F('pago__usuario__unidad_habitacional'),
+        numero=F('pago__usuario__unidad_habitacional__numero'),
+    ).annotate(
+        adeudado=_suma(F('monto')),
+        multas=_suma(F('multa')),
+        vencimiento_mas_antiguo=Min('fecha_vencimiento'),
+        **tramos
+    ).order_by('-adeudado', 'numero')
+
+
+def calcular_morosidad(complejo, fecha_corte):
+    """
+    Deuda vencida e impaga por unidad del complejo, con tramos de antigüedad, en una sola consulta agregada.
+    """
+    filas = consulta_morosidad(complejo, fecha_corte)
+    unidades = []
+    totales = {
+        'adeudado': CERO, 'multas': CERO, 'total': CERO,
+        'tramos': {nombre: CERO for nombre, _, _ in TRAMOS},
+    }
+    for fila in filas:
+        unidad = {
+            'unidad': fila['unidad'],
+            'numero': fila['numero'],
+            'adeudado': fila['adeudado'],
+            'multas': fila['multas'],
+            'total': fila['adeudado'] + fila['multas'],
+            'vencimiento_mas_antiguo': fila['vencimiento_mas_antiguo'],
+            'dias_atraso': (fecha_corte - fila['vencimiento_mas_antiguo']).days,
+            'tramos': {nombre: fila[f'tramo_{nombre}'] for nombre, _, _ in TRAMOS},
+        }
+        unidades.append(unidad)
+        for campo in ('adeudado', 'multas', 'total'):
+            totales[campo] += unidad[campo]
+        for nombre in unidad['tramos']:
+            totales['tramos'][nombre] += unidad['tramos'][nombre]
+    totales['unidades_morosas'] = len(unidades)
+
+    return {
+        'complejo': complejo.id,
+        'fecha_corte': fecha_corte,
+        'unidades': unidades,
+        'totales': totales,
+    }
+
+
+def reporte_morosidad(complejo, fecha_corte=None):
+    """
+    Reporte de morosidad cacheado por complejo y fecha de corte, cada uno en su propia entrada con su TTL.
+    Se invalida desde las señales de Pago y PagoDetalle.
+    """
+    fecha_corte = fecha_corte or timezone.localdate()
+    version, version_global = _versiones(complejo.id)
+    clave = f'morosidad:{complejo.id}:{fecha_corte.isoformat()}:{version}:{version_global}'
+    reporte = cache.get(clave)
+    if reporte is None:
+        reporte = calcular_morosidad(complejo, fecha_corte)
+        cache.set(clave, reporte, CACHE_TIMEOUT)
+    return reporte
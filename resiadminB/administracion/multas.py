@@ -0,0 +1,78 @@
+from decimal import Decimal
+
+from django.db import transaction
+
+from .models import ConfiguracionMulta, PagoDetalle
+from .morosidad import invalidar_morosidad
+from .respuestas import invalidar_respuestas
+
+TAMANO_LOTE = 1000
+CENTAVOS = Decimal('0.01')
+
+
+def calcular_multa_detalle(monto, fecha_vencimiento, fecha_pago, configuracion):
+    """
+    Versión sin consultas de PagoDetalle.calcular_multa.
+    Devuelve (multa, dias_atraso); dias_atraso es None cuando calcular_multa no lo modificaría.
+    """
+    if not fecha_pago or not configuracion:
+        return Decimal('0.00'), None
+
+    dias_atraso = (fecha_pago - fecha_vencimiento).days - configuracion.dias_tolerancia
+    if dias_atraso <= 0:
+        return Decimal('0.00'), None
+
+    multa_base = (monto * configuracion.porcentaje_multa_diaria / 100) * dias_atraso
+    if multa_base < configuracion.monto_minimo_multa:
+        multa_base = configuracion.monto_minimo_multa
+    elif multa_base > configuracion.monto_maximo_multa:
+        multa_base = configuracion.monto_maximo_multa
+    return multa_base, dias_atraso
+
+
+def configuraciones_activas():
+    """
+    Configuración activa de cada complejo, con el mismo criterio que ConfiguracionMulta.objects.filter(...).first().
+    """
+    configuraciones = {}
+    for configuracion in ConfiguracionMulta.objects.filter(activo=True).order_by('id'):
+        configuraciones.setdefault(configuracion.complejo_id, configuracion)
+    return configuraciones
+
+
+def recalcular_multas(complejo=None, detalles=None, tamano_lote=TAMANO_LOTE):
+    """
+    Recalcula dias_atraso y multa de los detalles pagados en una sola pasada y los guarda con bulk_update.
+    `complejo` limita el recálculo a un complejo; `detalles` permite pasar un queryset de PagoDetalle ya filtrado.
+    Devuelve la cantidad de detalles revisados y actualizados.
+    """
+    configuraciones = configuraciones_activas()
+    queryset = PagoDetalle.objects.all() if detalles is None else detalles
+    queryset = queryset.filter(fecha_pago__isnull=False)
+    if complejo is not None:
+        queryset = queryset.filter(pago__usuario__unidad_habitacional__complejo=complejo)
+
+    filas = queryset.order_by('id').values_list(
+        'id', 'monto', 'fecha_vencimiento', 'fecha_pago', 'multa', 'dias_atraso',
+        'pago__usuario__unidad_habitacional__complejo_id'
+    )
+
+    revisados = 0
+    cambios = []
+    for detalle_id, monto, vencimiento, fecha_pago, multa, dias, complejo_id in filas.iterator(chunk_size=tamano_lote):
+        revisados += 1
+        nueva_multa, nuevos_dias = calcular_multa_detalle(
+            monto, vencimiento, fecha_pago, configuraciones.get(complejo_id)
+        )
+        if nuevos_dias is None:
+            nuevos_dias = dias
+        if nueva_multa.quantize(CENTAVOS) != multa or nuevos_dias != dias:
+            cambios.append(PagoDetalle(id=detalle_id, multa=nueva_multa, dias_atraso=nuevos_dias))
+
+    with transaction.atomic():
+        PagoDetalle.objects.bulk_update(cambios, ['multa', 'dias_atraso'], batch_size=tamano_lote)
+    if cambios:
+        invalidar_morosidad(complejo.id if complejo is not None else None)
+        invalidar_respuestas('pagos')
+
+    return {'revisados': revisados, 'actualizados': len(cambios)}
@@ -0,0 +1,18 @@
+from rest_framework.pagination import CursorPagination
+
+
+class CursorPaginacion(CursorPagination):
+    """
+    Paginación por cursor (keyset): cada página filtra desde la última fila vista en lugar de usar OFFSET,
+    y no ejecuta COUNT(*). El orden se toma del atributo `orden_paginacion` de la vista, que debe apoyarse
+    en columnas indexadas y terminar en una columna única.
+    """
+    ordering = ('-id',)
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def get_ordering(self, request, queryset, view):
+        ordering = getattr(view, 'orden_paginacion', None)
+        if ordering:
+            return tuple(ordering)
+        return super().get_ordering(request, queryset, view)
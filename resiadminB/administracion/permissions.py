@@ -0,0 +1,16 @@
+from rest_framework import permissions
+
+
+class EsAdministrador(permissions.BasePermission):
+    """
+    Permite el acceso solo a superusuarios y a usuarios con rol ADMIN o SUPERADMIN.
+    """
+    message = 'No tienes el rol de administrador'
+
+    def has_permission(self, request, view):
+        user = request.user
+        if not user or not user.is_authenticated:
+            return False
+        if user.is_superuser:
+            return True
+        return bool(user.rol and user.rol.nombre in ('ADMIN', 'SUPERADMIN'))
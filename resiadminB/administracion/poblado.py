@@ -0,0 +1,284 @@
+import random
+from calendar import monthrange
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import connection, connections
+from django.utils import timezone
+
+from .basedatos import ejecutar_con_reintentos
+from .models import (
+    ComplejoHabitacional, EspacioComun, GastoComun, Notificacion, Pago, PagoDetalle, Reserva, ReservaDetalle,
+    Rol, UnidadHabitacional, Usuario
+)
+from .validators import calcular_dv
+
+DOMINIO = 'seed.test'
+RUT_INICIAL = 20000000
+# Los RUT válidos tienen 7 u 8 dígitos
+RUT_MAXIMO = 99999999
+
+# complejos, unidades por complejo, meses de cobros por residente, reservas promedio por residente,
+# notificaciones por complejo y destinatarios de cada notificación dirigida
+PRESETS = {
+    'pequeno': {'complejos': 10, 'unidades': 50, 'meses': 12, 'reservas': 2, 'notificaciones': 20, 'destinatarios': 10},
+    'mediano': {'complejos': 200, 'unidades': 100, 'meses': 12, 'reservas': 2, 'notificaciones': 50, 'destinatarios': 20},
+    'grande': {'complejos': 1000, 'unidades': 200, 'meses': 6, 'reservas': 2, 'notificaciones': 100, 'destinatarios': 50},
+    'produccion': {'complejos': 3000, 'unidades': 150, 'meses': 12, 'reservas': 3, 'notificaciones': 200, 'destinatarios': 50},
+}
+
+ESPACIOS = (('Quincho', 20), ('Sala multiuso', 40), ('Piscina', 30))
+CONCEPTOS_GASTO = ('MANTENIMIENTO', 'LIMPIEZA', 'SEGURIDAD', 'ADMINISTRACION')
+# Proporción de notificaciones por audiencia
+AUDIENCIAS = (('COMPLEJO', 0.6), ('USUARIOS', 0.3), ('ROL', 0.1))
+
+
+ROLES = (('ADMIN', 'Administrador de Complejo'), ('RESIDENTE', 'Residente'))
+
+
+def rut(numero):
+    return f'{numero}-{calcular_dv(str(numero))}'
+
+
+def crear_roles():
+    """
+    Roles que asigna poblar_complejos; se crean antes de repartir los complejos entre procesos.
+    """
+    for nombre, descripcion in ROLES:
+        Rol.objects.get_or_create(nombre=nombre, defaults={'descripcion': descripcion})
+
+
+def armar_configuracion(**valores):
+    """
+    Configuración completa de poblar_complejos: el preset pequeño y los valores por defecto de seed_scale,
+    reemplazados por `valores`.
+    """
+    configuracion = dict(
+        PRESETS['pequeno'], semilla=0, lote=5000, rut_inicial=RUT_INICIAL, referencia=timezone.localdate(),
+        password='!', dominio=DOMINIO
+    )
+    configuracion.update(valores)
+    return configuracion
+
+
+def estimar_filas(configuracion):
+    """
+    Filas aproximadas por tabla que generará la configuración.
+    """
+    complejos = configuracion['complejos']
+    residentes = complejos * configuracion['unidades']
+    pagos = residentes * configuracion['meses']
+    dirigidas = complejos * configuracion['notificaciones'] * 0.3
+    return {
+        'complejos': complejos,
+        'unidades': residentes,
+        'usuarios': residentes + complejos,
+        'pagos': pagos,
+        'pagos_detalle': pagos * 2,
+        'reservas_detalle': residentes * configuracion['reservas'],
+        'notificaciones': complejos * configuracion['notificaciones'],
+        'destinatarios': int(dirigidas * min(configuracion['destinatarios'], configuracion['unidades'])),
+    }
+
+
+def insertar_filas(modelo, campos, filas, lote):
+    """
+    INSERT por lotes con executemany, sin instanciar modelos ni pasar cada valor por el compilador del ORM,
+    que es lo que domina el costo de bulk_create con millones de filas. `filas` son tuplas en el orden de
+    `campos` con valores que el driver ya sabe adaptar (Django registra los de Decimal y date en SQLite).
+    """
+    quote = connection.ops.quote_name
+    columnas = ', '.join(quote(modelo._meta.get_field(campo).column) for campo in campos)
+    sql = f"INSERT INTO {quote(modelo._meta.db_table)} ({columnas}) VALUES ({', '.join(['%s'] * len(campos))})"
+    with connection.cursor() as cursor:
+        for desde in range(0, len(filas), lote):
+            cursor.executemany(sql, filas[desde:desde + lote])
+    return len(filas)
+
+
+def _periodos(referencia, meses):
+    """
+    (anio, mes) de los `meses` periodos que terminan en el mes de `referencia`, del más antiguo al más reciente.
+    """
+    periodos = []
+    anio, mes = referencia.year, referencia.month
+    for _ in range(meses):
+        periodos.append((anio, mes))
+        anio, mes = (anio - 1, 12) if mes == 1 else (anio, mes - 1)
+    return periodos[::-1]
+
+
+def _poblar_complejo(indice, configuracion, roles, contadores):
+    """
+    Crea un complejo completo. Todo lo aleatorio sale de un generador propio del complejo, así el resultado
+    depende solo de la semilla y del índice, no de cuántos procesos poblaron ni en qué orden.
+    """
+    rng = random.Random(f"{configuracion['semilla']}:{indice}")
+    lote = configuracion['lote']
+    unidades_por_complejo = configuracion['unidades']
+    referencia = configuracion['referencia']
+    dominio = configuracion['dominio']
+    zona = timezone.get_current_timezone()
+    base_usuario = indice * unidades_por_complejo
+
+    complejo = ComplejoHabitacional.objects.create(
+        nombre=f'Complejo {indice + 1}', direccion=f'Avenida Semilla {indice + 1}',
+        email=f'complejo{indice}@{dominio}'
+    )
+    # Usuario.save deja al administrador asignado también en el complejo
+    administrador = Usuario.objects.create(
+        email=f'admin{indice}@{dominio}', first_name='Administrador', last_name=str(indice + 1),
+        password=configuracion['password'], rol=roles['ADMIN'], complejo_administrado=complejo,
+        rut=rut(configuracion['rut_inicial'] + configuracion['complejos'] * unidades_por_complejo + indice)
+    )
+    espacios = EspacioComun.objects.bulk_create([
+        EspacioComun(nombre=nombre, capacidad=capacidad, complejo=complejo) for nombre, capacidad in ESPACIOS
+    ])
+
+    unidades = UnidadHabitacional.objects.bulk_create([
+        UnidadHabitacional(
+            numero=f'{piso + 1}{numero + 1:02d}'[:10], tipo='Departamento', complejo=complejo,
+            metros_cuadrados=Decimal(rng.randint(35, 140))
+        )
+        for piso, numero in (divmod(i, 10) for i in range(unidades_por_complejo))
+    ], batch_size=lote)
+    residentes = Usuario.objects.bulk_create([
+        Usuario(
+            email=f'residente{base_usuario + i}@{dominio}', first_name='Residente', last_name=str(base_usuario + i),
+            password=configuracion['password'],
+            rut=rut(configuracion['rut_inicial'] + base_usuario + i),
+            rut_normalizado=rut(configuracion['rut_inicial'] + base_usuario + i),
+            telefono=f'+569{rng.randint(10000000, 99999999)}', rol=roles['RESIDENTE'], unidad_habitacional=unidad
+        )
+        for i, unidad in enumerate(unidades)
+    ], batch_size=lote)
+
+    # Gastos comunes del complejo y cobros mensuales de cada residente, prorrateados por metros cuadrados
+    periodos = _periodos(referencia, configuracion['meses'])
+    gastos = []
+    for anio, mes in periodos:
+        for tipo in CONCEPTOS_GASTO:
+            gastos.append(GastoComun(
+                complejo=complejo, tipo=tipo, descripcion=f'{tipo.title()} {mes}/{anio}',
+                monto=Decimal(rng.randint(200, 2000) * 1000), fecha=date(anio, mes, rng.randint(1, 28)),
+                mes=mes, anio=anio, creado_por=administrador, estado='APROBADO'
+            ))
+    GastoComun.objects.bulk_create(gastos, batch_size=lote)
+
+    # Pagos y detalles son la mayoría de las filas: se insertan como tuplas y los id de los pagos se
+    # recuperan por su periodo, que es único por usuario
+    creacion = connection.ops.adapt_datetimefield_value(timezone.now())
+    cero = Decimal('0.00')
+    pagos, montos = [], {}
+    for anio, mes in periodos:
+        vencimiento = date(anio, mes, min(10, monthrange(anio, mes)[1]))
+        antiguedad = (referencia.year - anio) * 12 + referencia.month - mes
+        for residente, unidad in zip(residentes, unidades):
+            gasto_comun = unidad.metros_cuadrados * 800
+            fondo = (gasto_comun / 10).quantize(Decimal('1'))
+            # Los periodos viejos están casi todos pagados; los recientes, cerca de la mitad
+            pagado = rng.random() < (0.95 if antiguedad > 2 else 0.5)
+            fecha_pago = vencimiento - timedelta(days=rng.randint(0, 9)) if pagado else None
+            pagos.append((
+                residente.id, creacion, vencimiento, 'PAGADO' if pagado else 'PENDIENTE', gasto_comun + fondo,
+                mes, anio
+            ))
+            montos[residente.id, anio, mes] = (vencimiento, gasto_comun, fondo, fecha_pago)
+    insertar_filas(
+        Pago, ['usuario', 'fecha_creacion', 'fecha_vencimiento', 'estado', 'monto_total', 'periodo_mes',
+               'periodo_anio'], pagos, lote
+    )
+    detalles = []
+    ids_pagos = Pago.objects.filter(
+        usuario_id__in=[residente.id for residente in residentes], periodo_anio__isnull=False
+    ).values_list('id', 'usuario_id', 'periodo_anio', 'periodo_mes')
+    for pago_id, usuario_id, anio, mes in ids_pagos.iterator(chunk_size=lote):
+        vencimiento, gasto_comun, fondo, fecha_pago = montos[usuario_id, anio, mes]
+        detalles.append((pago_id, 'Gasto común', gasto_comun, vencimiento, cero, 0, fecha_pago))
+        detalles.append((pago_id, 'Fondo de reserva', fondo, vencimiento, cero, 0, fecha_pago))
+    insertar_filas(
+        PagoDetalle, ['pago', 'concepto', 'monto', 'fecha_vencimiento', 'multa', 'dias_atraso', 'fecha_pago'],
+        detalles, lote
+    )
+
+    # Reservas en bloques de 3 horas consecutivos por espacio, para que no se traslapen
+    inicio_reservas = datetime.combine(referencia - timedelta(days=180), time(9), tzinfo=zona)
+    bloques = {espacio.id: 0 for espacio in espacios}
+    reservas, detalles_reserva = [], []
+    for residente in residentes:
+        for _ in range(rng.randint(0, 2 * configuracion['reservas'])):
+            espacio = rng.choice(espacios)
+            inicio = inicio_reservas + timedelta(hours=3 * bloques[espacio.id])
+            bloques[espacio.id] += 1
+            reserva = Reserva(usuario=residente, estado=rng.choice(('PENDIENTE', 'CONFIRMADA', 'CONFIRMADA')))
+            reservas.append(reserva)
+            detalles_reserva.append(ReservaDetalle(
+                reserva=reserva, espacio=espacio, fecha_inicio=inicio, fecha_fin=inicio + timedelta(hours=2),
+                cantidad_personas=rng.randint(1, espacio.capacidad)
+            ))
+    Reserva.objects.bulk_create(reservas, batch_size=lote)
+    ReservaDetalle.objects.bulk_create(detalles_reserva, batch_size=lote)
+
+    # Notificaciones: difusiones al complejo o a un rol, y avisos dirigidos con filas en destinatarios
+    audiencias = [audiencia for audiencia, _ in AUDIENCIAS]
+    pesos = [peso for _, peso in AUDIENCIAS]
+    fin_publicacion = datetime.combine(referencia, time(12), tzinfo=zona)
+    notificaciones = []
+    for i in range(configuracion['notificaciones']):
+        audiencia = rng.choices(audiencias, pesos)[0]
+        notificaciones.append(Notificacion(
+            titulo=f'Aviso {i + 1}', mensaje='Mensaje generado para pruebas de carga.',
+            tipo=rng.choice(('INFO', 'INFO', 'ALERTA', 'URGENTE')), complejo=complejo, creador=administrador,
+            audiencia=audiencia, rol_destino=roles['RESIDENTE'] if audiencia == 'ROL' else None,
+            fecha_publicacion=fin_publicacion - timedelta(minutes=rng.randint(0, 365 * 24 * 60))
+        ))
+    Notificacion.objects.bulk_create(notificaciones, batch_size=lote)
+    cantidad = min(configuracion['destinatarios'], len(residentes))
+    destinatarios = [
+        (notificacion.id, residente.id)
+        for notificacion in notificaciones if notificacion.audiencia == 'USUARIOS'
+        for residente in rng.sample(residentes, cantidad)
+    ]
+    insertar_filas(Notificacion.destinatarios.through, ['notificacion', 'usuario'], destinatarios, lote)
+
+    for clave, valor in (
+        ('complejos', 1), ('unidades', len(unidades)), ('usuarios', len(residentes) + 1), ('pagos', len(pagos)),
+        ('pagos_detalle', len(detalles)), ('reservas_detalle', len(detalles_reserva)),
+        ('notificaciones', len(notificaciones)), ('destinatarios', len(destinatarios)),
+    ):
+        contadores[clave] = contadores.get(clave, 0) + valor
+
+
+def poblar_complejos(indices, configuracion):
+    """
+    Pobla los complejos de `indices`, agrupando varios por transacción para acercarse a `lote` filas
+    por commit. Cada transacción se reintenta completa si la base está bloqueada por otro proceso.
+    Devuelve la cantidad de filas creadas por tabla.
+    """
+    roles = {rol.nombre: rol for rol in Rol.objects.filter(nombre__in=['ADMIN', 'RESIDENTE'])}
+    filas_por_complejo = configuracion['unidades'] * (configuracion['meses'] * 3 + 2)
+    por_transaccion = max(1, configuracion['lote'] // max(filas_por_complejo, 1))
+    contadores = {}
+    for desde in range(0, len(indices), por_transaccion):
+        grupo = indices[desde:desde + por_transaccion]
+        parciales = {}
+
+        def poblar_grupo():
+            parciales.clear()
+            for indice in grupo:
+                _poblar_complejo(indice, configuracion, roles, parciales)
+
+        ejecutar_con_reintentos(poblar_grupo)
+        for clave, valor in parciales.items():
+            contadores[clave] = contadores.get(clave, 0) + valor
+    return contadores
+
+
+def poblar_en_proceso(indices, configuracion):
+    """
+    Punto de entrada de cada proceso del pool: usa su propia conexión y la cierra al terminar.
+    """
+    try:
+        return poblar_complejos(indices, configuracion)
+    finally:
+        connections.close_all()
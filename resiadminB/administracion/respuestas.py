@@ -0,0 +1,51 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+
+CACHE_TIMEOUT = 300
+
+# Alcance que ven los administradores (todas las filas): cambia con cualquier escritura del recurso
+TODOS = 'todos'
+# Alcance incluido en todas las claves del recurso, para invalidarlo completo tras operaciones en bloque
+GLOBAL = '*'
+
+
+def _clave_version(recurso, alcance):
+    return f'respuestas:version:{recurso}:{alcance}'
+
+
+def versiones(recurso, alcances):
+    """
+    Versión vigente de cada alcance (timestamp de su última invalidación), creándola si no existe.
+    Una respuesta cacheada es válida mientras ninguna de las versiones de su clave cambie.
+    """
+    claves = {_clave_version(recurso, alcance): alcance for alcance in (GLOBAL, *alcances)}
+    vigentes = cache.get_many(list(claves))
+    for clave in claves:
+        if clave not in vigentes:
+            cache.add(clave, time.time(), None)
+            vigentes[clave] = cache.get(clave)
+    return {alcance: vigentes[clave] for clave, alcance in claves.items()}
+
+
+def invalidar_respuestas(recurso, alcances=None):
+    """
+    Invalida las respuestas cacheadas de `recurso` para los alcances indicados (además de TODOS),
+    o todas las del recurso si no se indican.
+    """
+    alcances = [GLOBAL] if alcances is None else [TODOS, *alcances]
+    ahora = time.time()
+    cache.set_many({_clave_version(recurso, alcance): ahora for alcance in alcances}, None)
+
+
+def clave_respuesta(recurso, vigentes, *partes):
+    """
+    Clave de una respuesta: recurso, versiones de sus alcances y lo que la distingue (usuario, ruta, formato).
+    """
+    firma = repr((sorted(vigentes.items()), partes)).encode('utf-8')
+    return f'respuestas:{recurso}:{hashlib.sha256(firma).hexdigest()}'
+
+
+def calcular_etag(contenido):
+    return '"%s"' % hashlib.sha256(contenido).hexdigest()
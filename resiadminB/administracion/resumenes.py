@@ -0,0 +1,56 @@
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from .models import GastoComun, ResumenGastoComun
+
+CAMPOS_CLAVE = ('complejo_id', 'anio', 'mes', 'tipo', 'estado')
+
+
+def clave_resumen(gasto):
+    return tuple(getattr(gasto, campo) for campo in CAMPOS_CLAVE)
+
+
+def recalcular_resumen(complejo_id, anio, mes, tipo, estado):
+    """
+    Recalcula una fila del resumen agregando solo los gastos de esa combinación.
+    """
+    filtro = dict(complejo_id=complejo_id, anio=anio, mes=mes, tipo=tipo, estado=estado)
+    totales = GastoComun.objects.filter(**filtro).order_by().aggregate(total=Sum('monto'), cantidad=Count('id'))
+    if not totales['cantidad']:
+        ResumenGastoComun.objects.filter(**filtro).delete()
+        return
+    ResumenGastoComun.objects.update_or_create(
+        **filtro, defaults={'total': totales['total'], 'cantidad': totales['cantidad']}
+    )
+
+
+def reconstruir_resumenes(complejo=None):
+    """
+    Reconstruye el resumen completo (o el de un complejo) desde la tabla de gastos.
+    Devuelve la cantidad de filas generadas.
+    """
+    gastos = GastoComun.objects.all()
+    resumenes = ResumenGastoComun.objects.all()
+    if complejo is not None:
+        gastos = gastos.filter(complejo=complejo)
+        resumenes = resumenes.filter(complejo=complejo)
+
+    filas = gastos.order_by().values(*CAMPOS_CLAVE).annotate(total=Sum('monto'), cantidad=Count('id'))
+    with transaction.atomic():
+        resumenes.delete()
+        creados = ResumenGastoComun.objects.bulk_create(
+            [ResumenGastoComun(**fila) for fila in filas.iterator()], batch_size=1000
+        )
+    return len(creados)
+
+
+def resumen_por_periodo(complejo, anio_desde=None, anio_hasta=None):
+    """
+    Lectura del resumen materializado ordenada por periodo, sin agregar sobre la tabla de gastos.
+    """
+    queryset = ResumenGastoComun.objects.filter(complejo=complejo)
+    if anio_desde is not None:
+        queryset = queryset.filter(anio__gte=anio_desde)
+    if anio_hasta is not None:
+        queryset = queryset.filter(anio__lte=anio_hasta)
+    return queryset.values('anio', 'mes', 'tipo', 'estado', 'total', 'cantidad')
@@ -0,0 +1,57 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+PRIMARIO = DEFAULT_DB_ALIAS
+REPLICA = 'replica'
+
+# Estado de la petición en curso: a qué base van las lecturas y si ya hubo una escritura.
+# Es un diccionario mutable para que lo que marca el router sea visible para el middleware.
+_estado = ContextVar('estado_replica', default=None)
+
+
+def hay_replica():
+    return REPLICA in settings.DATABASES
+
+
+@contextmanager
+def lecturas_en(alias):
+    """
+    Dirige las lecturas del bloque a `alias` (hasta que ocurra una escritura, que las fija en el primario).
+    Fuera de este bloque y del middleware las lecturas van al primario.
+    """
+    estado = {'lectura': alias, 'escritura': False}
+    token = _estado.set(estado)
+    try:
+        yield estado
+    finally:
+        _estado.reset(token)
+
+
+class RouterLecturaEscritura:
+    """
+    Envía las lecturas de las peticiones de solo lectura a la réplica y todo lo demás al primario.
+    Tras la primera escritura, las lecturas del resto de la petición también van al primario.
+    """
+
+    def db_for_read(self, model, **hints):
+        estado = _estado.get()
+        if estado is None or not hay_replica():
+            return PRIMARIO
+        return estado['lectura']
+
+    def db_for_write(self, model, **hints):
+        estado = _estado.get()
+        if estado is not None:
+            estado['escritura'] = True
+            estado['lectura'] = PRIMARIO
+        return PRIMARIO
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Primario y réplica tienen los mismos datos
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
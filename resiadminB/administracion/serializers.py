@@ -1,27 +1,32 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from .models import WhiteList, Pago, Reserva, Notificacion, Rol, UnidadHabitacional, EspacioComun, ReservaDetalle, PagoDetalle, GastoComun
+from django.db import transaction
+from .bandeja import difusor
+from .campos import CamposDinamicosMixin
+from .respuestas import invalidar_respuestas
+from .validators import normalizar_rut
+from .models import WhiteList, Pago, Reserva, Notificacion, Rol, UnidadHabitacional, EspacioComun, ReservaDetalle, PagoDetalle, GastoComun, ComplejoHabitacional, ResumenGastoComun, Trabajo
 
 User = get_user_model()
 
-class RolSerializer(serializers.ModelSerializer):
+class RolSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = Rol
         fields = ['id', 'nombre', 'descripcion']
 
-class UnidadHabitacionalSerializer(serializers.ModelSerializer):
+class UnidadHabitacionalSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = UnidadHabitacional
         fields = ['id', 'numero', 'tipo', 'complejo', 'metros_cuadrados', 
                  'fecha_creacion', 'activo']
         read_only_fields = ['id', 'fecha_creacion']
 
-class EspacioComunSerializer(serializers.ModelSerializer):
+class EspacioComunSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = EspacioComun
         fields = ['id', 'nombre', 'descripcion', 'capacidad', 'complejo', 'activo']
 
-class UsuarioSerializer(serializers.ModelSerializer):
+class UsuarioSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
     rol = RolSerializer(read_only=True)
     rol_id = serializers.PrimaryKeyRelatedField(
@@ -44,6 +49,15 @@ class UsuarioSerializer(serializers.ModelSerializer):
                  'unidad_habitacional_id']
         read_only_fields = ['id']
 
+    def validate_rut(self, value):
+        # La restricción única está sobre la forma canónica: 11.111.111-1 y 11111111-1 son el mismo RUT
+        existentes = User.objects.filter(rut_normalizado=normalizar_rut(value))
+        if self.instance is not None:
+            existentes = existentes.exclude(pk=self.instance.pk)
+        if existentes.exists():
+            raise serializers.ValidationError('Ya existe un usuario con este RUT')
+        return value
+
     def create(self, validated_data):
         password = validated_data.pop('password')
         user = super().create(validated_data)
@@ -51,13 +65,13 @@ class UsuarioSerializer(serializers.ModelSerializer):
         user.save()
         return user
 
-class WhiteListSerializer(serializers.ModelSerializer):
+class WhiteListSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = WhiteList
         fields = ['id', 'email', 'estado', 'fecha_creacion', 'complejo']
         read_only_fields = ['id', 'fecha_creacion']
 
-class PagoSerializer(serializers.ModelSerializer):
+class PagoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     usuario = UsuarioSerializer(read_only=True)
     usuario_id = serializers.PrimaryKeyRelatedField(
         queryset=User.objects.all(),
@@ -71,7 +85,7 @@ class PagoSerializer(serializers.ModelSerializer):
                  'fecha_vencimiento', 'estado', 'monto_total']
         read_only_fields = ['id', 'fecha_creacion']
 
-class ReservaDetalleSerializer(serializers.ModelSerializer):
+class ReservaDetalleSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     espacio = EspacioComunSerializer(read_only=True)
     espacio_id = serializers.PrimaryKeyRelatedField(
         queryset=EspacioComun.objects.all(),
@@ -84,7 +98,7 @@ class ReservaDetalleSerializer(serializers.ModelSerializer):
         fields = ['id', 'reserva', 'espacio', 'espacio_id', 'fecha_inicio', 
                  'fecha_fin', 'cantidad_personas']
 
-class ReservaSerializer(serializers.ModelSerializer):
+class ReservaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     usuario = UsuarioSerializer(read_only=True)
     usuario_id = serializers.PrimaryKeyRelatedField(
         queryset=User.objects.all(),
@@ -99,7 +113,7 @@ class ReservaSerializer(serializers.ModelSerializer):
                  'observaciones', 'detalles']
         read_only_fields = ['id', 'fecha_creacion']
 
-class NotificacionSerializer(serializers.ModelSerializer):
+class NotificacionSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     creador = UsuarioSerializer(read_only=True)
     creador_id = serializers.PrimaryKeyRelatedField(
         queryset=User.objects.all(),
@@ -107,26 +121,78 @@ class NotificacionSerializer(serializers.ModelSerializer):
         write_only=True
     )
     destinatarios = UsuarioSerializer(many=True, read_only=True)
-    destinatarios_ids = serializers.PrimaryKeyRelatedField(
-        queryset=User.objects.all(),
-        source='destinatarios',
+    # Lista simple de IDs: se validan con una sola consulta en lugar de una por destinatario
+    destinatarios_ids = serializers.ListField(
+        child=serializers.IntegerField(),
         write_only=True,
-        many=True
+        required=False
     )
 
     class Meta:
         model = Notificacion
         fields = ['id', 'titulo', 'mensaje', 'tipo', 'fecha_creacion', 
                  'fecha_publicacion', 'creador', 'creador_id', 'destinatarios',
-                 'destinatarios_ids', 'complejo']
+                 'destinatarios_ids', 'complejo', 'audiencia', 'rol_destino']
         read_only_fields = ['id', 'fecha_creacion']
 
-class PagoDetalleSerializer(serializers.ModelSerializer):
+    def validate_destinatarios_ids(self, value):
+        ids = set(value)
+        existentes = set(User.objects.filter(id__in=ids).values_list('id', flat=True))
+        if ids - existentes:
+            raise serializers.ValidationError(f'Usuarios no encontrados: {sorted(ids - existentes)}')
+        return sorted(ids)
+
+    def validate(self, data):
+        audiencia = data.get('audiencia', getattr(self.instance, 'audiencia', 'USUARIOS'))
+        if audiencia == 'USUARIOS':
+            if not data.get('destinatarios_ids') and self.instance is None:
+                raise serializers.ValidationError({'destinatarios_ids': 'Debe indicar al menos un destinatario'})
+        elif data.get('destinatarios_ids'):
+            raise serializers.ValidationError({'destinatarios_ids': 'Solo se usan con la audiencia USUARIOS'})
+        if audiencia == 'ROL' and not data.get('rol_destino', getattr(self.instance, 'rol_destino', None)):
+            raise serializers.ValidationError({'rol_destino': 'Debe indicar el rol destinatario'})
+        return data
+
+    def _guardar_destinatarios(self, notificacion, ids, anteriores=()):
+        # Un único INSERT para todas las filas de la tabla intermedia
+        Through = Notificacion.destinatarios.through
+        if anteriores:
+            Through.objects.filter(notificacion=notificacion).delete()
+        Through.objects.bulk_create(
+            [Through(notificacion_id=notificacion.id, usuario_id=usuario_id) for usuario_id in ids]
+        )
+        # Las operaciones en bloque sobre la tabla intermedia no disparan m2m_changed
+        afectados = set(ids) | set(anteriores)
+        if afectados:
+            invalidar_respuestas('notificaciones', [f'usuario:{usuario_id}' for usuario_id in sorted(afectados)])
+        if ids:
+            transaction.on_commit(lambda: difusor.publicar(usuario_ids=ids))
+
+    def create(self, validated_data):
+        ids = validated_data.pop('destinatarios_ids', [])
+        notificacion = super().create(validated_data)
+        if ids:
+            self._guardar_destinatarios(notificacion, ids)
+        return notificacion
+
+    def update(self, instance, validated_data):
+        ids = validated_data.pop('destinatarios_ids', None)
+        notificacion = super().update(instance, validated_data)
+        if ids is not None or notificacion.audiencia != 'USUARIOS':
+            anteriores = list(
+                Notificacion.destinatarios.through.objects.filter(
+                    notificacion=notificacion
+                ).values_list('usuario_id', flat=True)
+            )
+            self._guardar_destinatarios(notificacion, ids or [], anteriores)
+        return notificacion
+
+class PagoDetalleSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = PagoDetalle
         fields = '__all__'
 
-class GastoComunSerializer(serializers.ModelSerializer):
+class GastoComunSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = GastoComun
         fields = '__all__'
@@ -135,3 +201,106 @@ class GastoComunSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         validated_data['creado_por'] = self.context['request'].user
         return super().create(validated_data)
+
+
+class GenerarCobrosSerializer(serializers.Serializer):
+    complejo = serializers.PrimaryKeyRelatedField(queryset=ComplejoHabitacional.objects.all())
+    mes = serializers.IntegerField(min_value=1, max_value=12)
+    anio = serializers.IntegerField(min_value=2000)
+    fecha_vencimiento = serializers.DateField(required=False)
+
+
+class IntervaloSerializer(serializers.Serializer):
+    fecha_inicio = serializers.DateTimeField()
+    fecha_fin = serializers.DateTimeField()
+
+    def validate(self, data):
+        if data['fecha_fin'] <= data['fecha_inicio']:
+            raise serializers.ValidationError('fecha_fin debe ser posterior a fecha_inicio')
+        return data
+
+class CandidatoReservaSerializer(IntervaloSerializer):
+    # Se valida en bloque en la vista para no consultar cada espacio por separado
+    espacio = serializers.IntegerField()
+
+
+class VerificarDisponibilidadSerializer(serializers.Serializer):
+    candidatos = CandidatoReservaSerializer(many=True)
+
+
+class ResumenGastoComunSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ResumenGastoComun
+        fields = ['anio', 'mes', 'tipo', 'estado', 'total', 'cantidad']
+
+class ResumenGastosFiltroSerializer(serializers.Serializer):
+    complejo = serializers.PrimaryKeyRelatedField(queryset=ComplejoHabitacional.objects.all())
+    anio_desde = serializers.IntegerField(required=False)
+    anio_hasta = serializers.IntegerField(required=False)
+
+
+class ImportarWhiteListSerializer(serializers.Serializer):
+    archivo = serializers.FileField()
+    formato = serializers.ChoiceField(choices=['csv', 'jsonl'], required=False)
+    complejo = serializers.PrimaryKeyRelatedField(queryset=ComplejoHabitacional.objects.all(), required=False)
+
+    def validate(self, data):
+        if 'formato' not in data:
+            nombre = data['archivo'].name.lower()
+            data['formato'] = 'jsonl' if nombre.endswith(('.jsonl', '.ndjson')) else 'csv'
+        return data
+
+
+class ImportarResidentesSerializer(serializers.Serializer):
+    archivo = serializers.FileField()
+    formato = serializers.ChoiceField(choices=['csv', 'jsonl'], required=False)
+    complejo = serializers.PrimaryKeyRelatedField(queryset=ComplejoHabitacional.objects.all())
+
+    def validate(self, data):
+        if 'formato' not in data:
+            nombre = data['archivo'].name.lower()
+            data['formato'] = 'jsonl' if nombre.endswith(('.jsonl', '.ndjson')) else 'csv'
+        return data
+
+
+class LiquidacionSerializer(serializers.Serializer):
+    # Ids u objetos {"id", "fecha_pago"}; cada ítem se valida por separado al liquidar
+    detalles = serializers.ListField(child=serializers.JSONField(), required=False, max_length=50000)
+    archivo = serializers.FileField(required=False)
+    formato = serializers.ChoiceField(choices=['csv', 'jsonl'], required=False)
+    # Para los ítems que no traen su propia fecha; por defecto, hoy
+    fecha_pago = serializers.DateField(required=False)
+
+    def validate(self, data):
+        if ('detalles' in data) == ('archivo' in data):
+            raise serializers.ValidationError('Envía una lista de detalles o un archivo de conciliación, no ambos')
+        if 'archivo' in data and 'formato' not in data:
+            nombre = data['archivo'].name.lower()
+            data['formato'] = 'jsonl' if nombre.endswith(('.jsonl', '.ndjson')) else 'csv'
+        return data
+
+
+class ExportacionFiltroSerializer(serializers.Serializer):
+    formato = serializers.ChoiceField(choices=['csv', 'xlsx'], default='csv')
+    complejo = serializers.PrimaryKeyRelatedField(queryset=ComplejoHabitacional.objects.all(), required=False)
+    desde = serializers.DateField(required=False)
+    hasta = serializers.DateField(required=False)
+    estado = serializers.CharField(required=False)
+    # Genera el archivo en un trabajo en segundo plano en vez de transmitirlo en la respuesta
+    asincrono = serializers.BooleanField(default=False)
+
+
+class MorosidadFiltroSerializer(serializers.Serializer):
+    complejo = serializers.PrimaryKeyRelatedField(queryset=ComplejoHabitacional.objects.all())
+    fecha_corte = serializers.DateField(required=False)
+
+
+class TrabajoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Trabajo
+        fields = [
+            'id', 'tipo', 'parametros', 'estado', 'creado_por', 'intentos', 'max_intentos',
+            'progreso_actual', 'progreso_total', 'resultado', 'error', 'fecha_creacion',
+            'disponible_desde', 'fecha_inicio', 'fecha_fin', 'espera_segundos', 'duracion_segundos',
+        ]
+        read_only_fields = fields
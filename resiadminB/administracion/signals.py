@@ -0,0 +1,210 @@
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .authentication import invalidar_principal
+from .bandeja import difusor, publicar_notificacion
+from .basedatos import configurar_conexion
+from .instrumentacion import instrumentar_conexion
+from .models import (
+    ComplejoHabitacional, GastoComun, Notificacion, Pago, PagoDetalle, Reserva, ReservaDetalle, Rol,
+    UnidadHabitacional, Usuario
+)
+from .morosidad import invalidar_morosidad
+from .respuestas import invalidar_respuestas
+from .resumenes import clave_resumen, recalcular_resumen
+
+connection_created.connect(configurar_conexion, dispatch_uid='administracion_configurar_conexion')
+connection_created.connect(instrumentar_conexion, dispatch_uid='administracion_instrumentar_conexion')
+
+
+@receiver([post_save, post_delete], sender=Usuario)
+def invalidar_principal_usuario(sender, instance, **kwargs):
+    invalidar_principal(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Usuario)
+def invalidar_respuestas_usuario(sender, instance, **kwargs):
+    # Cambiar de unidad, complejo o rol cambia qué notificaciones ve el usuario
+    for recurso in ('pagos', 'reservas', 'notificaciones'):
+        invalidar_respuestas(recurso, [f'usuario:{instance.pk}'])
+
+
+@receiver([post_save, post_delete], sender=Rol)
+@receiver([post_save, post_delete], sender=UnidadHabitacional)
+@receiver([post_save, post_delete], sender=ComplejoHabitacional)
+def invalidar_principales_relacion(sender, instance, **kwargs):
+    # El principal cacheado incluye el rol, la unidad y los complejos: un cambio afecta a todos los que los usan
+    invalidar_principal()
+
+
+@receiver(pre_save, sender=GastoComun)
+def recordar_clave_resumen(sender, instance, **kwargs):
+    # Si cambia el periodo, tipo o estado, también hay que corregir la fila anterior del resumen
+    instance._clave_resumen_anterior = None
+    if instance.pk:
+        anterior = GastoComun.objects.filter(pk=instance.pk).values_list(
+            'complejo_id', 'anio', 'mes', 'tipo', 'estado'
+        ).first()
+        instance._clave_resumen_anterior = anterior
+
+
+@receiver(post_save, sender=GastoComun)
+def actualizar_resumen_gasto(sender, instance, **kwargs):
+    claves = {clave_resumen(instance)}
+    if getattr(instance, '_clave_resumen_anterior', None):
+        claves.add(instance._clave_resumen_anterior)
+    for clave in claves:
+        recalcular_resumen(*clave)
+
+
+@receiver(post_delete, sender=GastoComun)
+def descontar_resumen_gasto(sender, instance, **kwargs):
+    recalcular_resumen(*clave_resumen(instance))
+
+
+# Columnas de las que depende el reporte de morosidad
+CAMPOS_MOROSIDAD = {
+    Pago: ('usuario_id', 'estado'),
+    PagoDetalle: ('pago_id', 'monto', 'multa', 'fecha_pago', 'fecha_vencimiento'),
+}
+
+
+def _valores_morosidad(instance):
+    # Desde __dict__ para no cargar campos diferidos
+    return tuple(instance.__dict__.get(campo) for campo in CAMPOS_MOROSIDAD[type(instance)])
+
+
+@receiver(post_init, sender=Pago)
+@receiver(post_init, sender=PagoDetalle)
+def recordar_valores_morosidad(sender, instance, **kwargs):
+    # Valores leídos de la base (post_init corre antes de que from_db marque la instancia, así que se
+    # reconoce por tener clave primaria): al guardar se compara con ellos para saber si cambió algo relevante
+    instance._valores_morosidad = None if instance.pk is None else _valores_morosidad(instance)
+
+
+def _cambio_morosidad(instance, signal, created=False, **kwargs):
+    if signal is post_delete or created:
+        return True
+    anteriores = instance._valores_morosidad
+    instance._valores_morosidad = _valores_morosidad(instance)
+    return anteriores is None or anteriores != instance._valores_morosidad
+
+
+@receiver([post_save, post_delete], sender=Pago)
+def invalidar_morosidad_pago(sender, instance, **kwargs):
+    if not _cambio_morosidad(instance, **kwargs):
+        return
+    complejo_id = Usuario.objects.filter(pk=instance.usuario_id).values_list(
+        'unidad_habitacional__complejo_id', flat=True
+    ).first()
+    if complejo_id:
+        invalidar_morosidad(complejo_id)
+
+
+@receiver([pre_save, pre_delete], sender=PagoDetalle)
+def olvidar_pago_detalle(sender, instance, **kwargs):
+    instance._pago_resuelto = None
+
+
+def _pago_de_detalle(instance):
+    """
+    (usuario_id, complejo_id) del pago del detalle, o (None, None) si el pago ya no existe.
+    Se consulta una vez por guardado o borrado y lo comparten los receptores de PagoDetalle.
+    """
+    if getattr(instance, '_pago_resuelto', None) is None:
+        fila = Pago.objects.filter(pk=instance.pago_id).values_list(
+            'usuario_id', 'usuario__unidad_habitacional__complejo_id'
+        ).first()
+        instance._pago_resuelto = fila or (None, None)
+    return instance._pago_resuelto
+
+
+@receiver([post_save, post_delete], sender=PagoDetalle)
+def invalidar_morosidad_detalle(sender, instance, **kwargs):
+    if not _cambio_morosidad(instance, **kwargs):
+        return
+    _, complejo_id = _pago_de_detalle(instance)
+    if complejo_id:
+        invalidar_morosidad(complejo_id)
+
+
+@receiver([post_save, post_delete], sender=Pago)
+def invalidar_respuestas_pago(sender, instance, **kwargs):
+    invalidar_respuestas('pagos', [f'usuario:{instance.usuario_id}'])
+
+
+@receiver([post_save, post_delete], sender=PagoDetalle)
+def invalidar_respuestas_detalle(sender, instance, **kwargs):
+    usuario_id, _ = _pago_de_detalle(instance)
+    # Si el pago ya no existe (borrado en cascada), su propia señal invalidó las respuestas
+    if usuario_id:
+        invalidar_respuestas('pagos', [f'usuario:{usuario_id}'])
+
+
+@receiver([post_save, post_delete], sender=Reserva)
+def invalidar_respuestas_reserva(sender, instance, **kwargs):
+    invalidar_respuestas('reservas', [f'usuario:{instance.usuario_id}'])
+
+
+@receiver([post_save, post_delete], sender=ReservaDetalle)
+def invalidar_respuestas_reserva_detalle(sender, instance, **kwargs):
+    usuario_id = Reserva.objects.filter(pk=instance.reserva_id).values_list('usuario_id', flat=True).first()
+    if usuario_id:
+        invalidar_respuestas('reservas', [f'usuario:{usuario_id}'])
+
+
+@receiver(pre_save, sender=Notificacion)
+def recordar_complejo_notificacion(sender, instance, **kwargs):
+    # Si la notificación cambia de complejo, el listado del complejo anterior también queda desactualizado
+    instance._complejo_anterior = None
+    if instance.pk:
+        instance._complejo_anterior = Notificacion.objects.filter(pk=instance.pk).values_list(
+            'complejo_id', flat=True
+        ).first()
+
+
+@receiver([post_save, post_delete], sender=Notificacion)
+def invalidar_respuestas_notificacion(sender, instance, **kwargs):
+    complejos = {instance.complejo_id, getattr(instance, '_complejo_anterior', None)} - {None}
+    invalidar_respuestas('notificaciones', [f'complejo:{complejo_id}' for complejo_id in sorted(complejos)])
+
+
+@receiver(m2m_changed, sender=Notificacion.destinatarios.through)
+def invalidar_respuestas_destinatarios(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    # Los listados de los administradores de un complejo incluyen los destinatarios: se invalida también
+    # el complejo de cada notificación afectada
+    if reverse and pk_set:
+        # instance es el usuario y pk_set las notificaciones
+        complejos = Notificacion.objects.filter(pk__in=pk_set).values_list('complejo_id', flat=True).distinct()
+        invalidar_respuestas(
+            'notificaciones', [f'usuario:{instance.pk}', *(f'complejo:{complejo_id}' for complejo_id in complejos)]
+        )
+    elif reverse:
+        # post_clear desde el usuario no informa las notificaciones: se invalida el recurso completo
+        invalidar_respuestas('notificaciones')
+    elif pk_set:
+        invalidar_respuestas(
+            'notificaciones',
+            [f'complejo:{instance.complejo_id}', *(f'usuario:{usuario_id}' for usuario_id in pk_set)]
+        )
+    else:
+        # post_clear no informa los usuarios: se invalida el complejo completo
+        invalidar_respuestas('notificaciones', [f'complejo:{instance.complejo_id}'])
+
+
+@receiver(post_save, sender=Notificacion)
+def publicar_notificacion_creada(sender, instance, created, **kwargs):
+    # Al confirmar, para que la bandeja encuentre la fila y sus destinatarios
+    if created:
+        transaction.on_commit(lambda: publicar_notificacion(instance.pk, instance.complejo_id))
+
+
+@receiver(m2m_changed, sender=Notificacion.destinatarios.through)
+def publicar_destinatarios_agregados(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'post_add' and pk_set:
+        usuarios = [instance.pk] if reverse else list(pk_set)
+        transaction.on_commit(lambda: difusor.publicar(usuario_ids=usuarios))
@@ -1,3 +1,1820 @@
-from django.test import TestCase
+import asyncio
+import csv
+import importlib
+import io
+import json
+import random
+import sqlite3
+import tempfile
+import zipfile
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, OperationalError, connection, connections, reset_queries, router, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from asgiref.sync import sync_to_async
+from rest_framework.renderers import JSONRenderer
+from rest_framework.serializers import ListSerializer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .authentication import invalidar_principal, obtener_principal
+from .bandeja import Difusor, difusor
+from .basedatos import PRAGMAS_PRODUCCION, aplicar_pragmas, es_bloqueo, reintentar
+from .disponibilidad import intervalos_libres, verificar_candidatos
+from .facturacion import generar_cobros_mensuales
+from .middleware import COOKIE_PRIMARIO, LecturaReplicaMiddleware
+from .instrumentacion import Registro, registro
+from .campos import arbol_de_campos
+from .lecturas import LecturaRapida
+from .importaciones import importar_residentes, importar_whitelist, leer_emails_jsonl, leer_residentes_csv
+from .morosidad import calcular_morosidad, reporte_morosidad
+from .multas import recalcular_multas
+from .resumenes import reconstruir_resumenes
+from .trabajos import TAREAS, encolar, procesar_pendientes, recuperar_vencidos, reportar_progreso
+from .serializers import NotificacionSerializer, PagoSerializer, ReservaSerializer
+from .validators import normalizar_rut, validar_rut, validar_ruts
+from .models import (
+    WhiteList, Rol, ComplejoHabitacional, UnidadHabitacional, Usuario, Pago, PagoDetalle, ConfiguracionMulta,
+    GastoComun, ResumenGastoComun, EspacioComun, Reserva, ReservaDetalle, Notificacion, Trabajo
+)
+
+
+def generar_rut(numero):
+    """
+    Devuelve un RUT válido (sin puntos) para el número dado.
+    """
+    suma, multiplicador = 0, 2
+    for digito in reversed(str(numero)):
+        suma += int(digito) * multiplicador
+        multiplicador = 2 if multiplicador == 7 else multiplicador + 1
+    resto = 11 - (suma % 11)
+    dv = {11: '0', 10: 'K'}.get(resto, str(resto))
+    return f"{numero}-{dv}"
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ApiTestCase(TestCase):
+    """
+    Crea un complejo con roles, unidades y un residente autenticado para las pruebas de la API.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.rol_residente = Rol.objects.create(nombre='RESIDENTE')
+        cls.rol_admin = Rol.objects.create(nombre='ADMIN')
+        cls.complejo = ComplejoHabitacional.objects.create(nombre='Complejo Test', direccion='Calle 123')
+        cls.unidad = UnidadHabitacional.objects.create(
+            numero='101', tipo='Departamento', complejo=cls.complejo, metros_cuadrados=Decimal('50.00')
+        )
+        cls.residente = cls.crear_usuario('residente@test.cl', unidad=cls.unidad)
+        cls.espacio = EspacioComun.objects.create(nombre='Quincho', capacidad=20, complejo=cls.complejo)
+
+    @classmethod
+    def crear_usuario(cls, email, unidad=None, rol=None):
+        return Usuario.objects.create_user(
+            email=email, password='clave-segura-123', first_name='Nombre', last_name='Apellido',
+            rut=generar_rut(10000000 + Usuario.objects.count()), rol=rol or cls.rol_residente,
+            unidad_habitacional=unidad
+        )
+
+    def setUp(self):
+        # Las respuestas cacheadas de una prueba no deben servirse en otra
+        cache.clear()
+        # Los archivos de los trabajos van a un directorio temporal por prueba
+        self.enterContext(override_settings(MEDIA_ROOT=self.enterContext(tempfile.TemporaryDirectory())))
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.residente)
+
+
+class EagerLoadingTests(ApiTestCase):
+    """
+    La cantidad de consultas de cada listado no debe crecer con el número de filas.
+    """
+
+    def contar_consultas(self, url):
+        with CaptureQueriesContext(connection) as contexto:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(contexto.captured_queries)
+
+    def crear_pago(self):
+        Pago.objects.create(usuario=self.residente, fecha_vencimiento=date(2025, 1, 10))
+
+    def crear_reserva(self):
+        reserva = Reserva.objects.create(usuario=self.residente)
+        inicio = timezone.make_aware(datetime(2025, 1, 10, 12))
+        for _ in range(2):
+            ReservaDetalle.objects.create(
+                reserva=reserva, espacio=self.espacio, fecha_inicio=inicio,
+                fecha_fin=inicio + timedelta(hours=2), cantidad_personas=5
+            )
+
+    def crear_notificacion(self):
+        notificacion = Notificacion.objects.create(
+            titulo='Aviso', mensaje='Corte de agua', fecha_publicacion=timezone.now(),
+            creador=self.residente, complejo=self.complejo
+        )
+        vecinos = [
+            self.crear_usuario(f'vecino{Usuario.objects.count()}@test.cl', unidad=self.unidad)
+            for _ in range(2)
+        ]
+        notificacion.destinatarios.add(self.residente, *vecinos)
+
+    def assertConsultasConstantes(self, url, crear):
+        crear()
+        consultas_iniciales = self.contar_consultas(url)
+        for _ in range(3):
+            crear()
+        self.assertEqual(self.contar_consultas(url), consultas_iniciales)
+
+    def test_listado_pagos(self):
+        self.assertConsultasConstantes('/api/pagos/', self.crear_pago)
+
+    def test_listado_reservas(self):
+        self.assertConsultasConstantes('/api/reservas/', self.crear_reserva)
+
+    def test_listado_notificaciones(self):
+        self.assertConsultasConstantes('/api/notificaciones/', self.crear_notificacion)
+
+    def test_listado_usuarios(self):
+        def crear_usuario():
+            self.crear_usuario(f'usuario{Usuario.objects.count()}@test.cl', unidad=self.unidad)
+
+        self.assertConsultasConstantes('/api/usuarios/', crear_usuario)
+
+
+class LecturaRapidaTests(ApiTestCase):
+    """
+    Los listados armados desde values() deben ser idénticos byte a byte a los del serializador.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # Las vistas muestran todas las filas a SUPERADMIN. Sin unidad: el anidado sale como null
+        rol = Rol.objects.create(nombre='SUPERADMIN', descripcion='Administra "todos" los complejos')
+        cls.administrador = cls.crear_usuario('admin@test.cl', rol=rol)
+        inicio = datetime(2025, 1, 10, 12, 30, 15, 123456, tzinfo=timezone.get_current_timezone())
+        for monto in (Decimal('0.00'), Decimal('12345.5'), Decimal('99999999.99')):
+            Pago.objects.create(usuario=cls.residente, fecha_vencimiento=date(2025, 1, 10), monto_total=monto)
+        Pago.objects.create(usuario=cls.administrador, fecha_vencimiento=date(2025, 2, 28), estado='PAGADO')
+        for observaciones in ('', 'Cumpleaños con ñandú'):
+            reserva = Reserva.objects.create(usuario=cls.residente, observaciones=observaciones)
+            for horas in (0, 3):
+                ReservaDetalle.objects.create(
+                    reserva=reserva, espacio=cls.espacio, fecha_inicio=inicio + timedelta(hours=horas),
+                    fecha_fin=inicio + timedelta(hours=horas + 2), cantidad_personas=5
+                )
+        Reserva.objects.create(usuario=cls.administrador)
+        notificacion = Notificacion.objects.create(
+            titulo='Aviso', mensaje='Corte de agua', fecha_publicacion=inicio, creador=cls.administrador,
+            complejo=cls.complejo
+        )
+        notificacion.destinatarios.add(cls.residente, cls.administrador)
+        Notificacion.objects.create(
+            titulo='Difusión', mensaje='-', fecha_publicacion=inicio, creador=cls.residente,
+            complejo=cls.complejo, audiencia='ROL', rol_destino=cls.rol_residente
+        )
+
+    def assertMismoJson(self, serializer, queryset):
+        lectura = LecturaRapida(serializer)
+        filas = list(queryset.prefetch_related(None).values(*lectura.columnas))
+        serializer.instance = queryset
+        esperado = JSONRenderer().render(ListSerializer(child=serializer, instance=queryset).data)
+        self.assertEqual(JSONRenderer().render(lectura.representar(filas)), esperado)
+
+    def test_paridad_con_los_serializadores(self):
+        from .views import NotificacionViewSet, PagoViewSet, ReservaViewSet
+
+        for vista, serializer_class in (
+            (PagoViewSet, PagoSerializer), (ReservaViewSet, ReservaSerializer),
+            (NotificacionViewSet, NotificacionSerializer),
+        ):
+            # Todo anidado (como fuera de los viewsets), relaciones como IDs y todo expandido en profundidad
+            for opciones in ({}, {'expandir': {}}, {'expandir': arbol_de_campos(
+                'usuario.rol,usuario.unidad_habitacional,creador.rol,destinatarios.unidad_habitacional,detalles.espacio'
+            )}):
+                with self.subTest(serializer_class.__name__, **opciones):
+                    self.assertMismoJson(serializer_class(**opciones), vista.queryset.order_by('id'))
+
+    def test_listados_identicos_a_los_del_serializador(self):
+        from .views import NotificacionViewSet, PagoViewSet, ReservaViewSet
+
+        self.client.force_authenticate(user=self.administrador)
+        for vista, url in (
+            (PagoViewSet, '/api/pagos/?page_size=3'), (ReservaViewSet, '/api/reservas/'),
+            (NotificacionViewSet, '/api/notificaciones/'),
+            (PagoViewSet, '/api/pagos/?fields=id,monto_total,usuario.email&expand=usuario'),
+            (ReservaViewSet, '/api/reservas/?expand=detalles,usuario.rol'),
+            (NotificacionViewSet, '/api/notificaciones/?fields=id,destinatarios'),
+        ):
+            with self.subTest(url):
+                rapida = self.client.get(url)
+                cache.clear()
+                with mock.patch.object(vista, 'lectura_rapida', False):
+                    original = self.client.get(url)
+                self.assertEqual(rapida.status_code, 200)
+                self.assertEqual(rapida.content, original.content)
+                cache.clear()
+                siguiente = json.loads(rapida.content)['next']
+                if siguiente:
+                    self.assertEqual(len(self.client.get(siguiente).json()['results']), 1)
+
+
+class CamposSolicitadosTests(ApiTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.pago = Pago.objects.create(
+            usuario=cls.residente, fecha_vencimiento=date(2025, 1, 10), monto_total=Decimal('1500.00')
+        )
+        cls.notificacion = Notificacion.objects.create(
+            titulo='Aviso', mensaje='-', fecha_publicacion=timezone.now(), creador=cls.residente,
+            complejo=cls.complejo
+        )
+        cls.notificacion.destinatarios.add(cls.residente)
+
+    def test_relaciones_como_ids_por_defecto(self):
+        pago = self.client.get(f'/api/pagos/{self.pago.id}/').json()
+        self.assertEqual(pago['usuario'], self.residente.id)
+        notificacion = self.client.get('/api/notificaciones/').json()['results'][0]
+        self.assertEqual(notificacion['creador'], self.residente.id)
+        self.assertEqual(notificacion['destinatarios'], [self.residente.id])
+
+    def test_fields_y_expand(self):
+        pago = self.client.get(f'/api/pagos/{self.pago.id}/?fields=monto_total,usuario.email,usuario.rol').json()
+        self.assertEqual(pago, {'monto_total': '1500.00', 'usuario': {'email': 'residente@test.cl', 'rol': self.rol_residente.id}})
+        pago = self.client.get(f'/api/pagos/{self.pago.id}/?fields=id,usuario&expand=usuario.rol').json()
+        self.assertEqual(pago['usuario']['rol'], {'id': self.rol_residente.id, 'nombre': 'RESIDENTE', 'descripcion': ''})
+        self.assertEqual(pago['usuario']['unidad_habitacional'], self.unidad.id)
+        self.assertEqual(set(pago), {'id', 'usuario'})
+        listado = self.client.get('/api/pagos/?fields=id,no_existe').json()
+        self.assertEqual(listado['results'], [{'id': self.pago.id}])
+
+    def test_consulta_se_reduce_a_los_campos(self):
+        def consulta_del_listado(url):
+            reset_queries()
+            with CaptureQueriesContext(connection) as contexto:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            return contexto.captured_queries[-1]['sql']
+
+        completa = consulta_del_listado('/api/pagos/?expand=usuario.rol,usuario.unidad_habitacional')
+        self.assertIn('administracion_rol', completa)
+        reducida = consulta_del_listado('/api/pagos/?fields=id,monto_total')
+        self.assertNotIn('JOIN', reducida)
+        self.assertNotIn('estado', reducida)
+        self.assertIn('monto_total', reducida)
+
+        self.assertIn('"email"', consulta_del_listado(f'/api/usuarios/{self.residente.id}/?fields=id,email'))
+        self.assertNotIn('"telefono"', consulta_del_listado(f'/api/usuarios/{self.residente.id}/?fields=id,email'))
+
+    def test_escrituras_no_cambian(self):
+        response = self.client.patch(
+            f'/api/pagos/{self.pago.id}/?fields=id,estado', {'estado': 'PAGADO'}, format='json'
+        )
+        self.assertEqual(response.json(), {'id': self.pago.id, 'estado': 'PAGADO'})
+        self.pago.refresh_from_db()
+        self.assertEqual((self.pago.estado, self.pago.monto_total), ('PAGADO', Decimal('1500.00')))
+
+    def test_escrituras_con_campos_que_no_incluyen_lo_escrito(self):
+        response = self.client.patch(f'/api/pagos/{self.pago.id}/?fields=id', {'estado': 'PAGADO'}, format='json')
+        self.assertEqual(response.json(), {'id': self.pago.id})
+        self.pago.refresh_from_db()
+        self.assertEqual(self.pago.estado, 'PAGADO')
+
+        self.client.force_authenticate(user=self.crear_usuario('admin@test.cl', rol=self.rol_admin))
+        response = self.client.post('/api/gastos-comunes/?fields=id', {
+            'complejo': self.complejo.id, 'tipo': 'MANTENIMIENTO', 'descripcion': 'Ascensor',
+            'monto': '1000.00', 'fecha': '2025-03-05', 'mes': 3, 'anio': 2025,
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(list(response.json()), ['id'])
+        self.assertEqual(GastoComun.objects.get(pk=response.json()['id']).monto, Decimal('1000.00'))
+
+
+class FacturacionMensualTests(ApiTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.unidad_grande = UnidadHabitacional.objects.create(
+            numero='102', tipo='Departamento', complejo=cls.complejo, metros_cuadrados=Decimal('100.00')
+        )
+        cls.crear_usuario('grande@test.cl', unidad=cls.unidad_grande)
+        UnidadHabitacional.objects.create(
+            numero='103', tipo='Bodega', complejo=cls.complejo, metros_cuadrados=Decimal('10.00'), activo=False
+        )
+        for monto, estado in [('1000.00', 'APROBADO'), ('333.33', 'APROBADO'), ('999.00', 'PENDIENTE')]:
+            GastoComun.objects.create(
+                complejo=cls.complejo, tipo='LIMPIEZA', descripcion='Aseo', monto=Decimal(monto),
+                fecha=date(2025, 3, 1), mes=3, anio=2025, creado_por=cls.residente, estado=estado
+            )
+
+    def test_prorratea_por_metros_y_es_idempotente(self):
+        resultado = generar_cobros_mensuales(self.complejo, 3, 2025, tamano_lote=1)
+        self.assertEqual((resultado['pagos_creados'], resultado['detalles_creados']), (2, 4))
+
+        pago_pequeno = Pago.objects.get(usuario__unidad_habitacional=self.unidad)
+        self.assertEqual(pago_pequeno.monto_total, Decimal('444.44'))
+        self.assertEqual(
+            sum(Pago.objects.filter(periodo_mes=3, periodo_anio=2025).values_list('monto_total', flat=True)),
+            Decimal('1333.33')
+        )
+
+        repetido = generar_cobros_mensuales(self.complejo, 3, 2025)
+        self.assertEqual((repetido['pagos_creados'], repetido['detalles_creados']), (0, 0))
+        self.assertEqual(PagoDetalle.objects.count(), 4)
+
+    def test_unidades_nuevas_reprorratean_el_periodo(self):
+        generar_cobros_mensuales(self.complejo, 3, 2025)
+        nueva = UnidadHabitacional.objects.create(
+            numero='104', tipo='Departamento', complejo=self.complejo, metros_cuadrados=Decimal('50.00')
+        )
+        self.crear_usuario('nuevo@test.cl', unidad=nueva)
+
+        resultado = generar_cobros_mensuales(self.complejo, 3, 2025)
+        self.assertEqual(resultado['pagos_creados'], 1)
+        self.assertEqual(resultado['detalles_reprorrateados'], 4)
+        for gasto in GastoComun.objects.filter(estado='APROBADO'):
+            self.assertEqual(sum(gasto.cobros.values_list('monto', flat=True)), gasto.monto)
+        self.assertEqual(
+            sum(Pago.objects.filter(periodo_mes=3, periodo_anio=2025).values_list('monto_total', flat=True)),
+            Decimal('1333.33')
+        )
+        self.assertEqual(Pago.objects.get(usuario__unidad_habitacional=self.unidad).monto_total, Decimal('333.33'))
+
+    def test_no_reprorratea_cobros_pagados(self):
+        generar_cobros_mensuales(self.complejo, 3, 2025)
+        PagoDetalle.objects.filter(pago__usuario__unidad_habitacional=self.unidad).update(fecha_pago=date(2025, 4, 1))
+        montos = list(PagoDetalle.objects.order_by('id').values_list('monto', flat=True))
+        nueva = UnidadHabitacional.objects.create(
+            numero='104', tipo='Departamento', complejo=self.complejo, metros_cuadrados=Decimal('50.00')
+        )
+        self.crear_usuario('nuevo@test.cl', unidad=nueva)
+
+        with self.assertRaisesMessage(ValueError, 'cobros pagados'):
+            generar_cobros_mensuales(self.complejo, 3, 2025)
+        self.assertEqual(list(PagoDetalle.objects.order_by('id').values_list('monto', flat=True)), montos)
+        self.assertFalse(Pago.objects.filter(usuario__unidad_habitacional=nueva).exists())
+
+    def test_periodo_sin_gastos_aprobados_no_crea_pagos(self):
+        resultado = generar_cobros_mensuales(self.complejo, 4, 2025)
+        self.assertEqual((resultado['gastos_aprobados'], resultado['pagos_creados']), (0, 0))
+        self.assertFalse(Pago.objects.exists())
+
+    def test_unidades_sin_metros_cuadrados(self):
+        UnidadHabitacional.objects.filter(complejo=self.complejo).update(metros_cuadrados=0)
+        with self.assertRaisesMessage(ValueError, 'no tienen metros cuadrados'):
+            generar_cobros_mensuales(self.complejo, 3, 2025)
+        self.assertFalse(Pago.objects.exists())
+
+    def test_endpoint_requiere_administrador(self):
+        datos = {'complejo': self.complejo.id, 'mes': 3, 'anio': 2025}
+        response = self.client.post('/api/pagos/generar-cobros/', datos, format='json')
+        self.assertEqual(response.status_code, 403)
+
+        admin = self.crear_usuario('admin@test.cl', rol=self.rol_admin)
+        admin.complejo_administrado = self.complejo
+        admin.save()
+        self.client.force_authenticate(user=admin)
+        response = self.client.post('/api/pagos/generar-cobros/', datos, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertTrue(response['Location'].endswith(f"/api/trabajos/{response.data['id']}/"))
+        self.assertEqual(Pago.objects.count(), 0)
+
+        procesar_pendientes()
+        trabajo = Trabajo.objects.get(id=response.data['id'])
+        self.assertEqual(trabajo.estado, 'COMPLETADO')
+        self.assertEqual(trabajo.resultado['pagos_creados'], 2)
+        self.assertEqual((trabajo.progreso_actual, trabajo.progreso_total), (2, 2))
+
+
+class RecalculoMultasTests(ApiTestCase):
+    """
+    recalcular_multas debe dejar exactamente los mismos valores que PagoDetalle.save().
+    """
+
+    def crear_escenario(self, azar):
+        otro_complejo = ComplejoHabitacional.objects.create(nombre='Otro', direccion='Calle 456')
+        sin_configuracion = ComplejoHabitacional.objects.create(nombre='Sin config', direccion='Calle 789')
+        for complejo in (self.complejo, otro_complejo):
+            for activo in (False, True, True):
+                ConfiguracionMulta.objects.create(
+                    complejo=complejo, activo=activo, dias_tolerancia=azar.randint(0, 5),
+                    porcentaje_multa_diaria=Decimal(azar.randint(0, 300)) / 100,
+                    monto_minimo_multa=Decimal(azar.randint(0, 5000)) / 100,
+                    monto_maximo_multa=Decimal(azar.randint(5000, 90000)) / 100,
+                )
+
+        pagos = []
+        for complejo in (self.complejo, otro_complejo, sin_configuracion):
+            unidad = UnidadHabitacional.objects.create(
+                numero=str(complejo.id), tipo='Casa', complejo=complejo, metros_cuadrados=Decimal('80.00')
+            )
+            usuario = self.crear_usuario(f'multas{complejo.id}@test.cl', unidad=unidad)
+            pagos.append(Pago.objects.create(usuario=usuario, fecha_vencimiento=date(2025, 1, 10)))
+
+        detalles = []
+        for _ in range(300):
+            vencimiento = date(2025, 1, 1) + timedelta(days=azar.randint(0, 60))
+            fecha_pago = vencimiento + timedelta(days=azar.randint(-10, 90)) if azar.random() < 0.9 else None
+            detalles.append(PagoDetalle(
+                pago=azar.choice(pagos), concepto='Gasto común', fecha_vencimiento=vencimiento,
+                monto=Decimal(azar.randint(100, 20000000)) / 100, fecha_pago=fecha_pago,
+                multa=Decimal(azar.randint(0, 1000)) / 100, dias_atraso=azar.randint(0, 30)
+            ))
+        PagoDetalle.objects.bulk_create(detalles)
+
+    def estado_detalles(self):
+        return list(PagoDetalle.objects.order_by('id').values_list('id', 'multa', 'dias_atraso'))
+
+    def test_equivale_a_calcular_multa(self):
+        for semilla in range(5):
+            with self.subTest(semilla=semilla):
+                sid = transaction.savepoint()
+                self.crear_escenario(random.Random(semilla))
+                inicial = self.estado_detalles()
+
+                for detalle in PagoDetalle.objects.all():
+                    detalle.save()
+                esperado = self.estado_detalles()
+
+                PagoDetalle.objects.bulk_update(
+                    [PagoDetalle(id=i, multa=multa, dias_atraso=dias) for i, multa, dias in inicial],
+                    ['multa', 'dias_atraso']
+                )
+                resultado = recalcular_multas(tamano_lote=50)
+                self.assertEqual(self.estado_detalles(), esperado)
+                self.assertEqual(resultado['revisados'], PagoDetalle.objects.filter(fecha_pago__isnull=False).count())
+                self.assertEqual(recalcular_multas()['actualizados'], 0)
+                transaction.savepoint_rollback(sid)
+
+
+def hora(h):
+    return timezone.make_aware(datetime(2025, 2, 1, h))
+
+
+class DisponibilidadTests(ApiTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for inicio, fin, estado in [(10, 12, 'CONFIRMADA'), (11, 13, 'PENDIENTE'), (15, 16, 'CANCELADA'), (17, 18, 'PENDIENTE')]:
+            reserva = Reserva.objects.create(usuario=cls.residente, estado=estado)
+            ReservaDetalle.objects.create(
+                reserva=reserva, espacio=cls.espacio, fecha_inicio=hora(inicio),
+                fecha_fin=hora(fin), cantidad_personas=4
+            )
+
+    def test_intervalos_libres_ignoran_canceladas(self):
+        libres = intervalos_libres(self.espacio, hora(8), hora(20))
+        self.assertEqual(libres, [
+            (hora(8), hora(10)), (hora(13), hora(17)), (hora(18), hora(20)),
+        ])
+
+    def test_verificacion_en_lote_usa_una_consulta(self):
+        candidatos = [
+            (self.espacio.id, hora(9), hora(10)),
+            (self.espacio.id, hora(12), hora(14)),
+            (self.espacio.id, hora(15), hora(16)),
+            (self.espacio.id, hora(16), hora(18)),
+        ]
+        with self.assertNumQueries(1):
+            disponibles = verificar_candidatos(candidatos)
+        self.assertEqual(disponibles, [True, False, True, False])
+
+    def test_endpoint_conflictos(self):
+        response = self.client.get(
+            f'/api/espacios-comunes/{self.espacio.id}/conflictos/',
+            {'fecha_inicio': hora(15).isoformat(), 'fecha_fin': hora(17).isoformat()}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.data['conflicto'])
+
+        response = self.client.post('/api/espacios-comunes/verificar-disponibilidad/', {'candidatos': [
+            {'espacio': self.espacio.id, 'fecha_inicio': hora(11).isoformat(), 'fecha_fin': hora(12).isoformat()},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.data[0]['disponible'])
+
+    def test_verificar_disponibilidad_valida_el_cuerpo(self):
+        url = '/api/espacios-comunes/verificar-disponibilidad/'
+        for cuerpo in ([{'espacio': self.espacio.id}], {}, {'candidatos': {'espacio': self.espacio.id}}):
+            self.assertEqual(self.client.post(url, cuerpo, format='json').status_code, 400)
+
+
+class AudienciaNotificacionesTests(ApiTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.rol_conserje = Rol.objects.create(nombre='CONSERJE')
+        otro_complejo = ComplejoHabitacional.objects.create(nombre='Vecino', direccion='Calle 456')
+        cls.unidad_externa = UnidadHabitacional.objects.create(
+            numero='201', tipo='Casa', complejo=otro_complejo, metros_cuadrados=Decimal('60.00')
+        )
+        cls.externo = cls.crear_usuario('externo@test.cl', unidad=cls.unidad_externa)
+        datos = {
+            'mensaje': 'Mensaje', 'fecha_publicacion': timezone.now(),
+            'creador': cls.residente, 'complejo': cls.complejo,
+        }
+        Notificacion.objects.create(titulo='Complejo', audiencia='COMPLEJO', **datos)
+        Notificacion.objects.create(titulo='Residentes', audiencia='ROL', rol_destino=cls.rol_residente, **datos)
+        Notificacion.objects.create(titulo='Conserjes', audiencia='ROL', rol_destino=cls.rol_conserje, **datos)
+        Notificacion.objects.create(titulo='Otros', audiencia='USUARIOS', **datos).destinatarios.add(cls.externo)
+
+    def titulos(self, usuario):
+        return set(Notificacion.objects.para_usuario(usuario).values_list('titulo', flat=True))
+
+    def test_bandeja_resuelve_difusiones(self):
+        self.assertEqual(self.titulos(self.residente), {'Complejo', 'Residentes'})
+        self.assertEqual(self.titulos(self.externo), {'Otros'})
+
+    def test_destinatarios_explicitos_en_un_insert(self):
+        def publicar(cantidad):
+            ids = [
+                self.crear_usuario(f'dest{Usuario.objects.count()}@test.cl', unidad=self.unidad).id
+                for _ in range(cantidad)
+            ]
+            with CaptureQueriesContext(connection) as contexto:
+                response = self.client.post('/api/notificaciones/', {
+                    'titulo': 'Aviso', 'mensaje': 'Mensaje', 'fecha_publicacion': timezone.now().isoformat(),
+                    'creador_id': self.residente.id, 'complejo': self.complejo.id, 'destinatarios_ids': ids,
+                }, format='json')
+            self.assertEqual(response.status_code, 201, response.data)
+            self.assertEqual(Notificacion.objects.get(id=response.data['id']).destinatarios.count(), cantidad)
+            return len(contexto.captured_queries)
+
+        self.assertEqual(publicar(2), publicar(20))
+
+    def test_difusion_por_rol_requiere_rol(self):
+        response = self.client.post('/api/notificaciones/', {
+            'titulo': 'Aviso', 'mensaje': 'Mensaje', 'fecha_publicacion': timezone.now().isoformat(),
+            'creador_id': self.residente.id, 'complejo': self.complejo.id, 'audiencia': 'ROL',
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('rol_destino', response.data)
+
+
+class PaginacionCursorTests(ApiTestCase):
+
+    def test_listado_vacio_conserva_mensaje(self):
+        response = self.client.get('/api/pagos/')
+        self.assertEqual(response.data, {"message": "No hay pagos registrados", "data": []})
+
+    def test_recorre_todas_las_paginas_sin_count(self):
+        Pago.objects.bulk_create([
+            Pago(usuario=self.residente, fecha_vencimiento=date(2025, 1, 10)) for _ in range(25)
+        ])
+        vistos = []
+        url = '/api/pagos/?page_size=10'
+        while url:
+            with CaptureQueriesContext(connection) as contexto:
+                response = self.client.get(url)
+            sql = ' '.join(query['sql'] for query in contexto.captured_queries).upper()
+            self.assertNotIn('COUNT(', sql)
+            vistos.extend(pago['id'] for pago in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(len(vistos), 25)
+        self.assertEqual(vistos, sorted(set(vistos), reverse=True))
+
+
+class PrincipalCacheadoTests(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        invalidar_principal()
+        self.client = APIClient()
+        token = RefreshToken.for_user(self.residente).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_principal_en_una_consulta(self):
+        with self.assertNumQueries(1):
+            usuario = obtener_principal(self.residente.id)
+            usuario.rol.nombre, usuario.unidad_habitacional.complejo.nombre, usuario.complejo_administrado
+        with self.assertNumQueries(0):
+            obtener_principal(self.residente.id).rol.nombre
+
+    def test_peticiones_siguientes_no_consultan_usuario(self):
+        self.client.get('/api/pagos/')
+        with CaptureQueriesContext(connection) as contexto:
+            response = self.client.get('/api/pagos/')
+        self.assertEqual(response.status_code, 200)
+        tabla_usuarios = Usuario._meta.db_table
+        self.assertFalse([q for q in contexto.captured_queries if f'FROM "{tabla_usuarios}"' in q['sql']])
+
+    def test_save_invalida_principal(self):
+        obtener_principal(self.residente.id)
+        self.residente.rol = self.rol_admin
+        self.residente.save()
+        self.assertEqual(obtener_principal(self.residente.id).rol.nombre, 'ADMIN')
+
+        self.rol_admin.descripcion = 'Actualizado'
+        self.rol_admin.save()
+        self.assertEqual(obtener_principal(self.residente.id).rol.descripcion, 'Actualizado')
+
+        self.complejo.nombre = 'Renombrado'
+        self.complejo.save()
+        self.assertEqual(obtener_principal(self.residente.id).unidad_habitacional.complejo.nombre, 'Renombrado')
+
+    def test_cada_llamada_recibe_instancias_propias(self):
+        primero = obtener_principal(self.residente.id)
+        primero.rol.nombre = 'MODIFICADO'
+        primero.unidad_habitacional.numero = '999'
+        with self.assertNumQueries(0):
+            segundo = obtener_principal(self.residente.id)
+            self.assertIsNot(segundo.rol, primero.rol)
+            self.assertEqual(segundo.rol.nombre, 'RESIDENTE')
+            self.assertEqual(segundo.unidad_habitacional.numero, '101')
+            self.assertIsNone(segundo.complejo_administrado)
+        self.assertEqual(segundo, self.residente)
+        self.assertFalse(segundo._state.adding)
+
+
+class ResumenGastosTests(ApiTestCase):
+
+    def crear_gasto(self, monto, mes=1, anio=2024, tipo='LIMPIEZA', estado='APROBADO'):
+        return GastoComun.objects.create(
+            complejo=self.complejo, tipo=tipo, descripcion='Gasto', monto=Decimal(monto),
+            fecha=date(anio, mes, 1), mes=mes, anio=anio, creado_por=self.residente, estado=estado
+        )
+
+    def resumen(self):
+        return {
+            (fila.anio, fila.mes, fila.tipo, fila.estado): (fila.total, fila.cantidad)
+            for fila in ResumenGastoComun.objects.filter(complejo=self.complejo)
+        }
+
+    def test_se_mantiene_con_altas_cambios_y_bajas(self):
+        gasto = self.crear_gasto('100.00')
+        self.crear_gasto('50.50')
+        self.crear_gasto('30.00', mes=2, tipo='SEGURIDAD', estado='PENDIENTE')
+        self.assertEqual(self.resumen()[(2024, 1, 'LIMPIEZA', 'APROBADO')], (Decimal('150.50'), 2))
+
+        gasto.mes = 2
+        gasto.save()
+        gasto.delete()
+        esperado = {
+            (2024, 1, 'LIMPIEZA', 'APROBADO'): (Decimal('50.50'), 1),
+            (2024, 2, 'SEGURIDAD', 'PENDIENTE'): (Decimal('30.00'), 1),
+        }
+        self.assertEqual(self.resumen(), esperado)
+
+        ResumenGastoComun.objects.all().delete()
+        reconstruir_resumenes()
+        self.assertEqual(self.resumen(), esperado)
+
+    def test_endpoint_lee_solo_el_resumen(self):
+        for anio in (2022, 2023, 2024):
+            self.crear_gasto('10.00', anio=anio)
+        with CaptureQueriesContext(connection) as contexto:
+            response = self.client.get(
+                '/api/gastos-comunes/resumen/', {'complejo': self.complejo.id, 'anio_desde': 2023}
+            )
+        self.assertEqual([fila['anio'] for fila in response.data], [2023, 2024])
+        tabla_gastos = GastoComun._meta.db_table
+        self.assertFalse([q for q in contexto.captured_queries if f'FROM "{tabla_gastos}"' in q['sql']])
+
+    def test_endpoint_solo_para_el_propio_complejo(self):
+        otro = ComplejoHabitacional.objects.create(nombre='Otro', direccion='-')
+        url = '/api/gastos-comunes/resumen/'
+        self.assertEqual(self.client.get(url, {'complejo': otro.id}).status_code, 403)
+
+        admin = self.crear_usuario('admin@test.cl', rol=self.rol_admin)
+        admin.complejo_administrado = otro
+        admin.save()
+        self.client.force_authenticate(user=admin)
+        self.assertEqual(self.client.get(url, {'complejo': self.complejo.id}).status_code, 403)
+        self.assertEqual(self.client.get(url, {'complejo': otro.id}).status_code, 200)
+
+    def test_migracion_reconstruye_gastos_existentes(self):
+        self.crear_gasto('10.00', anio=2024)
+        self.crear_gasto('5.00', anio=2024)
+        ResumenGastoComun.objects.all().delete()
+        migracion = importlib.import_module('administracion.migrations.0007_resumen_gastos_comunes')
+        migracion.reconstruir_resumenes(django_apps, None)
+        self.assertEqual(
+            list(ResumenGastoComun.objects.values_list('anio', 'total', 'cantidad')), [(2024, Decimal('15.00'), 2)]
+        )
+
+
+class ImportacionWhiteListTests(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        admin = self.crear_usuario('admin@test.cl', rol=self.rol_admin)
+        admin.complejo_administrado = self.complejo
+        admin.save()
+        self.client.force_authenticate(user=admin)
+        WhiteList.objects.create(email='existente@test.cl')
+
+    def importar(self, nombre, contenido):
+        archivo = SimpleUploadedFile(nombre, contenido.encode('utf-8'))
+        response = self.client.post(
+            '/api/whitelist/importar/', {'archivo': archivo, 'complejo': self.complejo.id}, format='multipart'
+        )
+        self.assertEqual(response.status_code, 202)
+        procesar_pendientes()
+        return Trabajo.objects.get(id=response.data['id']).resultado
+
+    def test_importa_csv_con_encabezado(self):
+        contenido = 'nombre,email\nAna,ana@TEST.cl\nBeto,existente@test.cl\nCata,no-es-email\nAna,ana@test.cl\n'
+        resultado = self.importar('residentes.csv', contenido)
+        self.assertEqual((resultado['aceptados'], resultado['duplicados'], resultado['invalidos']), (1, 2, 1))
+        self.assertEqual(resultado['errores'], [{'linea': 4, 'valor': 'no-es-email'}])
+        self.assertEqual(WhiteList.objects.get(email='ana@test.cl').complejo, self.complejo)
+
+    def test_importa_jsonl_en_lotes(self):
+        lineas = [json.dumps({'email': f'vecino{i}@test.cl'}) for i in range(25)] + ['{roto', '"suelto@test.cl"']
+        resultado = importar_whitelist(leer_emails_jsonl(lineas), tamano_lote=10)
+        self.assertEqual((resultado['aceptados'], resultado['invalidos']), (26, 1))
+
+        resultado = self.importar('residentes.jsonl', '\n'.join(lineas))
+        self.assertEqual((resultado['aceptados'], resultado['duplicados']), (0, 26))
+
+    def test_admin_solo_importa_a_su_complejo(self):
+        otro = ComplejoHabitacional.objects.create(nombre='Otro', direccion='Calle 456')
+        for datos in ({'complejo': otro.id}, {}):
+            archivo = SimpleUploadedFile('residentes.csv', b'email\nintruso@test.cl\n')
+            response = self.client.post('/api/whitelist/importar/', {'archivo': archivo, **datos}, format='multipart')
+            self.assertEqual(response.status_code, 403)
+        self.assertFalse(Trabajo.objects.exists())
+
+
+class ImportacionResidentesTests(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        admin = self.crear_usuario('admin@test.cl', rol=self.rol_admin)
+        admin.complejo_administrado = self.complejo
+        admin.save()
+        self.client.force_authenticate(user=admin)
+        WhiteList.objects.create(email='nuevo0@test.cl')
+
+    def lineas(self, filas):
+        return ['email,first_name,last_name,rut,telefono,unidad,password'] + [','.join(fila) for fila in filas]
+
+    def archivo(self, filas):
+        return SimpleUploadedFile('residentes.csv', '\n'.join(self.lineas(filas)).encode('utf-8'))
+
+    def test_importa_con_hash_en_paralelo_y_permite_login(self):
+        filas = [
+            (f'nuevo{i}@test.cl', 'Nuevo', 'Residente', generar_rut(20000000 + i), '', '101', f'clave-{i}')
+            for i in range(4)
+        ]
+        resultado = importar_residentes(leer_residentes_csv(self.lineas(filas)), self.complejo, procesos=2)
+        self.assertEqual((resultado['creados'], resultado['whitelist_registrados']), (4, 1))
+        self.assertEqual(WhiteList.objects.get(email='nuevo0@test.cl').estado, 'REGISTRADO')
+
+        response = APIClient().post('/api/usuarios/login/', {'email': 'nuevo3@test.cl', 'password': 'clave-3'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_valida_todo_antes_de_escribir(self):
+        response = self.client.post('/api/usuarios/importar/', {'complejo': self.complejo.id, 'archivo': self.archivo([
+            ('ok@test.cl', 'Ok', 'Residente', generar_rut(20000001), '', '101', 'clave'),
+            ('malo@test.cl', 'Malo', 'Residente', '12345678-0', '', '999', 'clave'),
+            ('residente@test.cl', 'Dup', 'Residente', generar_rut(20000002), '', '101', 'clave'),
+        ])}, format='multipart')
+        self.assertEqual(response.status_code, 202)
+        procesar_pendientes()
+        # Los errores de validación no se reintentan: el trabajo termina y los informa en su resultado
+        trabajo = Trabajo.objects.get(id=response.data['id'])
+        self.assertEqual((trabajo.estado, trabajo.intentos), ('COMPLETADO', 1))
+        self.assertEqual([error['linea'] for error in trabajo.resultado['errores']], [3, 4])
+        self.assertFalse(Usuario.objects.filter(email='ok@test.cl').exists())
+
+    def test_admin_solo_importa_a_su_complejo(self):
+        otro = ComplejoHabitacional.objects.create(nombre='Otro', direccion='Calle 456')
+        response = self.client.post('/api/usuarios/importar/', {'complejo': otro.id, 'archivo': self.archivo([
+            ('intruso@test.cl', 'Intruso', 'Residente', generar_rut(20000003), '', '101', 'clave'),
+        ])}, format='multipart')
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Trabajo.objects.exists())
+
+
+class RutNormalizadoTests(ApiTestCase):
+
+    def test_formatos_distintos_misma_clave(self):
+        self.assertEqual(normalizar_rut(' 12.345.678-k'), '12345678-K')
+        self.assertEqual(normalizar_rut('012345678-K'), '12345678-K')
+        self.assertEqual(validar_ruts(['12.345.678-5', '12345678-4', 'abc', '8616812-k']),
+                         ['12345678-5', None, None, '8616812-K'])
+        self.assertEqual(validar_rut('12.345.678-5'), '12.345.678-5')
+
+    def test_migracion_informa_ruts_duplicados(self):
+        original = self.crear_usuario('original@test.cl')
+        duplicado = self.crear_usuario('duplicado@test.cl')
+        Usuario.objects.filter(id=original.id).update(rut='12345678-5', rut_normalizado=None)
+        Usuario.objects.filter(id=duplicado.id).update(rut='12.345.678-5', rut_normalizado=None)
+        Usuario.objects.exclude(id__in=[original.id, duplicado.id]).update(rut_normalizado=None)
+        migracion = importlib.import_module('administracion.migrations.0008_rut_normalizado')
+        with mock.patch('builtins.print') as imprimir:
+            migracion.poblar_rut_normalizado(django_apps, None)
+        salida = '\n'.join(str(llamada.args[0]) for llamada in imprimir.call_args_list)
+        self.assertIn(f'usuario {duplicado.id} (RUT 12.345.678-5) duplica al usuario {original.id}', salida)
+        self.assertEqual(
+            dict(Usuario.objects.filter(id__in=[original.id, duplicado.id]).values_list('id', 'rut_normalizado')),
+            {original.id: '12345678-5', duplicado.id: None}
+        )
+
+    def test_busqueda_exacta_por_rut(self):
+        usuario = self.crear_usuario('dotted@test.cl', unidad=self.unidad)
+        usuario.rut = '12.345.678-5'
+        usuario.save(update_fields=['rut'])
+        response = self.client.get('/api/usuarios/por-rut/', {'rut': '12345678-5'})
+        self.assertEqual(response.status_code, 403)
+
+        admin = self.crear_usuario('admin@test.cl', rol=self.rol_admin)
+        admin.complejo_administrado = self.complejo
+        admin.save()
+        self.client.force_authenticate(user=admin)
+        with CaptureQueriesContext(connection) as contexto:
+            response = self.client.get('/api/usuarios/por-rut/', {'rut': '12345678-5'})
+        self.assertEqual(response.data['id'], usuario.id)
+        self.assertIn('"rut_normalizado" = ', contexto.captured_queries[-1]['sql'])
+
+        response = self.client.get('/api/usuarios/por-rut/', {'rut': '1-9'})
+        self.assertEqual(response.status_code, 404)
+
+        # Un ADMIN no encuentra residentes de otro complejo
+        admin.complejo_administrado = ComplejoHabitacional.objects.create(nombre='Otro', direccion='Calle 456')
+        admin.save()
+        response = self.client.get('/api/usuarios/por-rut/', {'rut': '12345678-5'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_rut_unico_sin_importar_formato(self):
+        duplicado = Usuario(email='b@test.cl', rut='0' + self.residente.rut, first_name='B', last_name='B')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            duplicado.save()
+
+    def test_registro_con_rut_existente_en_otro_formato(self):
+        WhiteList.objects.create(email='nuevo@test.cl')
+        numero, dv = self.residente.rut.split('-')
+        con_puntos = f'{int(numero):,}'.replace(',', '.') + f'-{dv}'
+        response = APIClient().post('/api/usuarios/register/', {
+            'email': 'nuevo@test.cl', 'password': 'clave-segura-123', 'first_name': 'N', 'last_name': 'N',
+            'rut': con_puntos, 'rol_id': self.rol_residente.id,
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('rut', response.data)
+        self.assertFalse(Usuario.objects.filter(email='nuevo@test.cl').exists())
+
+
+class ExportacionTests(ApiTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for mes in (1, 2, 3):
+            pago = Pago.objects.create(
+                usuario=cls.residente, fecha_vencimiento=date(2025, mes, 10),
+                estado='PAGADO' if mes == 1 else 'PENDIENTE'
+            )
+            PagoDetalle.objects.create(
+                pago=pago, concepto=f'Gasto común "{mes}"', monto=Decimal('1234.50'),
+                fecha_vencimiento=date(2025, mes, 10)
+            )
+
+    def setUp(self):
+        super().setUp()
+        admin = self.crear_usuario('admin@test.cl', rol=self.rol_admin)
+        admin.complejo_administrado = self.complejo
+        admin.save()
+        self.client.force_authenticate(user=admin)
+
+    def test_csv_filtrado_en_streaming(self):
+        response = self.client.get('/api/pagos/exportar/', {
+            'complejo': self.complejo.id, 'desde': '2025-02-01', 'estado': 'PENDIENTE'
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        filas = list(csv.reader(b''.join(response.streaming_content).decode('utf-8').splitlines()))
+        self.assertEqual(filas[0][:3], ['pago', 'estado_pago', 'vencimiento_pago'])
+        self.assertEqual([fila[2] for fila in filas[1:]], ['2025-02-10', '2025-03-10'])
+        self.assertEqual(filas[1][7], 'Gasto común "2"')
+
+    def test_xlsx_valido(self):
+        response = self.client.get('/api/pagos/exportar/', {'complejo': self.complejo.id, 'formato': 'xlsx'})
+        contenido = io.BytesIO(b''.join(response.streaming_content))
+        with zipfile.ZipFile(contenido) as archivo:
+            self.assertIsNone(archivo.testzip())
+            hoja = archivo.read('xl/worksheets/sheet1.xml').decode('utf-8')
+        self.assertEqual(hoja.count('<row>'), 4)
+        self.assertIn('<v>1234.50</v>', hoja)
+        self.assertIn('Gasto común "1"', hoja)
+
+    def test_admin_no_exporta_otro_complejo(self):
+        otro = ComplejoHabitacional.objects.create(nombre='Otro', direccion='Calle 456')
+        response = self.client.get('/api/gastos-comunes/exportar/', {'complejo': otro.id})
+        self.assertEqual(response.status_code, 403)
+
+    def test_exportacion_asincrona_y_descarga(self):
+        response = self.client.get('/api/pagos/exportar/', {
+            'complejo': self.complejo.id, 'estado': 'PENDIENTE', 'asincrono': 'true'
+        })
+        self.assertEqual(response.status_code, 202)
+        trabajo_id = response.data['id']
+        self.assertEqual(self.client.get(f'/api/trabajos/{trabajo_id}/descarga/').status_code, 404)
+
+        procesar_pendientes()
+        trabajo = Trabajo.objects.get(id=trabajo_id)
+        self.assertEqual((trabajo.estado, trabajo.resultado['filas']), ('COMPLETADO', 2))
+        response = self.client.get(f'/api/trabajos/{trabajo_id}/descarga/')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn(f'pagos-{trabajo_id}.csv', response['Content-Disposition'])
+        filas = list(csv.reader(b''.join(response.streaming_content).decode('utf-8').splitlines()))
+        self.assertEqual([fila[2] for fila in filas[1:]], ['2025-02-10', '2025-03-10'])
+
+
+class MorosidadTests(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.corte = date(2025, 6, 30)
+        self.pago = Pago.objects.create(usuario=self.residente, fecha_vencimiento=date(2025, 1, 10))
+        cuotas = [(10, '100.00', '5.00'), (45, '200.00', '0.00'), (120, '300.00', '30.00'), (-5, '999.00', '0.00')]
+        for dias, monto, multa in cuotas:
+            PagoDetalle.objects.create(
+                pago=self.pago, concepto='Cuota', monto=Decimal(monto), multa=Decimal(multa),
+                fecha_vencimiento=self.corte - timedelta(days=dias)
+            )
+
+    def test_tramos_y_totales_en_una_consulta(self):
+        with self.assertNumQueries(1):
+            reporte = calcular_morosidad(self.complejo, self.corte)
+        unidad, = reporte['unidades']
+        self.assertEqual((unidad['adeudado'], unidad['multas'], unidad['total']),
+                         (Decimal('600.00'), Decimal('35.00'), Decimal('635.00')))
+        self.assertEqual(unidad['dias_atraso'], 120)
+        self.assertEqual(unidad['tramos'], {
+            '0-30': Decimal('105.00'), '31-60': Decimal('200.00'), '61-90': Decimal('0.00'), '90+': Decimal('330.00'),
+        })
+        self.assertEqual(reporte['totales']['unidades_morosas'], 1)
+
+    def test_cache_se_invalida_al_pagar(self):
+        reporte_morosidad(self.complejo, self.corte)
+        with self.assertNumQueries(0):
+            reporte_morosidad(self.complejo, self.corte)
+
+        detalle = self.pago.detalles.get(monto=Decimal('300.00'))
+        detalle.fecha_pago = self.corte
+        detalle.save()
+        self.assertEqual(reporte_morosidad(self.complejo, self.corte)['totales']['adeudado'], Decimal('300.00'))
+
+        self.pago.estado = 'PAGADO'
+        self.pago.save()
+        self.assertEqual(reporte_morosidad(self.complejo, self.corte)['unidades'], [])
+
+    def test_cada_fecha_de_corte_es_una_entrada(self):
+        reporte_morosidad(self.complejo, self.corte)
+        reporte_morosidad(self.complejo, self.corte - timedelta(days=60))
+        with self.assertNumQueries(0):
+            self.assertEqual(reporte_morosidad(self.complejo, self.corte)['fecha_corte'], self.corte)
+        claves = [clave for clave in cache._cache if f'morosidad:{self.complejo.id}:' in clave]
+        self.assertEqual(len(claves), 2)
+
+    def test_guardar_sin_cambios_no_invalida(self):
+        reporte_morosidad(self.complejo, self.corte)
+        detalle = self.pago.detalles.get(monto=Decimal('300.00'))
+        detalle.concepto = 'Cuota renombrada'
+        # El UPDATE y la búsqueda del pago para invalidar las respuestas; el reporte no se invalida
+        with self.assertNumQueries(2):
+            detalle.save(update_fields=['concepto'])
+        with self.assertNumQueries(0):
+            reporte_morosidad(self.complejo, self.corte)
+
+        # Ambos receptores comparten una sola búsqueda del pago
+        detalle.multa = Decimal('40.00')
+        with self.assertNumQueries(2):
+            detalle.save(update_fields=['multa'])
+        self.assertEqual(reporte_morosidad(self.complejo, self.corte)['totales']['multas'], Decimal('45.00'))
+
+
+class IndicesFiltrosTests(ApiTestCase):
+
+    def test_planes_usan_indices_compuestos(self):
+        consultas = {
+            'pago_usuario_estado_venc_idx': Pago.objects.filter(
+                usuario=self.residente, estado='PENDIENTE'
+            ).order_by('fecha_vencimiento'),
+            'gasto_complejo_periodo_idx': GastoComun.objects.filter(
+                complejo=self.complejo, anio=2025, mes=3
+            ).order_by('-fecha', '-id'),
+            'gasto_periodo_idx': GastoComun.objects.filter(anio=2025, mes=3).order_by('-fecha', '-id'),
+        }
+        for indice, queryset in consultas.items():
+            with self.subTest(indice=indice):
+                self.assertIn(indice, queryset.explain())
+
+    def test_filtro_por_complejo_en_gastos(self):
+        otro = ComplejoHabitacional.objects.create(nombre='Otro', direccion='Calle 2')
+        for complejo in (self.complejo, otro):
+            GastoComun.objects.create(
+                complejo=complejo, tipo='LIMPIEZA', descripcion='Aseo', monto=Decimal('1000.00'),
+                fecha=date(2025, 3, 1), mes=3, anio=2025, creado_por=self.residente
+            )
+        respuesta = self.client.get('/api/gastos-comunes/', {'complejo': otro.id, 'mes': 3, 'anio': 2025})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual([gasto['complejo'] for gasto in respuesta.data['results']], [otro.id])
+
+    def test_benchmark_mide_consultas_de_las_vistas_con_planes(self):
+        salida = io.StringIO()
+        usuarios = Usuario.objects.count()
+        call_command(
+            'benchmark_indices', '--complejos', '2', '--unidades', '10', '--meses', '3', '--notificaciones', '5',
+            '--reservas', '3', '--repeticiones', '1', stdout=salida
+        )
+        texto = salida.getvalue()
+        self.assertEqual(Usuario.objects.count(), usuarios)
+        for camino in ('GET /api/pagos/)', 'morosidad', 'disponibilidad de un espacio', 'verificación de candidatos'):
+            self.assertIn(camino, texto)
+        # Los planes se muestran siempre, antes y después, sin pedir más verbosidad
+        self.assertEqual(texto.count('  sin índice:'), 6)
+        self.assertEqual(texto.count('  con índice:'), 6)
+        self.assertNotIn(': no\n', texto)
+        self.assertIn('usa reserva_espacio_intervalo_idx: sí', texto)
+
+
+class PerfilSqliteTests(ApiTestCase):
+
+    def test_pragmas_de_produccion(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            conexion = sqlite3.connect(f'{directorio}/perfil.sqlite3')
+            aplicar_pragmas(conexion.cursor(), PRAGMAS_PRODUCCION)
+            self.assertEqual(conexion.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+            self.assertEqual(conexion.execute('PRAGMA synchronous').fetchone()[0], 1)
+            self.assertEqual(conexion.execute('PRAGMA busy_timeout').fetchone()[0], 5000)
+            conexion.close()
+
+    def test_conexion_nueva_recibe_los_pragmas(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            for perfil, journal_mode, cache_size in (('produccion', 'wal', -64000), ('desarrollo', 'delete', -2000)):
+                ajustes = {**connection.settings_dict, 'NAME': f'{directorio}/{perfil}.sqlite3'}
+                with self.subTest(perfil=perfil), override_settings(SQLITE_PERFIL=perfil):
+                    # connection_created se envía al abrir la conexión: así la abre Django en cada proceso
+                    conexion = type(connections['default'])(ajustes, alias='perfil')
+                    try:
+                        with conexion.cursor() as cursor:
+                            cursor.execute('PRAGMA journal_mode')
+                            self.assertEqual(cursor.fetchone()[0], journal_mode)
+                            cursor.execute('PRAGMA cache_size')
+                            self.assertEqual(cursor.fetchone()[0], cache_size)
+                    finally:
+                        conexion.close()
+
+    def test_reintenta_solo_los_bloqueos(self):
+        intentos = []
+
+        def bloqueada():
+            intentos.append(1)
+            if len(intentos) < 3:
+                raise OperationalError('database is locked')
+            return 'ok'
+
+        self.assertEqual(reintentar(bloqueada, espera=0), 'ok')
+        self.assertEqual(len(intentos), 3)
+
+        intentos.clear()
+        with self.assertRaises(OperationalError):
+            reintentar(bloqueada, intentos=2, espera=0)
+        self.assertEqual(len(intentos), 2)
+
+        def otro_error():
+            intentos.append(1)
+            raise OperationalError('no such table: busy_log')
+
+        intentos.clear()
+        with self.assertRaises(OperationalError):
+            reintentar(otro_error, espera=0)
+        self.assertEqual(len(intentos), 1)
+
+    def test_bloqueo_por_codigo_de_sqlite(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = f'{directorio}/bloqueo.sqlite3'
+            escritor = sqlite3.connect(ruta, isolation_level=None)
+            escritor.execute('CREATE TABLE t (x)')
+            escritor.execute('BEGIN IMMEDIATE')
+            otro = sqlite3.connect(ruta, timeout=0)
+            try:
+                with self.assertRaises(sqlite3.OperationalError) as contexto:
+                    otro.execute('INSERT INTO t VALUES (1)')
+            finally:
+                otro.close()
+                escritor.close()
+        self.assertEqual(contexto.exception.sqlite_errorname, 'SQLITE_BUSY')
+        self.assertTrue(es_bloqueo(contexto.exception))
+
+        envuelto = OperationalError('database is locked')
+        envuelto.__cause__ = contexto.exception
+        self.assertTrue(es_bloqueo(envuelto))
+        self.assertFalse(es_bloqueo(OperationalError('disk I/O error: device busy')))
+
+    def test_registro_en_una_transaccion(self):
+        WhiteList.objects.create(email='nuevo@test.cl', complejo=self.complejo)
+        cliente = APIClient()
+        respuesta = cliente.post('/api/usuarios/register/', {
+            'email': 'nuevo@test.cl', 'password': 'clave-nueva-123', 'first_name': 'Nuevo', 'last_name': 'Residente',
+            'rut': generar_rut(20000000), 'rol_id': self.rol_residente.id,
+        }, format='json')
+        self.assertEqual(respuesta.status_code, 201, respuesta.data)
+        self.assertTrue(Usuario.objects.get(email='nuevo@test.cl').check_password('clave-nueva-123'))
+        self.assertEqual(WhiteList.objects.get(email='nuevo@test.cl').estado, 'REGISTRADO')
+
+
+@mock.patch('administracion.routers.hay_replica', return_value=True)
+class RouterReplicaTests(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.destinos = []
+
+        def vista(request):
+            self.destinos.append(router.db_for_read(GastoComun))
+            if 'escribir' in request.GET:
+                self.destinos.append(router.db_for_write(GastoComun))
+                self.destinos.append(router.db_for_read(GastoComun))
+            return HttpResponse()
+
+        self.middleware = LecturaReplicaMiddleware(vista)
+        self.factory = RequestFactory()
+
+    def test_lecturas_a_la_replica(self, _):
+        respuesta = self.middleware(self.factory.get('/api/gastos-comunes/'))
+        self.assertEqual(self.destinos, ['replica'])
+        self.assertNotIn(COOKIE_PRIMARIO, respuesta.cookies)
+
+    def test_escrituras_fijan_el_primario(self, _):
+        respuesta = self.middleware(self.factory.post('/api/gastos-comunes/'))
+        self.assertEqual(self.destinos, ['default'])
+        self.assertIn(COOKIE_PRIMARIO, respuesta.cookies)
+
+        respuesta = self.middleware(self.factory.get('/api/gastos-comunes/?escribir=1'))
+        self.assertEqual(self.destinos[1:], ['replica', 'default', 'default'])
+        self.assertIn(COOKIE_PRIMARIO, respuesta.cookies)
+
+    def test_cliente_que_escribio_lee_del_primario(self, _):
+        peticion = self.factory.get('/api/gastos-comunes/')
+        peticion.COOKIES[COOKIE_PRIMARIO] = '1'
+        self.middleware(peticion)
+        self.assertEqual(self.destinos, ['default'])
+
+    def test_fuera_de_una_peticion_usa_el_primario(self, _):
+        self.assertEqual(router.db_for_read(GastoComun), 'default')
+
+
+class RespuestaCacheadaTests(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.pago = Pago.objects.create(usuario=self.residente, fecha_vencimiento=date(2025, 1, 10))
+
+    def test_etag_y_304_sin_consultas(self):
+        primera = self.client.get('/api/pagos/')
+        self.assertEqual(primera.status_code, 200)
+        self.assertIn('Last-Modified', primera)
+        self.assertIn('private', primera['Cache-Control'])
+
+        with self.assertNumQueries(0):
+            segunda = self.client.get('/api/pagos/')
+        self.assertEqual(segunda.content, primera.content)
+        self.assertEqual(segunda['ETag'], primera['ETag'])
+
+        with self.assertNumQueries(0):
+            no_modificada = self.client.get('/api/pagos/', HTTP_IF_NONE_MATCH=primera['ETag'])
+        self.assertEqual(no_modificada.status_code, 304)
+        self.assertEqual(no_modificada['ETag'], primera['ETag'])
+
+    def test_query_string_es_parte_de_la_clave(self):
+        self.client.get('/api/pagos/')
+        with CaptureQueriesContext(connection) as contexto:
+            self.client.get('/api/pagos/?page_size=1')
+        self.assertGreater(len(contexto.captured_queries), 0)
+
+    def test_invalidacion_precisa_por_usuario(self):
+        vecino = self.crear_usuario('vecino@test.cl', unidad=self.unidad)
+        Pago.objects.create(usuario=vecino, fecha_vencimiento=date(2025, 1, 10))
+        cliente_vecino = APIClient()
+        cliente_vecino.force_authenticate(user=vecino)
+        etag = self.client.get('/api/pagos/')['ETag']
+        etag_vecino = cliente_vecino.get('/api/pagos/')['ETag']
+
+        detalle = PagoDetalle.objects.create(
+            pago=self.pago, concepto='Cuota', monto=Decimal('100.00'), fecha_vencimiento=date(2025, 1, 10)
+        )
+        self.pago.estado = 'PAGADO'
+        self.pago.save()
+        respuesta = self.client.get('/api/pagos/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.data['results'][0]['estado'], 'PAGADO')
+        # Los cambios de un residente no invalidan las respuestas de otro
+        with self.assertNumQueries(0):
+            self.assertEqual(cliente_vecino.get('/api/pagos/', HTTP_IF_NONE_MATCH=etag_vecino).status_code, 304)
+
+        # Borrar un detalle invalida la respuesta; como el listado no lo incluye, el ETag recalculado coincide
+        etag = respuesta['ETag']
+        detalle.delete()
+        with CaptureQueriesContext(connection) as contexto:
+            self.assertEqual(self.client.get('/api/pagos/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertGreater(len(contexto.captured_queries), 0)
+
+    def test_destinatarios_invalidan_notificaciones(self):
+        notificacion = Notificacion.objects.create(
+            titulo='Aviso', mensaje='Corte de agua', fecha_publicacion=timezone.now(),
+            creador=self.residente, complejo=ComplejoHabitacional.objects.create(nombre='Otro', direccion='-')
+        )
+        respuesta = self.client.get('/api/notificaciones/')
+        self.assertEqual(respuesta.data['data'], [])
+
+        notificacion.destinatarios.add(self.residente)
+        respuesta = self.client.get('/api/notificaciones/', HTTP_IF_NONE_MATCH=respuesta['ETag'])
+        self.assertEqual([fila['id'] for fila in respuesta.data['results']], [notificacion.id])
+
+    def test_mover_notificacion_invalida_ambos_complejos(self):
+        otro = ComplejoHabitacional.objects.create(nombre='Otro', direccion='-')
+        notificacion = Notificacion.objects.create(
+            titulo='Aviso', mensaje='Corte de agua', fecha_publicacion=timezone.now(),
+            creador=self.residente, complejo=self.complejo, audiencia='COMPLEJO'
+        )
+        respuesta = self.client.get('/api/notificaciones/')
+        self.assertEqual([fila['id'] for fila in respuesta.data['results']], [notificacion.id])
+
+        notificacion.complejo = otro
+        notificacion.save()
+        respuesta = self.client.get('/api/notificaciones/', HTTP_IF_NONE_MATCH=respuesta['ETag'])
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.data['data'], [])
+
+    def test_admin_de_complejo_ve_solo_su_complejo(self):
+        otro = ComplejoHabitacional.objects.create(nombre='Otro', direccion='-')
+        vecino_otro = self.crear_usuario(
+            'otro@test.cl', unidad=UnidadHabitacional.objects.create(
+                numero='201', tipo='Casa', complejo=otro, metros_cuadrados=Decimal('40.00')
+            )
+        )
+        Pago.objects.create(usuario=vecino_otro, fecha_vencimiento=date(2025, 1, 10))
+        propia = Notificacion.objects.create(
+            titulo='Aviso', mensaje='Corte de agua', fecha_publicacion=timezone.now(),
+            creador=self.residente, complejo=self.complejo
+        )
+        ajena = Notificacion.objects.create(
+            titulo='Aviso', mensaje='Corte de luz', fecha_publicacion=timezone.now(),
+            creador=vecino_otro, complejo=otro
+        )
+        admin = self.crear_usuario('admin@test.cl', rol=self.rol_admin)
+        admin.complejo_administrado = self.complejo
+        admin.save()
+        self.client.force_authenticate(user=admin)
+
+        respuesta = self.client.get('/api/pagos/')
+        self.assertEqual([fila['id'] for fila in respuesta.data['results']], [self.pago.id])
+        # El alcance compartido TODOS se invalida con los pagos de cualquier residente
+        self.pago.estado = 'PAGADO'
+        self.pago.save()
+        respuesta = self.client.get('/api/pagos/', HTTP_IF_NONE_MATCH=respuesta['ETag'])
+        self.assertEqual(respuesta.data['results'][0]['estado'], 'PAGADO')
+
+        respuesta = self.client.get('/api/notificaciones/')
+        self.assertEqual([fila['id'] for fila in respuesta.data['results']], [propia.id])
+        # Las escrituras de otros complejos no invalidan su listado
+        ajena.destinatarios.add(self.residente)
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                self.client.get('/api/notificaciones/', HTTP_IF_NONE_MATCH=respuesta['ETag']).status_code, 304
+            )
+        propia.destinatarios.add(vecino_otro)
+        self.assertEqual(
+            self.client.get('/api/notificaciones/', HTTP_IF_NONE_MATCH=respuesta['ETag']).status_code, 200
+        )
+
+    def test_usuario_sin_rol_ve_solo_lo_propio(self):
+        self.residente.rol = None
+        self.residente.save()
+        vecino = self.crear_usuario('vecino@test.cl', unidad=self.unidad)
+        Pago.objects.create(usuario=vecino, fecha_vencimiento=date(2025, 1, 10))
+
+        respuesta = self.client.get('/api/pagos/')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual([fila['id'] for fila in respuesta.data['results']], [self.pago.id])
+        self.assertEqual(self.client.get('/api/reservas/').status_code, 200)
+        self.assertEqual(self.client.get('/api/notificaciones/').status_code, 200)
+
+    def test_respuesta_cacheada_se_arma_desde_el_primario(self):
+        destinos = []
+        leer = router.db_for_read
+
+        def registrar(model, **hints):
+            destinos.append(leer(model, **hints))
+            return 'default'
+
+        # Sin la cookie del primario las lecturas de la petición van a la réplica, que puede estar atrasada
+        with mock.patch('administracion.routers.hay_replica', return_value=True), \
+                mock.patch.object(router, 'db_for_read', side_effect=registrar):
+            respuesta = self.client.get('/api/pagos/')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(destinos)
+        self.assertEqual(set(destinos), {'default'})
+
+    def test_cache_en_archivos(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            backend = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directorio}
+            with override_settings(CACHES={'default': backend}):
+                etag = self.client.get('/api/pagos/')['ETag']
+                with self.assertNumQueries(0):
+                    self.assertEqual(self.client.get('/api/pagos/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+                self.pago.estado = 'PAGADO'
+                self.pago.save()
+                self.assertEqual(self.client.get('/api/pagos/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class BandejaNotificacionesTests(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        token = RefreshToken.for_user(self.residente).access_token
+        self.headers = {'Authorization': f'Bearer {token}'}
+
+    def crear_difusion(self):
+        return Notificacion.objects.create(
+            titulo='Aviso', mensaje='Corte de agua', fecha_publicacion=timezone.now(),
+            creador=self.residente, complejo=self.complejo, audiencia='COMPLEJO'
+        )
+
+    async def test_requiere_autenticacion(self):
+        respuesta = await self.async_client.get('/api/notificaciones/bandeja/')
+        self.assertEqual(respuesta.status_code, 401)
+
+    async def test_long_poll_entrega_lo_pendiente(self):
+        notificacion = await sync_to_async(self.crear_difusion)()
+        respuesta = await self.async_client.get(
+            '/api/notificaciones/bandeja/', {'desde': 0}, headers=self.headers
+        )
+        datos = respuesta.json()
+        self.assertEqual([fila['id'] for fila in datos['notificaciones']], [notificacion.id])
+        self.assertEqual(datos['ultimo_id'], notificacion.id)
+
+    async def test_long_poll_despierta_al_publicar(self):
+        peticion = asyncio.ensure_future(self.async_client.get(
+            '/api/notificaciones/bandeja/', {'espera': 10}, headers=self.headers
+        ))
+        while not difusor.hay_suscripciones():
+            await asyncio.sleep(0.01)
+        notificacion = await sync_to_async(self.crear_difusion)()
+        difusor.publicar(self.complejo.id)
+        respuesta = await asyncio.wait_for(peticion, 5)
+        self.assertEqual([fila['id'] for fila in respuesta.json()['notificaciones']], [notificacion.id])
+        self.assertFalse(difusor.hay_suscripciones())
+
+    async def test_stream_sse(self):
+        notificacion = await sync_to_async(self.crear_difusion)()
+        respuesta = await self.async_client.get(
+            '/api/notificaciones/bandeja/', {'desde': 0}, headers={**self.headers, 'Accept': 'text/event-stream'}
+        )
+        self.assertEqual(respuesta['Content-Type'], 'text/event-stream')
+        contenido = aiter(respuesta.streaming_content)
+        self.assertTrue((await anext(contenido)).startswith(b'retry:'))
+        evento = (await anext(contenido)).decode()
+        self.assertIn(f'id: {notificacion.id}\nevent: notificacion\n', evento)
+        self.assertIn('"titulo": "Aviso"', evento)
+        # Al desconectarse el cliente, el servidor ASGI cancela la tarea que espera el siguiente evento
+        siguiente = asyncio.ensure_future(anext(contenido))
+        await asyncio.sleep(0.05)
+        siguiente.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await siguiente
+        self.assertFalse(difusor.hay_suscripciones())
+
+    async def test_difusor_solo_despierta_interesados(self):
+        local = Difusor()
+        del_complejo = local.suscribir([1], usuario_id=10)
+        de_otro = local.suscribir([2], usuario_id=20)
+        self.assertEqual(local.publicar(complejo_id=1), 1)
+        self.assertTrue(await del_complejo.esperar(1))
+        self.assertFalse(await de_otro.esperar(0.01))
+        self.assertEqual(local.publicar(usuario_ids=[20]), 1)
+        self.assertTrue(await de_otro.esperar(1))
+        local.cancelar(del_complejo)
+        local.cancelar(de_otro)
+        self.assertFalse(local.hay_suscripciones())
+
+    def test_creacion_publica_al_confirmar(self):
+        with mock.patch('administracion.signals.publicar_notificacion') as publicar:
+            with self.captureOnCommitCallbacks(execute=True):
+                notificacion = self.crear_difusion()
+        publicar.assert_called_once_with(notificacion.id, self.complejo.id)
+
+
+class TrabajosTests(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.admin = self.crear_usuario('admin@test.cl', rol=self.rol_admin)
+        self.llamadas = []
+        tareas = mock.patch.dict(TAREAS, {'prueba': self.tarea_prueba})
+        tareas.start()
+        self.addCleanup(tareas.stop)
+
+    def tarea_prueba(self, trabajo, fallar_hasta=0):
+        self.llamadas.append(trabajo.intentos)
+        reportar_progreso(trabajo, 1, 2)
+        if trabajo.intentos <= fallar_hasta:
+            raise RuntimeError('falla transitoria')
+        reportar_progreso(trabajo, 2, 2)
+        return {'intentos': trabajo.intentos}
+
+    def test_reintenta_con_backoff_y_completa(self):
+        trabajo = encolar('prueba', {'fallar_hasta': 1})
+        with override_settings(TRABAJOS_ESPERA_REINTENTO=10):
+            self.assertEqual(procesar_pendientes(), 1)
+        trabajo.refresh_from_db()
+        self.assertEqual((trabajo.estado, trabajo.intentos), ('PENDIENTE', 1))
+        self.assertIn('falla transitoria', trabajo.error)
+        self.assertGreater(trabajo.disponible_desde, timezone.now() + timedelta(seconds=5))
+        # En backoff no se reclama
+        self.assertEqual(procesar_pendientes(), 0)
+
+        Trabajo.objects.filter(id=trabajo.id).update(disponible_desde=timezone.now())
+        procesar_pendientes()
+        trabajo.refresh_from_db()
+        self.assertEqual((trabajo.estado, trabajo.resultado, trabajo.error), ('COMPLETADO', {'intentos': 2}, ''))
+        self.assertEqual((trabajo.progreso_actual, trabajo.progreso_total), (2, 2))
+        self.assertIsNotNone(trabajo.duracion_segundos)
+
+    def test_agota_intentos_y_se_reintenta_manualmente(self):
+        trabajo = encolar('prueba', {'fallar_hasta': 5}, usuario=self.admin, max_intentos=2)
+        with override_settings(TRABAJOS_ESPERA_REINTENTO=0):
+            procesar_pendientes()
+        trabajo.refresh_from_db()
+        self.assertEqual((trabajo.estado, trabajo.intentos), ('MUERTO', 2))
+        self.assertEqual(self.llamadas, [1, 2])
+
+        url = f'/api/trabajos/{trabajo.id}/reintentar/'
+        self.assertEqual(self.client.post(url).status_code, 403)
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual((response.data['estado'], response.data['max_intentos']), ('PENDIENTE', 3))
+        self.assertEqual(self.client.post(url).status_code, 409)
+
+    def test_residente_ve_solo_sus_trabajos(self):
+        propio = encolar('prueba', usuario=self.residente)
+        encolar('prueba', usuario=self.admin)
+        response = self.client.get('/api/trabajos/')
+        self.assertEqual([fila['id'] for fila in response.data['results']], [propio.id])
+
+        self.client.force_authenticate(user=self.crear_superusuario())
+        self.assertEqual(len(self.client.get('/api/trabajos/').data['results']), 2)
+
+    def crear_superusuario(self):
+        superusuario = self.crear_usuario('super@test.cl', rol=self.rol_admin)
+        superusuario.is_superuser = True
+        superusuario.save()
+        return superusuario
+
+    def test_admin_solo_ve_trabajos_de_su_complejo(self):
+        otro = ComplejoHabitacional.objects.create(nombre='Otro', direccion='-')
+        self.admin.complejo_administrado = self.complejo
+        self.admin.save()
+        propio = encolar('prueba', usuario=self.admin)
+        de_su_complejo = encolar('prueba', {'complejo': self.complejo.id})
+        ajeno = encolar('prueba', {'complejo': otro.id}, max_intentos=1)
+        encolar('prueba', usuario=self.residente)
+        Trabajo.objects.filter(id=ajeno.id).update(
+            estado='COMPLETADO', resultado={'archivo': 'trabajos/ajeno.csv', 'content_type': 'text/csv'}
+        )
+        default_storage.save('trabajos/ajeno.csv', ContentFile(b'id\n1\n'))
+
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get('/api/trabajos/')
+        self.assertEqual({fila['id'] for fila in response.data['results']}, {propio.id, de_su_complejo.id})
+        self.assertEqual(self.client.get(f'/api/trabajos/{ajeno.id}/').status_code, 404)
+        self.assertEqual(self.client.get(f'/api/trabajos/{ajeno.id}/descarga/').status_code, 404)
+        superusuario = APIClient()
+        superusuario.force_authenticate(user=self.crear_superusuario())
+        self.assertEqual(superusuario.get(f'/api/trabajos/{ajeno.id}/descarga/').status_code, 200)
+
+        Trabajo.objects.filter(id=ajeno.id).update(estado='MUERTO')
+        self.assertEqual(self.client.post(f'/api/trabajos/{ajeno.id}/reintentar/').status_code, 404)
+        self.assertEqual(superusuario.post(f'/api/trabajos/{ajeno.id}/reintentar/').status_code, 202)
+
+    def test_recupera_trabajos_vencidos(self):
+        vencido = encolar('prueba')
+        agotado = encolar('prueba', max_intentos=1)
+        hace_horas = timezone.now() - timedelta(hours=2)
+        Trabajo.objects.filter(id__in=[vencido.id, agotado.id]).update(
+            estado='EN_CURSO', intentos=1, fecha_inicio=hace_horas
+        )
+        self.assertEqual(recuperar_vencidos(), 2)
+        self.assertEqual(
+            dict(Trabajo.objects.values_list('id', 'estado')), {vencido.id: 'PENDIENTE', agotado.id: 'MUERTO'}
+        )
+
+    def test_comando_y_metricas(self):
+        for _ in range(3):
+            encolar('prueba')
+        salida = io.StringIO()
+        call_command('procesar_trabajos', '--una-vez', stdout=salida)
+        self.assertIn('3 trabajos ejecutados', salida.getvalue())
+
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get('/api/trabajos/metricas/')
+        self.assertEqual(response.status_code, 200)
+        metricas = response.data[0]
+        self.assertEqual((metricas['tipo'], metricas['total'], metricas['completados']), ('prueba', 3, 3))
+        self.assertIsNotNone(metricas['duracion_promedio'])
+
+
+class BenchmarkApiTests(ApiTestCase):
+
+    def ejecutar(self, *argumentos):
+        salida = io.StringIO()
+        call_command('benchmark_api', '--base-actual', '--escalas', '2', '--complejos', '2', '--repeticiones', '3',
+                     *argumentos, stdout=salida)
+        return salida.getvalue()
+
+    def test_guarda_resultados_y_revierte_los_datos(self):
+        usuarios = Usuario.objects.count()
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = f'{directorio}/resultado.json'
+            self.ejecutar('--salida', ruta)
+            with open(ruta, encoding='utf-8') as archivo:
+                resultados = json.load(archivo)['resultados']['2']
+        self.assertEqual(Usuario.objects.count(), usuarios)
+        self.assertEqual(len(resultados), 8)
+        self.assertEqual(resultados['pagos']['consultas'], 1)
+        for metricas in resultados.values():
+            self.assertLessEqual(metricas['p50_ms'], metricas['p99_ms'])
+            self.assertGreater(metricas['bytes'], 0)
+
+    def test_costo_por_fila_de_la_serializacion(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = f'{directorio}/resultado.json'
+            self.ejecutar('--salida', ruta, '--endpoints', 'pagos', '--serializacion')
+            with open(ruta, encoding='utf-8') as archivo:
+                serializacion = json.load(archivo)['serializacion']['2']
+        self.assertEqual(set(serializacion), {'pagos', 'reservas', 'notificaciones'})
+        for medicion in serializacion.values():
+            self.assertGreater(medicion['filas'], 0)
+            self.assertGreater(medicion['serializador_us_por_fila'], 0)
+            self.assertGreater(medicion['lectura_rapida_us_por_fila'], 0)
+
+    def test_marca_regresiones_contra_corrida_anterior(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            anterior = f'{directorio}/anterior.json'
+            self.ejecutar('--salida', anterior, '--endpoints', 'pagos')
+            with open(anterior, encoding='utf-8') as archivo:
+                informe = json.load(archivo)
+            informe['resultados']['2']['pagos'].update(p95_ms=0.001, consultas=0)
+            with open(anterior, 'w', encoding='utf-8') as archivo:
+                json.dump(informe, archivo)
+
+            with self.assertRaisesMessage(CommandError, '1 regresiones'):
+                self.ejecutar('--salida', f'{directorio}/actual.json', '--endpoints', 'pagos',
+                                       '--comparar', anterior)
+
+
+class LiquidacionTests(ApiTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.administrador = cls.crear_usuario('admin@test.cl', rol=cls.rol_admin)
+        cls.administrador.complejo_administrado = cls.complejo
+        cls.administrador.save()
+        ConfiguracionMulta.objects.create(
+            complejo=cls.complejo, dias_tolerancia=5, porcentaje_multa_diaria=Decimal('1.00'),
+            monto_minimo_multa=Decimal('500.00'), monto_maximo_multa=Decimal('5000.00')
+        )
+        cls.pago = Pago.objects.create(
+            usuario=cls.residente, fecha_vencimiento=date(2025, 1, 10), monto_total=Decimal('25000.00')
+        )
+        cls.gasto, cls.fondo = [
+            PagoDetalle.objects.create(
+                pago=cls.pago, concepto=concepto, monto=monto, fecha_vencimiento=date(2025, 1, 10)
+            )
+            for concepto, monto in (('Gasto común', Decimal('20000.00')), ('Fondo de reserva', Decimal('5000.00')))
+        ]
+        otro_complejo = ComplejoHabitacional.objects.create(nombre='Otro', direccion='-')
+        unidad = UnidadHabitacional.objects.create(
+            numero='1', tipo='Casa', complejo=otro_complejo, metros_cuadrados=Decimal('80.00')
+        )
+        pago_ajeno = Pago.objects.create(
+            usuario=cls.crear_usuario('ajeno@test.cl', unidad=unidad), fecha_vencimiento=date(2025, 1, 10)
+        )
+        cls.ajeno = PagoDetalle.objects.create(
+            pago=pago_ajeno, concepto='Gasto común', monto=Decimal('1000.00'), fecha_vencimiento=date(2025, 1, 10)
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(user=self.administrador)
+
+    def liquidar(self, datos, **kwargs):
+        response = self.client.post('/api/pagos-detalle/liquidar/', datos, **kwargs)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_resultado_por_item_y_pago_recalculado(self):
+        resultado = self.liquidar({'fecha_pago': '2025-01-12', 'detalles': [
+            self.fondo.id, {'id': self.gasto.id, 'fecha_pago': '2025-01-25'}, 999999, 'x', self.fondo.id,
+            {'id': self.ajeno.id}, {'id': self.gasto.id + 1000, 'fecha_pago': '3000-01-01'},
+        ]}, format='json')
+        self.assertEqual(
+            [(item['linea'], item['resultado']) for item in resultado['detalles']],
+            [(1, 'LIQUIDADO'), (2, 'LIQUIDADO'), (3, 'NO_ENCONTRADO'), (4, 'INVALIDO'), (5, 'DUPLICADO'),
+             (6, 'NO_AUTORIZADO'), (7, 'INVALIDO')]
+        )
+        self.assertEqual(resultado['totales']['LIQUIDADO'], 2)
+        self.assertEqual(resultado['pagos_actualizados'], 1)
+
+        # Mismo resultado que PagoDetalle.calcular_multa: 20000 * 1% * (15 - 5) días
+        gasto = resultado['detalles'][1]
+        self.assertEqual((gasto['multa'], gasto['dias_atraso'], gasto['estado_pago']), ('2000.00', 10, 'PAGADO'))
+        for detalle in (self.gasto, self.fondo):
+            detalle.refresh_from_db()
+            self.assertEqual(detalle.multa, detalle.calcular_multa())
+        self.assertEqual(self.fondo.fecha_pago, date(2025, 1, 12))
+        self.pago.refresh_from_db()
+        self.assertEqual((self.pago.estado, self.pago.monto_total), ('PAGADO', Decimal('27000.00')))
+        self.ajeno.refresh_from_db()
+        self.assertIsNone(self.ajeno.fecha_pago)
+
+    def test_archivo_de_conciliacion_e_idempotencia(self):
+        archivo = SimpleUploadedFile('banco.csv', f'detalle,fecha_pago\n{self.gasto.id},2025-01-10\n'.encode())
+        resultado = self.liquidar({'archivo': archivo}, format='multipart')
+        self.assertEqual(resultado['detalles'], [{
+            'linea': 2, 'id': self.gasto.id, 'resultado': 'LIQUIDADO', 'fecha_pago': '2025-01-10',
+            'multa': '0.00', 'dias_atraso': 0, 'pago': self.pago.id, 'estado_pago': 'PENDIENTE',
+        }])
+        self.pago.refresh_from_db()
+        self.assertEqual((self.pago.estado, self.pago.monto_total), ('PENDIENTE', Decimal('25000.00')))
+
+        archivo = SimpleUploadedFile('banco.jsonl', f'{{"id": {self.gasto.id}}}\n'.encode())
+        resultado = self.liquidar({'archivo': archivo}, format='multipart')
+        self.assertEqual(resultado['detalles'][0]['resultado'], 'YA_PAGADO')
+        self.assertEqual(resultado['pagos_actualizados'], 0)
+
+    def test_miles_de_detalles_en_consultas_constantes(self):
+        pagos = Pago.objects.bulk_create([
+            Pago(usuario=self.residente, fecha_vencimiento=date(2024, 1, 10), periodo_anio=2000 + i, periodo_mes=1)
+            for i in range(300)
+        ])
+        detalles = PagoDetalle.objects.bulk_create([
+            PagoDetalle(pago=pago, concepto=str(i), monto=Decimal('1000.00'), fecha_vencimiento=date(2024, 1, 10))
+            for pago in pagos for i in range(10)
+        ])
+        ids = [detalle.id for detalle in detalles]
+        reset_queries()
+        with CaptureQueriesContext(connection) as contexto:
+            resultado = self.liquidar({'detalles': ids, 'fecha_pago': '2024-01-10'}, format='json')
+        self.assertLess(len(contexto), 40)
+        self.assertEqual(resultado['totales']['LIQUIDADO'], 3000)
+        self.assertEqual(resultado['pagos_actualizados'], 300)
+        self.assertFalse(Pago.objects.filter(id__in=[pago.id for pago in pagos]).exclude(
+            estado='PAGADO', monto_total=Decimal('10000.00')
+        ).exists())
+
+    def test_archivo_que_no_es_utf8(self):
+        archivo = SimpleUploadedFile('banco.csv', f'detalle,glosa\n{self.gasto.id},Depósito\n'.encode('latin-1'))
+        response = self.client.post('/api/pagos-detalle/liquidar/', {'archivo': archivo}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('UTF-8', response.json()['error'])
+        self.gasto.refresh_from_db()
+        self.assertIsNone(self.gasto.fecha_pago)
+
+    def test_detalles_de_pagos_cancelados_no_se_liquidan(self):
+        Pago.objects.filter(id=self.pago.id).update(estado='CANCELADO')
+        resultado = self.liquidar({'detalles': [self.gasto.id]}, format='json')
+        self.assertEqual(resultado['detalles'][0]['resultado'], 'PAGO_CANCELADO')
+        self.assertEqual((resultado['totales']['PAGO_CANCELADO'], resultado['pagos_actualizados']), (1, 0))
+        self.gasto.refresh_from_db()
+        self.assertIsNone(self.gasto.fecha_pago)
+
+    def test_solo_administradores(self):
+        self.client.force_authenticate(user=self.residente)
+        response = self.client.post('/api/pagos-detalle/liquidar/', {'detalles': [self.gasto.id]}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+
+class MetricasTests(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        registro.limpiar()
+        Pago.objects.create(usuario=self.residente, fecha_vencimiento=date(2025, 1, 10))
+
+    def test_server_timing_por_peticion(self):
+        with CaptureQueriesContext(connection) as contexto:
+            response = self.client.get('/api/pagos/')
+        consultas = len(contexto)
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(
+            response['Server-Timing'],
+            rf'^sql;dur=[\d.]+;desc="{consultas} consultas", serializacion;dur=[\d.]+, total;dur=[\d.]+$'
+        )
+        serializacion = float(response['Server-Timing'].split('serializacion;dur=')[1].split(',')[0])
+        self.assertGreater(serializacion, 0)
+
+    def test_histogramas_por_accion(self):
+        self.client.get('/api/pagos/')
+        self.client.get('/api/pagos/?page_size=1')
+        with override_settings(METRICAS_TOKEN='secreto'):
+            texto = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secreto')
+        self.assertEqual(texto.status_code, 200)
+        self.assertTrue(texto['Content-Type'].startswith('text/plain; version=0.0.4'))
+        cuerpo = texto.content.decode()
+        self.assertIn('# TYPE resiadmin_sql_consultas histogram', cuerpo)
+        self.assertIn('resiadmin_sql_consultas_count{vista="PagoViewSet.list"} 2', cuerpo)
+        self.assertIn('resiadmin_respuesta_bytes_bucket{vista="PagoViewSet.list",le="+Inf"} 2', cuerpo)
+        self.assertIn('resiadmin_peticiones_total{estado="200",metodo="GET",vista="PagoViewSet.list"} 2', cuerpo)
+
+    @override_settings(METRICAS_TOKEN='secreto')
+    def test_token_de_metricas(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secreto').status_code, 200)
+
+    @override_settings(METRICAS_TOKEN=None)
+    def test_sin_token_solo_con_debug(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        with override_settings(DEBUG=True):
+            self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+    async def test_consultas_medidas_bajo_asgi(self):
+        # El cliente async recorre la pila de middleware en modo async, como uvicorn: la vista sync corre en
+        # otro hilo y sus consultas deben contarse igual que bajo WSGI
+        token = await sync_to_async(lambda: str(RefreshToken.for_user(self.residente).access_token))()
+        headers = {'Authorization': f'Bearer {token}'}
+        # La primera petición deja el principal en caché; ambas mediciones parten de ese estado
+        await self.async_client.get('/api/gastos-comunes/', headers=headers)
+        sincrona = await sync_to_async(APIClient().get)('/api/gastos-comunes/', headers=headers)
+        asincrona = await self.async_client.get('/api/gastos-comunes/', headers=headers)
+        self.assertEqual(asincrona.status_code, 200)
+        self.assertRegex(asincrona['Server-Timing'], r'^sql;dur=[\d.]+;desc="[1-9]\d* consultas"')
+        self.assertEqual(
+            asincrona['Server-Timing'].split(', ')[0].split('desc=')[1],
+            sincrona['Server-Timing'].split(', ')[0].split('desc=')[1]
+        )
+
+    def test_histograma_acumulativo_y_escape(self):
+        propio = Registro()
+        histograma = propio.histograma('prueba_segundos', (0.1, 1.0), 'Ayuda', vista='a"b\\c')
+        for valor in (0.05, 0.1, 0.5, 3):
+            histograma.observar(valor)
+        lineas = propio.exportar().splitlines()
+        self.assertIn('prueba_segundos_bucket{vista="a\\"b\\\\c",le="0.1"} 2', lineas)
+        self.assertIn('prueba_segundos_bucket{vista="a\\"b\\\\c",le="1.0"} 3', lineas)
+        self.assertIn('prueba_segundos_bucket{vista="a\\"b\\\\c",le="+Inf"} 4', lineas)
+        self.assertIn('prueba_segundos_count{vista="a\\"b\\\\c"} 4', lineas)
+
+
+class SeedScaleTests(ApiTestCase):
+
+    def poblar(self, *argumentos):
+        salida = io.StringIO()
+        call_command('seed_scale', '--complejos', '2', '--unidades', '5', '--meses', '3', '--notificaciones', '4',
+                     '--destinatarios', '2', '--referencia', '2025-06-15', *argumentos, stdout=salida)
+        return salida.getvalue()
+
+    def test_genera_datos_validos_y_deterministas(self):
+        self.poblar('--semilla', '3')
+        residentes = Usuario.objects.filter(email__endswith='@seed.test', unidad_habitacional__isnull=False)
+        self.assertEqual(residentes.count(), 10)
+        for usuario in Usuario.objects.filter(email__endswith='@seed.test'):
+            validar_rut(usuario.rut)
+            self.assertEqual(usuario.rut_normalizado, normalizar_rut(usuario.rut))
+
+        pagos = Pago.objects.filter(usuario__in=residentes)
+        self.assertEqual(pagos.count(), 30)
+        self.assertEqual(PagoDetalle.objects.filter(pago__in=pagos).count(), 60)
+        pago = pagos.order_by('id').first()
+        self.assertEqual(sum(pago.detalles.values_list('monto', flat=True)), pago.monto_total)
+        self.assertEqual((pago.periodo_anio, pago.periodo_mes, pago.fecha_vencimiento), (2025, 4, date(2025, 4, 10)))
+
+        administrador = Usuario.objects.get(email='admin0@seed.test')
+        self.assertEqual(administrador.complejo_administrado.administrador, administrador)
+        self.assertTrue(administrador.check_password('residente123'))
+        self.assertTrue(ResumenGastoComun.objects.filter(complejo=administrador.complejo_administrado).exists())
+
+        firma = list(PagoDetalle.objects.filter(pago__in=pagos).order_by(
+            'pago__usuario__email', 'pago__periodo_mes', 'concepto'
+        ).values_list('pago__usuario__email', 'pago__periodo_mes', 'monto', 'fecha_pago'))
+        with self.assertRaisesMessage(CommandError, 'ya tiene datos generados'):
+            self.poblar('--semilla', '3')
+        Usuario.objects.filter(email__endswith='@seed.test').delete()
+        ComplejoHabitacional.objects.filter(email__endswith='@seed.test').delete()
+        self.poblar('--semilla', '3')
+        self.assertEqual(firma, list(PagoDetalle.objects.filter(pago__usuario__email__endswith='@seed.test').order_by(
+            'pago__usuario__email', 'pago__periodo_mes', 'concepto'
+        ).values_list('pago__usuario__email', 'pago__periodo_mes', 'monto', 'fecha_pago')))
@@ -0,0 +1,246 @@
+import os
+import socket
+import tempfile
+import time
+import traceback
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import Avg, Count, F, Max, Q
+from django.utils import timezone
+
+from .exportaciones import EXPORTACIONES, FORMATOS
+from .facturacion import generar_cobros_mensuales
+from .importaciones import LECTORES, LECTORES_RESIDENTES, importar_residentes, importar_whitelist
+from .models import ComplejoHabitacional, Trabajo
+from .multas import recalcular_multas
+
+TAREAS = {}
+
+ESPERA_REINTENTO = 30
+# Un trabajo EN_CURSO por más de este tiempo se considera perdido (el proceso que lo tenía murió)
+TIMEOUT_SEGUNDOS = 3600
+INTERVALO_PROGRESO = 1.0
+
+
+def _config(nombre, defecto):
+    return getattr(settings, f'TRABAJOS_{nombre}', defecto)
+
+
+def tarea(nombre):
+    """
+    Registra una función como tarea encolable. Recibe el Trabajo y sus parámetros como kwargs,
+    y devuelve un resultado serializable a JSON.
+    """
+    def registrar(funcion):
+        TAREAS[nombre] = funcion
+        return funcion
+    return registrar
+
+
+def encolar(tipo, parametros=None, usuario=None, max_intentos=None):
+    if tipo not in TAREAS:
+        raise ValueError(f'Tarea desconocida: {tipo}')
+    return Trabajo.objects.create(
+        tipo=tipo, parametros=parametros or {}, creado_por=usuario,
+        max_intentos=max_intentos or _config('MAX_INTENTOS', 3)
+    )
+
+
+def nombre_trabajador():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def reclamar(trabajador, tipos=None):
+    """
+    Toma el siguiente trabajo disponible. En bases con SELECT ... FOR UPDATE SKIP LOCKED los trabajadores
+    no se bloquean entre sí; en SQLite el UPDATE condicionado al estado garantiza que solo uno lo gane.
+    """
+    ahora = timezone.now()
+    with transaction.atomic():
+        candidatos = Trabajo.objects.filter(estado='PENDIENTE', disponible_desde__lte=ahora)
+        if tipos:
+            candidatos = candidatos.filter(tipo__in=tipos)
+        if connection.features.has_select_for_update_skip_locked:
+            candidatos = candidatos.select_for_update(skip_locked=True)
+        for trabajo_id in candidatos.order_by('disponible_desde', 'id').values_list('id', flat=True)[:10]:
+            tomado = Trabajo.objects.filter(id=trabajo_id, estado='PENDIENTE').update(
+                estado='EN_CURSO', trabajador=trabajador, fecha_inicio=ahora, fecha_fin=None,
+                intentos=F('intentos') + 1, progreso_actual=0, progreso_total=None
+            )
+            if tomado:
+                return Trabajo.objects.get(id=trabajo_id)
+    return None
+
+
+def reportar_progreso(trabajo, actual, total=None):
+    """
+    Guarda el avance del trabajo, como máximo una vez por INTERVALO_PROGRESO para no escribir por cada fila.
+    """
+    ahora = time.monotonic()
+    if total is not None and actual < total and ahora - getattr(trabajo, '_ultimo_progreso', 0) < INTERVALO_PROGRESO:
+        return
+    trabajo._ultimo_progreso = ahora
+    trabajo.progreso_actual, trabajo.progreso_total = actual, total
+    Trabajo.objects.filter(id=trabajo.id, estado='EN_CURSO').update(progreso_actual=actual, progreso_total=total)
+
+
+def _finalizar(trabajo, **campos):
+    # Solo si sigue siendo nuestro: un trabajo que venció pudo ser reclamado por otro trabajador
+    return Trabajo.objects.filter(id=trabajo.id, estado='EN_CURSO', trabajador=trabajo.trabajador).update(
+        fecha_fin=timezone.now(), **campos
+    )
+
+
+def ejecutar(trabajo):
+    """
+    Ejecuta un trabajo reclamado y registra su resultado y métricas. Si falla, se reprograma con
+    backoff exponencial hasta agotar max_intentos; después queda MUERTO.
+    """
+    inicio = time.perf_counter()
+    espera = (trabajo.fecha_inicio - trabajo.disponible_desde).total_seconds()
+    try:
+        resultado = TAREAS[trabajo.tipo](trabajo, **trabajo.parametros)
+    except Exception as error:
+        duracion = time.perf_counter() - inicio
+        texto = ''.join(traceback.format_exception(error))
+        if trabajo.intentos < trabajo.max_intentos:
+            demora = _config('ESPERA_REINTENTO', ESPERA_REINTENTO) * 2 ** (trabajo.intentos - 1)
+            _finalizar(
+                trabajo, estado='PENDIENTE', error=texto, espera_segundos=espera, duracion_segundos=duracion,
+                disponible_desde=timezone.now() + timedelta(seconds=demora)
+            )
+        else:
+            _finalizar(trabajo, estado='MUERTO', error=texto, espera_segundos=espera, duracion_segundos=duracion)
+        return False
+    _finalizar(
+        trabajo, estado='COMPLETADO', resultado=resultado, error='', espera_segundos=espera,
+        duracion_segundos=time.perf_counter() - inicio
+    )
+    return True
+
+
+def recuperar_vencidos(timeout=None):
+    """
+    Devuelve a la cola (o a MUERTO si no le quedan intentos) los trabajos EN_CURSO que superaron el timeout.
+    """
+    limite = timezone.now() - timedelta(seconds=timeout or _config('TIMEOUT_SEGUNDOS', TIMEOUT_SEGUNDOS))
+    vencidos = Trabajo.objects.filter(estado='EN_CURSO', fecha_inicio__lt=limite)
+    error = 'Superó el tiempo máximo de ejecución'
+    muertos = vencidos.filter(intentos__gte=F('max_intentos')).update(
+        estado='MUERTO', error=error, fecha_fin=timezone.now()
+    )
+    reencolados = vencidos.update(estado='PENDIENTE', error=error, disponible_desde=timezone.now())
+    return reencolados + muertos
+
+
+def reintentar_trabajo(trabajo):
+    """
+    Devuelve a la cola un trabajo MUERTO con un intento adicional.
+    """
+    return Trabajo.objects.filter(id=trabajo.id, estado='MUERTO').update(
+        estado='PENDIENTE', max_intentos=F('intentos') + 1, disponible_desde=timezone.now()
+    )
+
+
+def procesar_pendientes(trabajador=None, tipos=None, limite=None):
+    """
+    Ejecuta trabajos en el hilo actual hasta vaciar la cola (o hasta `limite`). Devuelve cuántos ejecutó.
+    """
+    trabajador = trabajador or nombre_trabajador()
+    ejecutados = 0
+    while limite is None or ejecutados < limite:
+        trabajo = reclamar(trabajador, tipos)
+        if trabajo is None:
+            break
+        ejecutar(trabajo)
+        ejecutados += 1
+    return ejecutados
+
+
+def metricas_trabajos(desde=None):
+    """
+    Cantidad por estado y tiempos de espera y ejecución por tipo de trabajo.
+    """
+    queryset = Trabajo.objects.all()
+    if desde is not None:
+        queryset = queryset.filter(fecha_creacion__gte=desde)
+    por_tipo = queryset.values('tipo').annotate(
+        total=Count('id'),
+        pendientes=Count('id', filter=Q(estado='PENDIENTE')),
+        en_curso=Count('id', filter=Q(estado='EN_CURSO')),
+        completados=Count('id', filter=Q(estado='COMPLETADO')),
+        muertos=Count('id', filter=Q(estado='MUERTO')),
+        espera_promedio=Avg('espera_segundos'),
+        duracion_promedio=Avg('duracion_segundos', filter=Q(estado='COMPLETADO')),
+        duracion_maxima=Max('duracion_segundos', filter=Q(estado='COMPLETADO')),
+    ).order_by('tipo')
+    return list(por_tipo)
+
+
+# Archivos de entrada y salida de los trabajos (importaciones subidas y exportaciones generadas)
+
+def guardar_archivo(archivo):
+    return default_storage.save(f'trabajos/entradas/{archivo.name}', archivo)
+
+
+def _fecha(valor):
+    return date.fromisoformat(valor) if valor else None
+
+
+def _complejo(complejo_id):
+    return ComplejoHabitacional.objects.get(pk=complejo_id) if complejo_id else None
+
+
+@tarea('generar_cobros')
+def tarea_generar_cobros(trabajo, complejo, mes, anio, fecha_vencimiento=None):
+    return generar_cobros_mensuales(
+        _complejo(complejo), mes, anio, fecha_vencimiento=_fecha(fecha_vencimiento),
+        al_avanzar=lambda actual, total: reportar_progreso(trabajo, actual, total)
+    )
+
+
+@tarea('recalcular_multas')
+def tarea_recalcular_multas(trabajo, complejo=None):
+    return recalcular_multas(complejo=_complejo(complejo))
+
+
+@tarea('importar_whitelist')
+def tarea_importar_whitelist(trabajo, archivo, formato, complejo=None):
+    with default_storage.open(archivo, 'rb') as contenido:
+        lineas = (linea.decode('utf-8-sig') for linea in contenido)
+        resultado = importar_whitelist(
+            LECTORES[formato](lineas), complejo=_complejo(complejo),
+            al_avanzar=lambda procesados: reportar_progreso(trabajo, procesados)
+        )
+    default_storage.delete(archivo)
+    return resultado
+
+
+@tarea('importar_residentes')
+def tarea_importar_residentes(trabajo, archivo, formato, complejo):
+    with default_storage.open(archivo, 'rb') as contenido:
+        lineas = (linea.decode('utf-8-sig') for linea in contenido)
+        resultado = importar_residentes(LECTORES_RESIDENTES[formato](lineas), _complejo(complejo))
+    # Los errores de validación no se corrigen reintentando: el trabajo termina y los informa en el resultado
+    default_storage.delete(archivo)
+    return resultado
+
+
+@tarea('exportar')
+def tarea_exportar(trabajo, recurso, formato, complejo=None, desde=None, hasta=None, estado=None):
+    columnas, obtener_filas = EXPORTACIONES[recurso]
+    generar, content_type, extension = FORMATOS[formato]
+    filas = obtener_filas(_complejo(complejo), _fecha(desde), _fecha(hasta), estado)
+    total = filas.count()
+    reportar_progreso(trabajo, 0, total)
+    with tempfile.TemporaryFile() as salida:
+        for parte in generar([titulo for titulo, _ in columnas], filas):
+            salida.write(parte.encode('utf-8') if isinstance(parte, str) else parte)
+        salida.seek(0)
+        nombre = default_storage.save(f'trabajos/exportaciones/{recurso}-{trabajo.id}.{extension}', File(salida))
+    reportar_progreso(trabajo, total, total)
+    return {'archivo': nombre, 'filas': total, 'content_type': content_type}
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import UsuarioViewSet, WhiteListViewSet, PagoViewSet, ReservaViewSet, NotificacionViewSet, welcome, PagoDetalleViewSet, GastoComunViewSet
+from .views import UsuarioViewSet, WhiteListViewSet, PagoViewSet, ReservaViewSet, NotificacionViewSet, welcome, PagoDetalleViewSet, GastoComunViewSet, EspacioComunViewSet, TrabajoViewSet, bandeja_notificaciones
 
 router = DefaultRouter()
 router.register(r'usuarios', UsuarioViewSet)
@@ -9,9 +9,13 @@ router.register(r'pagos', PagoViewSet)
 router.register(r'pagos-detalle', PagoDetalleViewSet)
 router.register(r'gastos-comunes', GastoComunViewSet)
 router.register(r'reservas', ReservaViewSet)
+router.register(r'espacios-comunes', EspacioComunViewSet)
 router.register(r'notificaciones', NotificacionViewSet)
+router.register(r'trabajos', TrabajoViewSet)
 
 urlpatterns = [
     path('', welcome, name='welcome'),
+    # Antes del router para que 'bandeja' no se tome como id de notificación
+    path('notificaciones/bandeja/', bandeja_notificaciones, name='bandeja-notificaciones'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -2,45 +2,88 @@ import re
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
 
+RUT_PATRON = re.compile(r'^(\d{1,3}(?:\.\d{3})+|\d+)-([0-9K])$')
+
+# Multiplicadores 2..7 cíclicos, aplicados desde el dígito menos significativo
+PESOS_RUT = [2, 3, 4, 5, 6, 7] * 2
+
+
+def calcular_dv(rut_numero):
+    """
+    Calcula el dígito verificador para la parte numérica del RUT (sin puntos).
+    """
+    suma = sum(int(digito) * peso for digito, peso in zip(reversed(rut_numero), PESOS_RUT))
+    resto = 11 - (suma % 11)
+    if resto == 11:
+        return '0'
+    if resto == 10:
+        return 'K'
+    return str(resto)
+
+
+def _partes_rut(value):
+    """
+    Separa un RUT con o sin puntos en (dígitos, dígito verificador), o None si no tiene forma de RUT.
+    """
+    if not isinstance(value, str):
+        return None
+    coincidencia = RUT_PATRON.match(value.strip().upper().replace(' ', ''))
+    if not coincidencia:
+        return None
+    return coincidencia.group(1).replace('.', ''), coincidencia.group(2)
+
+
+def normalizar_rut(value):
+    """
+    Forma canónica del RUT usada como clave de búsqueda: sin puntos, sin ceros a la izquierda,
+    con guión y dígito verificador en mayúscula (ejemplo: 12345678-K).
+    Devuelve None si el valor no tiene forma de RUT. No verifica el dígito verificador.
+    """
+    partes = _partes_rut(value)
+    if partes is None:
+        return None
+    return f"{partes[0].lstrip('0') or '0'}-{partes[1]}"
+
+
+def validar_ruts(valores):
+    """
+    Valida muchos RUT de una vez (para importaciones) con las mismas reglas que validar_rut.
+    Devuelve una lista con la forma canónica de cada valor, o None si no es válido.
+    """
+    resultado = []
+    dvs = {}
+    for valor in valores:
+        partes = _partes_rut(valor)
+        canonico = None
+        if partes is not None and 7 <= len(partes[0]) <= 8:
+            numero = partes[0].lstrip('0') or '0'
+            if numero not in dvs:
+                dvs[numero] = calcular_dv(numero)
+            if dvs[numero] == partes[1]:
+                canonico = f"{numero}-{partes[1]}"
+        resultado.append(canonico)
+    return resultado
+
+
 def validar_rut(value):
     """
     Valida que el RUT tenga el formato correcto y que el dígito verificador sea válido.
-    Formato esperado: XXXXXXXX-X donde X son números y el último puede ser un número o K
+    Formato esperado: XXXXXXXX-X o XX.XXX.XXX-X donde X son números y el último puede ser un número o K
     """
-    # Eliminar espacios y convertir a mayúsculas
-    rut = value.strip().upper()
+    # Eliminar espacios y puntos, convertir a mayúsculas y separar número y dígito verificador
+    partes = _partes_rut(value)
     
     # Verificar formato básico (números + guión + dígito verificador)
-    if not re.match(r'^\d{7,8}-[0-9K]$', rut):
+    if partes is None or not 7 <= len(partes[0]) <= 8:
         raise ValidationError(
-            _('El RUT debe tener el formato XXXXXXXX-X (ejemplo: 12345678-9 o 12345678-K)'),
+            _('El RUT debe tener el formato XXXXXXXX-X (ejemplo: 12345678-9 o 12.345.678-K)'),
             params={'value': value},
         )
     
-    # Separar número y dígito verificador
-    rut_numero, dv = rut.split('-')
-    
-    # Calcular dígito verificador
-    suma = 0
-    multiplicador = 2
-    
-    # Calcular suma ponderada
-    for r in reversed(rut_numero):
-        suma += int(r) * multiplicador
-        multiplicador += 1
-        if multiplicador > 7:
-            multiplicador = 2
+    rut_numero, dv = partes
     
     # Calcular dígito verificador esperado
-    resto = 11 - (suma % 11)
-    
-    # Casos especiales
-    if resto == 11:
-        dv_esperado = '0'
-    elif resto == 10:
-        dv_esperado = 'K'
-    else:
-        dv_esperado = str(resto)
+    dv_esperado = calcular_dv(rut_numero)
     
     # Verificar dígito verificador
     if dv != dv_esperado:
@@ -1,18 +1,263 @@
 from django.shortcuts import render
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action, api_view
+from rest_framework.parsers import JSONParser, MultiPartParser
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate, get_user_model, logout
 from django.contrib.auth.hashers import make_password
-from .models import Usuario, WhiteList, Pago, Reserva, Notificacion, PagoDetalle, GastoComun, Rol
-from .serializers import UsuarioSerializer, WhiteListSerializer, PagoSerializer, ReservaSerializer, NotificacionSerializer, PagoDetalleSerializer, GastoComunSerializer
-from django.http import HttpResponse
+from django.db.models import Prefetch, Q
+from .models import Usuario, WhiteList, Pago, Reserva, ReservaDetalle, Notificacion, PagoDetalle, GastoComun, Rol, EspacioComun, ComplejoHabitacional, Trabajo
+from .serializers import UsuarioSerializer, WhiteListSerializer, PagoSerializer, ReservaSerializer, NotificacionSerializer, PagoDetalleSerializer, GastoComunSerializer, GenerarCobrosSerializer, EspacioComunSerializer, IntervaloSerializer, VerificarDisponibilidadSerializer, ResumenGastoComunSerializer, ResumenGastosFiltroSerializer, ImportarWhiteListSerializer, ImportarResidentesSerializer, ExportacionFiltroSerializer, MorosidadFiltroSerializer, TrabajoSerializer, LiquidacionSerializer
+from .permissions import EsAdministrador
+from .basedatos import con_reintentos, ejecutar_con_reintentos
+from .validators import normalizar_rut
+from .exportaciones import EXPORTACIONES, FORMATOS
+from .morosidad import reporte_morosidad
+from .disponibilidad import intervalos_libres, reservas_en_conflicto, verificar_candidatos
+from .resumenes import resumen_por_periodo
+from .trabajos import encolar, guardar_archivo, metricas_trabajos, reintentar_trabajo
+from .respuestas import CACHE_TIMEOUT, TODOS, calcular_etag, clave_respuesta, versiones
+from .authentication import JWTAuthenticationCacheada
+from .bandeja import complejos_de, difusor, notificaciones_nuevas, ultimo_id_notificacion
+from .instrumentacion import registro
+from .lecturas import lectura_para
+from .routers import PRIMARIO, lecturas_en
+from .campos import CamposDinamicosMixin, arbol_de_campos, proyectar
+from .importaciones import abrir_texto
+from .liquidaciones import LECTORES_CONCILIACION, items_de_lista, liquidar_detalles
+from asgiref.sync import sync_to_async
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from django.core.serializers.json import DjangoJSONEncoder
+import hmac
+import json
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from rest_framework.reverse import reverse
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date, parse_etags
 
 # Create your views here.
 
-class UsuarioViewSet(viewsets.ModelViewSet):
-    queryset = get_user_model().objects.all()
+def administra_complejo(user, complejo):
+    """
+    Un ADMIN solo opera sobre su complejo; superusuarios y SUPERADMIN sobre cualquiera.
+    """
+    if user.is_superuser or getattr(user.rol, 'nombre', None) != 'ADMIN':
+        return True
+    return complejo is not None and user.complejo_administrado_id == complejo.id
+
+def complejos_administrados(user):
+    """
+    Ids de los complejos que administra el usuario, o None si puede operar sobre cualquiera.
+    """
+    if user.is_superuser or getattr(user.rol, 'nombre', None) != 'ADMIN':
+        return None
+    return {user.complejo_administrado_id} if user.complejo_administrado_id else set()
+
+def respuesta_encolada(request, trabajo):
+    """
+    202 con el trabajo recién encolado y su URL en Location para consultar el avance.
+    """
+    return Response(
+        TrabajoSerializer(trabajo).data,
+        status=status.HTTP_202_ACCEPTED,
+        headers={'Location': reverse('trabajo-detail', args=[trabajo.id], request=request)}
+    )
+
+def respuesta_exportacion(request, nombre):
+    filtros = ExportacionFiltroSerializer(data=request.query_params)
+    filtros.is_valid(raise_exception=True)
+    datos = filtros.validated_data
+    if not administra_complejo(request.user, datos.get('complejo')):
+        return Response(
+            {"error": "No administras este complejo"},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    if datos['asincrono']:
+        complejo = datos.get('complejo')
+        trabajo = encolar('exportar', {
+            'recurso': nombre,
+            'formato': datos['formato'],
+            'complejo': complejo.id if complejo else None,
+            'desde': datos['desde'].isoformat() if datos.get('desde') else None,
+            'hasta': datos['hasta'].isoformat() if datos.get('hasta') else None,
+            'estado': datos.get('estado'),
+        }, usuario=request.user)
+        return respuesta_encolada(request, trabajo)
+    columnas, obtener_filas = EXPORTACIONES[nombre]
+    generar, content_type, extension = FORMATOS[datos['formato']]
+    filas = obtener_filas(datos.get('complejo'), datos.get('desde'), datos.get('hasta'), datos.get('estado'))
+    # El cuerpo se genera después de que el middleware terminó: fijar ahora la base que eligió el router
+    filas = filas.using(filas.db)
+    response = StreamingHttpResponse(generar([titulo for titulo, _ in columnas], filas), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{nombre}.{extension}"'
+    return response
+
+class RespuestaCacheadaMixin:
+    """
+    Cachea list y retrieve por usuario, ruta con query string y formato, y responde con ETag y Last-Modified.
+    Un If-None-Match que coincide se contesta con 304 sin consultar ni serializar.
+    Las señales invalidan por `recurso_cache` y los alcances que devuelve `alcances_cache`.
+    """
+    recurso_cache = None
+
+    def alcances_cache(self):
+        return [TODOS]
+
+    def list(self, request, *args, **kwargs):
+        return self._responder_cacheado(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._responder_cacheado(super().retrieve, request, *args, **kwargs)
+
+    def _responder_cacheado(self, accion, request, *args, **kwargs):
+        vigentes = versiones(self.recurso_cache, self.alcances_cache())
+        clave = clave_respuesta(
+            self.recurso_cache, vigentes, request.user.pk, request.get_full_path(), request.accepted_media_type
+        )
+        entrada = cache.get(clave)
+        response = None
+        if entrada is None:
+            # La réplica puede no tener aún la escritura que cambió la versión: lo que se guarda por
+            # CACHE_TIMEOUT se lee del primario
+            with lecturas_en(PRIMARIO):
+                response = accion(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            response = self.finalize_response(request, response, *args, **kwargs)
+            response.render()
+            entrada = {
+                'contenido': response.content,
+                'content_type': response['Content-Type'],
+                'etag': calcular_etag(response.content),
+                'modificado': max(vigentes.values()),
+            }
+            cache.set(clave, entrada, CACHE_TIMEOUT)
+
+        etags = parse_etags(request.headers.get('If-None-Match', ''))
+        if entrada['etag'] in etags or '*' in etags:
+            response = HttpResponseNotModified()
+        elif response is None:
+            response = HttpResponse(entrada['contenido'], content_type=entrada['content_type'])
+        response['ETag'] = entrada['etag']
+        response['Last-Modified'] = http_date(entrada['modificado'])
+        # Contenido por usuario: solo en el cliente, y revalidando con If-None-Match en cada uso
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+class VisibilidadAdministradorMixin:
+    """
+    Los administradores ven las filas de los complejos que administran (todas si son superusuarios o
+    SUPERADMIN) y los demás usuarios solo las propias. Las respuestas de los administradores se cachean en
+    el alcance TODOS, que invalida cualquier escritura del recurso.
+    """
+    # Ruta al complejo de cada fila para el filtro de los administradores de un complejo
+    campo_complejo = 'usuario__unidad_habitacional__complejo_id'
+
+    def es_administrador(self):
+        return EsAdministrador().has_permission(self.request, self)
+
+    def filas_propias(self, queryset):
+        return queryset.filter(usuario=self.request.user)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if not self.es_administrador():
+            return self.filas_propias(queryset)
+        complejos = complejos_administrados(self.request.user)
+        if complejos is None:
+            return queryset
+        return queryset.filter(**{f'{self.campo_complejo}__in': complejos})
+
+    def alcances_cache(self):
+        if self.es_administrador():
+            return [TODOS]
+        return [f'usuario:{self.request.user.pk}']
+
+class CamposSolicitadosMixin:
+    """
+    `?fields=id,usuario.email` elige los campos de la respuesta y `?expand=usuario,usuario.rol` las relaciones
+    que se anidan completas; sin expandir, las relaciones salen como IDs. En list y retrieve la consulta se
+    reduce a los joins, prefetch y columnas que usan esos campos.
+    """
+
+    def get_serializer(self, *args, **kwargs):
+        serializer_class = self.get_serializer_class()
+        request = getattr(self, 'request', None)
+        if request is not None and issubclass(serializer_class, CamposDinamicosMixin):
+            kwargs.setdefault('campos', arbol_de_campos(request.query_params.get('fields')))
+            kwargs.setdefault('expandir', arbol_de_campos(request.query_params.get('expand')) or {})
+        return super().get_serializer(*args, **kwargs)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve') and issubclass(self.get_serializer_class(), CamposDinamicosMixin):
+            orden = [campo.lstrip('-') for campo in getattr(self, 'orden_paginacion', ())]
+            queryset = proyectar(queryset, self.get_serializer(), orden)
+        return queryset
+
+class ListadoConMensajeMixin:
+    """
+    Listado paginado que responde con `mensaje_vacio` cuando la primera página no tiene resultados.
+    Con `lectura_rapida` el listado se arma desde filas de values() en lugar de instancias y serializador.
+    """
+    mensaje_vacio = None
+    lectura_rapida = False
+
+    def consulta_listado(self):
+        """
+        Queryset que pagina list y la LecturaRapida que representa sus filas (None si se usa el serializador).
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        lectura = lectura_para(self.get_serializer()) if self.lectura_rapida else None
+        if lectura is not None:
+            # La paginación por cursor lee de cada fila las columnas del orden
+            orden = [campo.lstrip('-') for campo in getattr(self, 'orden_paginacion', ())]
+            queryset = queryset.prefetch_related(None).values(*lectura.columnas, *orden)
+        return queryset, lectura
+
+    def list(self, request, *args, **kwargs):
+        queryset, lectura = self.consulta_listado()
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            page = list(queryset)
+        elif not page and not self.paginator.has_previous:
+            return Response({
+                "message": self.mensaje_vacio,
+                "data": []
+            })
+        if lectura is not None:
+            datos = lectura.representar(page)
+        else:
+            datos = self.get_serializer(page, many=True).data
+        if self.paginator is not None:
+            return self.get_paginated_response(datos)
+        return Response(datos)
+
+class EscrituraConReintentosMixin:
+    """
+    Escribe cada alta, modificación o baja en una transacción propia que se reintenta si SQLite está bloqueada.
+    """
+    @con_reintentos
+    def perform_create(self, serializer):
+        # Si un intento anterior se revirtió, la instancia que quedó asignada no existe en la base de datos
+        serializer.instance = None
+        super().perform_create(serializer)
+
+    @con_reintentos
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+
+    @con_reintentos
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+
+class UsuarioViewSet(CamposSolicitadosMixin, viewsets.ModelViewSet):
+    # UsuarioSerializer anida rol y unidad_habitacional
+    queryset = get_user_model().objects.select_related('rol', 'unidad_habitacional')
     serializer_class = UsuarioSerializer
 
     @action(detail=False, methods=['post'])
@@ -39,14 +284,17 @@ class UsuarioViewSet(viewsets.ModelViewSet):
             # Asignar el rol de Residente usando rol_id
             serializer.validated_data['rol_id'] = rol_residente.id
             
-            # Crear el usuario
-            user = serializer.save()
-            user.set_password(serializer.validated_data['password'])
-            user.save()
-            
-            # Actualizar el estado de la whitelist
-            whitelist_entry.estado = 'REGISTRADO'
-            whitelist_entry.save()
+            def registrar():
+                # UsuarioSerializer.create ya guarda el password hasheado
+                serializer.instance = None
+                user = serializer.save()
+                # Actualizar el estado de la whitelist
+                whitelist_entry.estado = 'REGISTRADO'
+                whitelist_entry.save(update_fields=['estado'])
+                return user
+
+            # Crear el usuario y marcar la whitelist en una sola transacción, reintentada si hay bloqueo
+            user = ejecutar_con_reintentos(registrar)
             
             # Generar tokens JWT
             refresh = RefreshToken.for_user(user)
@@ -57,6 +305,44 @@ class UsuarioViewSet(viewsets.ModelViewSet):
             }, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=False, methods=['post'], permission_classes=[EsAdministrador], parser_classes=[MultiPartParser])
+    def importar(self, request):
+        serializer = ImportarResidentesSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        datos = serializer.validated_data
+        if not administra_complejo(request.user, datos['complejo']):
+            return Response(
+                {"error": "No administras este complejo"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        trabajo = encolar('importar_residentes', {
+            'archivo': guardar_archivo(datos['archivo']),
+            'formato': datos['formato'],
+            'complejo': datos['complejo'].id,
+        }, usuario=request.user)
+        return respuesta_encolada(request, trabajo)
+
+    @action(detail=False, methods=['get'], url_path='por-rut', permission_classes=[EsAdministrador])
+    def por_rut(self, request):
+        rut = normalizar_rut(request.query_params.get('rut', ''))
+        if rut is None:
+            return Response(
+                {"error": "RUT con formato inválido"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        usuarios = self.get_queryset().filter(rut_normalizado=rut)
+        complejos = complejos_administrados(request.user)
+        if complejos is not None:
+            # Un ADMIN solo busca entre los residentes de su complejo
+            usuarios = usuarios.filter(unidad_habitacional__complejo_id__in=complejos)
+        usuario = usuarios.first()
+        if usuario is None:
+            return Response(
+                {"error": "Usuario no encontrado"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(self.get_serializer(usuario).data)
+
     @action(detail=False, methods=['post'])
     def login(self, request):
         email = request.data.get('email')
@@ -99,97 +385,313 @@ class UsuarioViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-class WhiteListViewSet(viewsets.ModelViewSet):
+class WhiteListViewSet(CamposSolicitadosMixin, viewsets.ModelViewSet):
+    # WhiteListSerializer solo expone claves primarias, no requiere joins
     queryset = WhiteList.objects.all()
     serializer_class = WhiteListSerializer
     permission_classes = [permissions.IsAuthenticated]
 
-class PagoViewSet(viewsets.ModelViewSet):
-    queryset = Pago.objects.all()
+    @action(detail=False, methods=['post'], permission_classes=[EsAdministrador], parser_classes=[MultiPartParser])
+    def importar(self, request):
+        serializer = ImportarWhiteListSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        datos = serializer.validated_data
+        complejo = datos.get('complejo')
+        # Un ADMIN solo importa a su propio complejo, así que debe indicarlo
+        if not administra_complejo(request.user, complejo):
+            return Response(
+                {"error": "No administras este complejo"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        trabajo = encolar('importar_whitelist', {
+            'archivo': guardar_archivo(datos['archivo']),
+            'formato': datos['formato'],
+            'complejo': complejo.id if complejo else None,
+        }, usuario=request.user)
+        return respuesta_encolada(request, trabajo)
+
+class PagoViewSet(VisibilidadAdministradorMixin, CamposSolicitadosMixin, EscrituraConReintentosMixin, RespuestaCacheadaMixin, ListadoConMensajeMixin, viewsets.ModelViewSet):
+    queryset = Pago.objects.select_related('usuario__rol', 'usuario__unidad_habitacional')
     serializer_class = PagoSerializer
+    lectura_rapida = True
     permission_classes = [permissions.IsAuthenticated]
+    orden_paginacion = ('-fecha_creacion', '-id')
+    mensaje_vacio = "No hay pagos registrados"
+    recurso_cache = 'pagos'
 
-    def get_queryset(self):
-        user = self.request.user
-        if user.rol.nombre == 'Administrador':
-            return Pago.objects.all()
-        # Para residentes, mostrar solo sus pagos
-        return Pago.objects.filter(usuario=user)
+    @action(detail=False, methods=['post'], url_path='generar-cobros', permission_classes=[EsAdministrador])
+    def generar_cobros(self, request):
+        serializer = GenerarCobrosSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        datos = serializer.validated_data
+        if not administra_complejo(request.user, datos['complejo']):
+            return Response(
+                {"error": "No administras este complejo"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        fecha_vencimiento = datos.get('fecha_vencimiento')
+        trabajo = encolar('generar_cobros', {
+            'complejo': datos['complejo'].id,
+            'mes': datos['mes'],
+            'anio': datos['anio'],
+            'fecha_vencimiento': fecha_vencimiento.isoformat() if fecha_vencimiento else None,
+        }, usuario=request.user)
+        return respuesta_encolada(request, trabajo)
 
-    def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        if not queryset.exists():
-            return Response({
-                "message": "No hay pagos registrados",
-                "data": []
-            })
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+    @action(detail=False, methods=['get'], permission_classes=[EsAdministrador])
+    def exportar(self, request):
+        return respuesta_exportacion(request, 'pagos')
+
+    @action(detail=False, methods=['get'], permission_classes=[EsAdministrador])
+    def morosidad(self, request):
+        filtros = MorosidadFiltroSerializer(data=request.query_params)
+        filtros.is_valid(raise_exception=True)
+        datos = filtros.validated_data
+        if not administra_complejo(request.user, datos['complejo']):
+            return Response(
+                {"error": "No administras este complejo"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        return Response(reporte_morosidad(datos['complejo'], datos.get('fecha_corte')))
 
-class ReservaViewSet(viewsets.ModelViewSet):
-    queryset = Reserva.objects.all()
+class ReservaViewSet(VisibilidadAdministradorMixin, CamposSolicitadosMixin, EscrituraConReintentosMixin, RespuestaCacheadaMixin, ListadoConMensajeMixin, viewsets.ModelViewSet):
+    queryset = Reserva.objects.select_related(
+        'usuario__rol', 'usuario__unidad_habitacional'
+    ).prefetch_related(
+        Prefetch('detalles', queryset=ReservaDetalle.objects.select_related('espacio'))
+    )
     serializer_class = ReservaSerializer
+    lectura_rapida = True
     permission_classes = [permissions.IsAuthenticated]
+    orden_paginacion = ('-fecha_creacion', '-id')
+    mensaje_vacio = "No hay reservas registradas"
+    recurso_cache = 'reservas'
 
-    def get_queryset(self):
-        user = self.request.user
-        if user.rol.nombre == 'Administrador':
-            return Reserva.objects.all()
-        # Para residentes, mostrar solo sus reservas
-        return Reserva.objects.filter(usuario=user)
-
-    def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        if not queryset.exists():
-            return Response({
-                "message": "No hay reservas registradas",
-                "data": []
-            })
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
-
-class NotificacionViewSet(viewsets.ModelViewSet):
-    queryset = Notificacion.objects.all()
+class NotificacionViewSet(VisibilidadAdministradorMixin, CamposSolicitadosMixin, RespuestaCacheadaMixin, ListadoConMensajeMixin, viewsets.ModelViewSet):
+    queryset = Notificacion.objects.select_related(
+        'creador__rol', 'creador__unidad_habitacional'
+    ).prefetch_related(
+        Prefetch(
+            'destinatarios',
+            queryset=get_user_model().objects.select_related('rol', 'unidad_habitacional')
+        )
+    )
     serializer_class = NotificacionSerializer
+    lectura_rapida = True
     permission_classes = [permissions.IsAuthenticated]
+    orden_paginacion = ('-fecha_publicacion', '-id')
+    mensaje_vacio = "No hay notificaciones"
+    recurso_cache = 'notificaciones'
+    campo_complejo = 'complejo_id'
 
-    def get_queryset(self):
+    def filas_propias(self, queryset):
+        # Las difusiones de su complejo o rol y las dirigidas a ellos
+        return queryset.para_usuario(self.request.user)
+
+    def alcances_cache(self):
         user = self.request.user
-        if user.rol.nombre == 'Administrador':
-            return Notificacion.objects.all()
-        # Para residentes, mostrar solo las notificaciones donde son destinatarios
-        return Notificacion.objects.filter(destinatarios=user)
+        if self.es_administrador():
+            complejos = complejos_administrados(user)
+            if complejos is None:
+                return [TODOS]
+            # Toda escritura de una notificación o de sus destinatarios invalida su complejo
+            return [f'complejo:{complejo}' for complejo in sorted(complejos)]
+        # Las difusiones se invalidan por complejo y las dirigidas por destinatario
+        return [f'usuario:{user.pk}'] + [f'complejo:{complejo}' for complejo in complejos_de(user)]
 
-    def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        if not queryset.exists():
-            return Response({
-                "message": "No hay notificaciones",
-                "data": []
-            })
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+    @con_reintentos
+    def perform_create(self, serializer):
+        serializer.instance = None
+        notificacion = serializer.save()
+        # Recargar con el plan de prefetch para no serializar los destinatarios uno a uno
+        serializer.instance = self.queryset.get(pk=notificacion.pk)
 
-class PagoDetalleViewSet(viewsets.ModelViewSet):
+    @con_reintentos
+    def perform_update(self, serializer):
+        notificacion = serializer.save()
+        serializer.instance = self.queryset.get(pk=notificacion.pk)
+
+class PagoDetalleViewSet(CamposSolicitadosMixin, EscrituraConReintentosMixin, viewsets.ModelViewSet):
+    # PagoDetalleSerializer usa fields='__all__': las relaciones salen como claves primarias
     queryset = PagoDetalle.objects.all()
     serializer_class = PagoDetalleSerializer
     permission_classes = [permissions.IsAuthenticated]
 
-class GastoComunViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['post'], permission_classes=[EsAdministrador], parser_classes=[JSONParser, MultiPartParser])
+    def liquidar(self, request):
+        """
+        Registra el pago de muchos detalles a la vez, desde una lista de ids o un archivo de conciliación
+        bancaria (CSV o JSON lines con id y fecha_pago), y devuelve el resultado de cada ítem.
+        """
+        serializer = LiquidacionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        datos = serializer.validated_data
+        if 'archivo' in datos:
+            items = LECTORES_CONCILIACION[datos['formato']](abrir_texto(datos['archivo']))
+        else:
+            items = items_de_lista(datos['detalles'])
+        try:
+            resultado = liquidar_detalles(
+                items, fecha_pago=datos.get('fecha_pago'), complejos=complejos_administrados(request.user)
+            )
+        except UnicodeDecodeError:
+            # El archivo se decodifica al iterarlo, antes de escribir nada
+            return Response({'error': 'El archivo debe estar codificado en UTF-8'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(resultado)
+
+class GastoComunViewSet(CamposSolicitadosMixin, viewsets.ModelViewSet):
     queryset = GastoComun.objects.all()
     serializer_class = GastoComunSerializer
     permission_classes = [permissions.IsAuthenticated]
+    orden_paginacion = ('-fecha', '-id')
 
     def get_queryset(self):
-        queryset = GastoComun.objects.all()
+        queryset = super().get_queryset()
         mes = self.request.query_params.get('mes', None)
         anio = self.request.query_params.get('anio', None)
+        complejo = self.request.query_params.get('complejo', None)
         
+        if complejo:
+            queryset = queryset.filter(complejo=complejo)
         if mes and anio:
             queryset = queryset.filter(mes=mes, anio=anio)
         
         return queryset
 
+    @action(detail=False, methods=['get'])
+    def resumen(self, request):
+        filtros = ResumenGastosFiltroSerializer(data=request.query_params)
+        filtros.is_valid(raise_exception=True)
+        datos = filtros.validated_data
+        complejo = datos['complejo']
+        if EsAdministrador().has_permission(request, self):
+            permitido = administra_complejo(request.user, complejo)
+        else:
+            # Los residentes solo ven el resumen de su propio complejo
+            unidad = request.user.unidad_habitacional
+            permitido = unidad is not None and unidad.complejo_id == complejo.id
+        if not permitido:
+            return Response(
+                {"error": "No tienes acceso a este complejo"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        filas = resumen_por_periodo(datos['complejo'], datos.get('anio_desde'), datos.get('anio_hasta'))
+        return Response(ResumenGastoComunSerializer(filas, many=True).data)
+
+    @action(detail=False, methods=['get'], permission_classes=[EsAdministrador])
+    def exportar(self, request):
+        return respuesta_exportacion(request, 'gastos_comunes')
+
+class EspacioComunViewSet(CamposSolicitadosMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = EspacioComun.objects.filter(activo=True)
+    serializer_class = EspacioComunSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    @action(detail=True, methods=['get'])
+    def disponibilidad(self, request, pk=None):
+        espacio = self.get_object()
+        intervalo = IntervaloSerializer(data={
+            'fecha_inicio': request.query_params.get('desde'),
+            'fecha_fin': request.query_params.get('hasta'),
+        })
+        intervalo.is_valid(raise_exception=True)
+        libres = intervalos_libres(
+            espacio, intervalo.validated_data['fecha_inicio'], intervalo.validated_data['fecha_fin']
+        )
+        return Response({
+            'espacio': espacio.id,
+            'libres': [{'fecha_inicio': inicio, 'fecha_fin': fin} for inicio, fin in libres],
+        })
+
+    @action(detail=True, methods=['get'])
+    def conflictos(self, request, pk=None):
+        espacio = self.get_object()
+        intervalo = IntervaloSerializer(data=request.query_params)
+        intervalo.is_valid(raise_exception=True)
+        reservas = list(reservas_en_conflicto(
+            espacio, intervalo.validated_data['fecha_inicio'], intervalo.validated_data['fecha_fin']
+        ).values_list('reserva_id', flat=True).distinct())
+        return Response({
+            'espacio': espacio.id,
+            'conflicto': bool(reservas),
+            'reservas': reservas,
+        })
+
+    @action(detail=False, methods=['post'], url_path='verificar-disponibilidad')
+    def verificar_disponibilidad(self, request):
+        serializer = VerificarDisponibilidadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        datos = serializer.validated_data['candidatos']
+        solicitados = {candidato['espacio'] for candidato in datos}
+        inexistentes = solicitados - set(self.get_queryset().filter(id__in=solicitados).values_list('id', flat=True))
+        if inexistentes:
+            return Response(
+                {"error": f"Espacios comunes no encontrados: {sorted(inexistentes)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        disponibles = verificar_candidatos([
+            (candidato['espacio'], candidato['fecha_inicio'], candidato['fecha_fin']) for candidato in datos
+        ])
+        return Response([
+            {
+                'espacio': candidato['espacio'],
+                'fecha_inicio': candidato['fecha_inicio'],
+                'fecha_fin': candidato['fecha_fin'],
+                'disponible': disponible,
+            }
+            for candidato, disponible in zip(datos, disponibles)
+        ])
+
+class TrabajoViewSet(CamposSolicitadosMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Estado y resultado de los trabajos en segundo plano. Cada usuario ve los que encoló; los administradores de
+    un complejo, además, los encolados para su complejo, y los superusuarios, todos.
+    """
+    queryset = Trabajo.objects.all()
+    serializer_class = TrabajoSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    orden_paginacion = ('-fecha_creacion', '-id')
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        user = self.request.user
+        if not EsAdministrador().has_permission(self.request, self):
+            return queryset.filter(creado_por=user)
+        complejos = complejos_administrados(user)
+        if complejos is None:
+            return queryset
+        # Las descargas y resultados de otro complejo exponen sus pagos, gastos e importaciones
+        return queryset.filter(Q(creado_por=user) | Q(parametros__complejo__in=complejos))
+
+    @action(detail=True, methods=['post'], permission_classes=[EsAdministrador])
+    def reintentar(self, request, pk=None):
+        trabajo = self.get_object()
+        if not reintentar_trabajo(trabajo):
+            return Response(
+                {"error": "Solo se pueden reintentar trabajos muertos"},
+                status=status.HTTP_409_CONFLICT
+            )
+        trabajo.refresh_from_db()
+        return respuesta_encolada(request, trabajo)
+
+    @action(detail=True, methods=['get'])
+    def descarga(self, request, pk=None):
+        trabajo = self.get_object()
+        archivo = (trabajo.resultado or {}).get('archivo') if trabajo.estado == 'COMPLETADO' else None
+        if archivo is None or not default_storage.exists(archivo):
+            return Response(
+                {"error": "El trabajo no tiene un archivo disponible"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return FileResponse(
+            default_storage.open(archivo, 'rb'), as_attachment=True,
+            filename=archivo.rsplit('/', 1)[-1], content_type=trabajo.resultado.get('content_type')
+        )
+
+    @action(detail=False, methods=['get'], permission_classes=[EsAdministrador])
+    def metricas(self, request):
+        return Response(metricas_trabajos())
+
 @api_view(['GET'])
 def welcome(request):
     return HttpResponse("Bienvenido a la API de ResiAdmin")
@@ -250,4 +752,101 @@ def obtener_complejo_administrador(request):
     else:
         return Response({
             'error': 'No tienes el rol de administrador'
-        }, status=status.HTTP_403_FORBIDDEN)
\ No newline at end of file
+        }, status=status.HTTP_403_FORBIDDEN)
+
+
+# Bandeja de notificaciones en tiempo real (requiere servir con ASGI para no ocupar un hilo por conexión)
+LATIDO_SEGUNDOS = 25
+ESPERA_MAXIMA_LONG_POLL = 55
+
+
+async def autenticar_bandeja(request):
+    """
+    Autentica con el header Authorization o, para EventSource que no permite headers, con ?token=.
+    """
+    autenticacion = JWTAuthenticationCacheada()
+
+    def autenticar():
+        token = request.GET.get('token')
+        if token:
+            return autenticacion.get_user(autenticacion.get_validated_token(token.encode()))
+        resultado = autenticacion.authenticate(request)
+        return resultado[0] if resultado else None
+
+    try:
+        return await sync_to_async(autenticar)()
+    except (InvalidToken, AuthenticationFailed):
+        return None
+
+
+def _evento_sse(fila):
+    return f"id: {fila['id']}\nevent: notificacion\ndata: {json.dumps(fila, cls=DjangoJSONEncoder)}\n\n"
+
+
+async def bandeja_notificaciones(request):
+    """
+    Entrega las notificaciones nuevas del complejo y las dirigidas al usuario apenas se crean.
+    Con Accept: text/event-stream (o ?modo=sse) responde un stream SSE; si no, hace long-poll:
+    espera hasta `espera` segundos y devuelve lo nuevo desde `desde` (o desde Last-Event-ID).
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Método no permitido'}, status=405)
+    usuario = await autenticar_bandeja(request)
+    if usuario is None:
+        return JsonResponse({'error': 'Credenciales inválidas o no enviadas'}, status=401)
+
+    desde = request.GET.get('desde') or request.headers.get('Last-Event-ID')
+    try:
+        desde = int(desde) if desde else await ultimo_id_notificacion()
+        espera = min(float(request.GET.get('espera', ESPERA_MAXIMA_LONG_POLL)), ESPERA_MAXIMA_LONG_POLL)
+    except ValueError:
+        return JsonResponse({'error': 'desde y espera deben ser numéricos'}, status=400)
+    complejos = complejos_de(usuario)
+
+    if request.GET.get('modo') == 'sse' or 'text/event-stream' in request.headers.get('Accept', ''):
+        async def eventos():
+            ultimo = desde
+            suscripcion = difusor.suscribir(complejos, usuario.pk)
+            try:
+                yield 'retry: 3000\n\n'
+                while True:
+                    for fila in await notificaciones_nuevas(usuario, ultimo):
+                        ultimo = fila['id']
+                        yield _evento_sse(fila)
+                    # Al vencer el latido se vuelve a consultar: cubre publicaciones hechas en otro proceso
+                    if not await suscripcion.esperar(LATIDO_SEGUNDOS):
+                        yield ': latido\n\n'
+            finally:
+                difusor.cancelar(suscripcion)
+
+        response = StreamingHttpResponse(eventos(), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    suscripcion = difusor.suscribir(complejos, usuario.pk)
+    try:
+        filas = await notificaciones_nuevas(usuario, desde)
+        if not filas and await suscripcion.esperar(espera):
+            filas = await notificaciones_nuevas(usuario, desde)
+    finally:
+        difusor.cancelar(suscripcion)
+    return JsonResponse({'notificaciones': filas, 'ultimo_id': filas[-1]['id'] if filas else desde})
+
+
+def metricas_prometheus(request):
+    """
+    Histogramas de las peticiones atendidas por este proceso, en el formato de texto de Prometheus.
+    Exige METRICAS_TOKEN como Bearer; sin token configurado solo responde con DEBUG activo.
+    """
+    token = settings.METRICAS_TOKEN
+    if token:
+        enviado = request.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not hmac.compare_digest(enviado.encode(), token.encode()):
+            return HttpResponse('Token de métricas inválido\n', status=403, content_type='text/plain; charset=utf-8')
+    elif not settings.DEBUG:
+        return HttpResponse(
+            'Métricas deshabilitadas: configura RESIADMIN_METRICAS_TOKEN\n', status=403,
+            content_type='text/plain; charset=utf-8'
+        )
+    return HttpResponse(registro.exportar(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 
@@ -45,8 +46,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primero, para que la duración medida incluya al resto de los middleware
+    'administracion.middleware.MetricasMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'administracion.middleware.LecturaReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -86,6 +90,32 @@ DATABASES = {
     }
 }
 
+# Perfil de base de datos: 'produccion' activa WAL y los pragmas de administracion.basedatos en cada conexión,
+# y abre las transacciones con BEGIN IMMEDIATE para que un escritor no falle al promover su lock de lectura.
+SQLITE_PERFIL = os.environ.get('RESIADMIN_DB_PERFIL', 'desarrollo')
+
+if SQLITE_PERFIL == 'produccion':
+    DATABASES['default']['OPTIONS'] = {
+        'transaction_mode': 'IMMEDIATE',
+        'timeout': 5,
+    }
+
+# Réplica de solo lectura para listados y reportes: RESIADMIN_DB_REPLICA es la ruta de su archivo SQLite
+# (localmente, una copia de db.sqlite3). Sin réplica todas las consultas van a 'default'.
+REPLICA_DB = os.environ.get('RESIADMIN_DB_REPLICA')
+
+if REPLICA_DB:
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': REPLICA_DB,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['administracion.routers.RouterLecturaEscritura']
+
+# Segundos que un cliente sigue leyendo del primario después de escribir, para no ver datos atrasados de la réplica
+REPLICA_RETRASO_MAXIMO = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -126,6 +156,19 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Token para leer /metrics (Authorization: Bearer <token>); sin token el endpoint solo responde con DEBUG
+METRICAS_TOKEN = os.environ.get('RESIADMIN_METRICAS_TOKEN')
+
+# Archivos generados por la aplicación (entradas y resultados de los trabajos en segundo plano)
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Cola de trabajos (manage.py procesar_trabajos)
+TRABAJOS_MAX_INTENTOS = 3
+# Segundos de espera antes del primer reintento; se duplica en cada intento fallido
+TRABAJOS_ESPERA_REINTENTO = 30
+# Un trabajo EN_CURSO por más tiempo se considera perdido y vuelve a la cola
+TRABAJOS_TIMEOUT_SEGUNDOS = 3600
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -141,10 +184,10 @@ CORS_ALLOWED_ORIGINS = [
 # Configuración de DRF
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'administracion.authentication.JWTAuthenticationCacheada',
     ],
     'DEFAULT_SCHEMA_CLASS': 'rest_framework.schemas.openapi.AutoSchema',
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'administracion.pagination.CursorPaginacion',
     'PAGE_SIZE': 10
 }
 
@@ -161,6 +204,11 @@ SWAGGER_SETTINGS = {
     'VALIDATOR_URL': None,
 }
 
+# Segundos que el usuario autenticado (con rol y complejo) se mantiene en la caché del proceso.
+# Cada proceso tiene su propia caché y solo invalida lo que guarda él mismo: con varios procesos
+# un cambio de rol o de unidad puede tardar hasta este tiempo en verse en los demás. Mantenerlo corto.
+PRINCIPAL_CACHE_TTL = int(os.environ.get('RESIADMIN_PRINCIPAL_CACHE_TTL', 30))
+
 # Configuración de JWT
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
@@ -16,7 +16,7 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from administracion.views import welcome
+from administracion.views import metricas_prometheus, welcome
 from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
@@ -37,6 +37,7 @@ urlpatterns = [
     path('', welcome),  # Ruta raíz
     path('admin/', admin.site.urls),
     path('api/', include('administracion.urls')),
+    path('metrics', metricas_prometheus, name='metricas'),
     # URLs de documentación
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
     path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),